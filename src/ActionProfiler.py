@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import random
+import numpy
+import retro
+from Discretizer import Discretizer, StreetFighter2Discretizer, StreetFighter2PhaseTracker
+from MatchRecording import MatchRecording
+from MatchReplayer import MatchReplayer
+
+class ActionProfiler():
+    """
+    Measures how a discrete action space is used and finds the combos in it that are redundant.
+    Usage and the damage dealt and taken after each combo are counted from MatchRecordings replayed headlessly.
+    Redundancy is found by branching the emulator: at probe points sampled from save states the emulator state is saved,
+    every combo is held for a few frames from that same state and the RAM variables each one leaves behind are compared.
+    Combos that leave identical RAM at enough probes are clustered, only the most used combo of each cluster is kept in
+    the reduced combo table, which a Discretizer takes in place of its default combos through Discretizer.loadCombos.
+    """
+
+    ### Static Variables
+
+    DEFAULT_GAME = 'StreetFighterIISpecialChampionEdition-Genesis'                   # Game whose save states are probed
+    HOLD_FRAMES = 12                                                                  # Frames each combo is held when probing its effect, long enough for attacks to start
+    EFFECT_WINDOW = 30                                                                # Steps after a recorded action whose damage is credited to it
+    PROBE_WARMUP = (60, 600)                                                          # Range of random steps played before each probe point so the probes cover varied positions
+    DEFAULT_PROBES_PER_STATE = 5                                                      # Probe points sampled from each save state
+    DEFAULT_MIN_AGREEMENT = 1.0                                                       # Fraction of probes two combos must agree on to be clustered
+
+    # RAM variables compared after holding a combo, two combos with the same values did the same thing
+    EFFECT_VARIABLES = ['player1_x_position', 'player1_y_position', 'player1_status', 'player1_health',
+                        'player2_x_position', 'player2_y_position', 'player2_status', 'player2_health']
+
+    ### End of Static Variables
+
+    def __init__(self, game= DEFAULT_GAME, combos= None, verbose= False):
+        """
+        Sets up empty usage counts for an action space
+
+        Parameters
+        ----------
+        game
+            String of the game the recordings and save states belong to
+
+        combos
+            Optional list of the combos being profiled, defaults to StreetFighter2Discretizer.DEFAULT_COMBOS
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(game, str))
+        assert(combos is None or (isinstance(combos, (list, tuple)) and len(combos) > 0))
+
+        self.game = game
+        self.combos = [list(combo) for combo in (combos if combos is not None else StreetFighter2Discretizer.DEFAULT_COMBOS)]
+        self.verbose = verbose
+        self.usage = numpy.zeros(len(self.combos), dtype= numpy.int64)
+        self.damageDealt = numpy.zeros(len(self.combos))
+        self.damageTaken = numpy.zeros(len(self.combos))
+        self.signatures = []                                                          # One (combos, EFFECT_VARIABLES) array per probe point
+
+    def profileRecording(self, recording):
+        """
+        Replays a recording and adds every player's actions to the usage counts, only steps where the players had control count
+
+        Parameters
+        ----------
+        recording
+            The MatchRecording to replay, it must have been played with the combos being profiled
+
+        Returns
+        -------
+        profiled
+            Whether the recording was replayed to the end without diverging
+        """
+        assert(recording.__repr__() == "MatchRecording")
+        if (recording.combos if recording.combos is not None else StreetFighter2Discretizer.DEFAULT_COMBOS) != self.combos:
+            print('Skipping recording of {0}, it was played with a different combo table'.format(recording.state))
+            return False
+
+        tracker = StreetFighter2PhaseTracker(1)
+        healths, actionable = [], []
+        try:
+            for actions, observation, rewards, done, info in MatchReplayer(recording).iterateSteps():
+                healths.append((info['player1_health'], info['player2_health']))
+                actionable.append(tracker.update({variable : [info[variable]] for variable in StreetFighter2PhaseTracker.VARIABLES})[0])
+        except RuntimeError as e:
+            print(e)
+            return False
+
+        healths = numpy.asarray(healths, dtype= numpy.float64)
+        actionable = numpy.asarray(actionable, dtype= bool)
+        # Health only ever drops from damage, the jump back up between rounds is clipped away
+        damage = numpy.maximum(numpy.diff(healths, axis= 0, prepend= healths[:1]) * -1, 0)
+        cumulativeDamage = numpy.concatenate([numpy.zeros((1, 2)), numpy.cumsum(damage, axis= 0)])
+        steps = numpy.arange(len(healths))
+        windowEnds = numpy.minimum(steps + ActionProfiler.EFFECT_WINDOW, len(healths))
+        windowDamage = cumulativeDamage[windowEnds] - cumulativeDamage[steps]
+
+        for playerNum in range(recording.getNumberOfPlayers()):
+            actions = recording.actions[:len(healths), playerNum][actionable]
+            self.usage += numpy.bincount(actions, minlength= len(self.combos))
+            numpy.add.at(self.damageDealt, actions, windowDamage[actionable, 1 - playerNum])
+            numpy.add.at(self.damageTaken, actions, windowDamage[actionable, playerNum])
+        if self.verbose: print('Profiled {0} actionable steps from {1}'.format(int(actionable.sum()), recording.state))
+        return True
+
+    def probeState(self, state, numProbes= DEFAULT_PROBES_PER_STATE):
+        """
+        Samples probe points from a save state and records the RAM every combo leaves behind at each of them
+
+        Parameters
+        ----------
+        state
+            String of the save state to probe from
+
+        numProbes
+            Integer number of probe points to sample
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(numProbes, int) and numProbes > 0)
+
+        players = 2 if state.startswith('two_player') else 1
+        environment = StreetFighter2Discretizer(retro.make(game= self.game, state= state, players= players), combos= self.combos)
+        emulator = environment.unwrapped.em
+        try:
+            environment.reset()
+            for probe in range(numProbes):
+                done, info = False, None
+                for step in range(random.randint(*ActionProfiler.PROBE_WARMUP)):
+                    _, _, done, info = environment.step([environment.action_space.sample() for player in range(players)])
+                    if done: break
+                while not done and not environment.isActionable():
+                    _, _, done, info = environment.step([0] * players)
+                if done:
+                    environment.reset()
+                    continue
+
+                # Every combo is played out from the same saved emulator state
+                snapshot = emulator.get_state()
+                signature = numpy.zeros((len(self.combos), len(ActionProfiler.EFFECT_VARIABLES)), dtype= numpy.int64)
+                for comboIndex in range(len(self.combos)):
+                    emulator.set_state(snapshot)
+                    for frame in range(ActionProfiler.HOLD_FRAMES):
+                        _, _, _, info = environment.step([comboIndex] + [0] * (players - 1))
+                    signature[comboIndex] = [info[variable] for variable in ActionProfiler.EFFECT_VARIABLES]
+                emulator.set_state(snapshot)
+                self.signatures.append(signature)
+            if self.verbose: print('Probed {0} of {1} points from {2}'.format(len(self.signatures), numProbes, state))
+        finally:
+            environment.close()
+
+    def getClusters(self, minAgreement= DEFAULT_MIN_AGREEMENT):
+        """
+        Groups the combos whose effects matched at enough probe points
+
+        Parameters
+        ----------
+        minAgreement
+            Fraction of probes on which a combo must leave the same RAM as a cluster's representative to join it
+
+        Returns
+        -------
+        clusters
+            A list of lists of combo indices ordered by their representative, the first index of each cluster is its representative
+            The no action combo always represents its cluster so it keeps index 0 in the reduced table
+        """
+        assert(0 < minAgreement <= 1)
+        if len(self.signatures) == 0: return [[comboIndex] for comboIndex in range(len(self.combos))]
+
+        signatures = numpy.stack(self.signatures)
+        # The most used combo of a cluster becomes its representative, so clustering visits combos from most to least used
+        order = [0] + [comboIndex for comboIndex in numpy.argsort(-self.usage, kind= 'stable').tolist() if comboIndex != 0]
+        clusters = []
+        for comboIndex in order:
+            for cluster in clusters:
+                agreement = numpy.mean(numpy.all(signatures[:, comboIndex] == signatures[:, cluster[0]], axis= 1))
+                if agreement >= minAgreement:
+                    cluster.append(comboIndex)
+                    break
+            else: clusters.append([comboIndex])
+        return sorted(clusters, key= lambda cluster: cluster[0])
+
+    def getReport(self):
+        """
+        Summarizes the usage and outcome of every combo
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        report
+            A list with a dictionary per combo of its buttons, times used, share of all uses and mean damage dealt and taken after it
+        """
+        totalUsage = max(int(self.usage.sum()), 1)
+        uses = numpy.maximum(self.usage, 1)
+        return [{'combo' : combo, 'usage' : int(self.usage[comboIndex]), 'share' : self.usage[comboIndex] / totalUsage,
+                 'damageDealt' : self.damageDealt[comboIndex] / uses[comboIndex], 'damageTaken' : self.damageTaken[comboIndex] / uses[comboIndex]}
+                for comboIndex, combo in enumerate(self.combos)]
+
+    def buildComboTable(self, minAgreement= DEFAULT_MIN_AGREEMENT):
+        """
+        Builds the reduced combo table, one combo per cluster
+
+        Parameters
+        ----------
+        minAgreement
+            Fraction of probes two combos must agree on to be clustered, see getClusters
+
+        Returns
+        -------
+        table
+            A dictionary with the reduced combos, the original combos each one stands in for and the profile it came from
+        """
+        clusters = self.getClusters(minAgreement)
+        return {'game' : self.game,
+                'combos' : [self.combos[cluster[0]] for cluster in clusters],
+                'clusters' : [[self.combos[comboIndex] for comboIndex in cluster] for cluster in clusters],
+                'sourceIndices' : [cluster[0] for cluster in clusters],
+                'minAgreement' : minAgreement,
+                'probes' : len(self.signatures),
+                'usage' : self.usage.tolist()}
+
+    def saveComboTable(self, path, minAgreement= DEFAULT_MIN_AGREEMENT):
+        """
+        Writes the reduced combo table as JSON, swapping it in so a Discretizer never reads a partial table
+
+        Parameters
+        ----------
+        path
+            String path of the combo table file
+
+        minAgreement
+            Fraction of probes two combos must agree on to be clustered, see getClusters
+
+        Returns
+        -------
+        table
+            The dictionary that was written
+        """
+        table = self.buildComboTable(minAgreement)
+        if os.path.dirname(path) != '': os.makedirs(os.path.dirname(path), exist_ok= True)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(table, file, indent= 1)
+        os.replace(path + '.tmp', path)
+        return table
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "ActionProfiler"
+
+"""
+Profiles the default combos from saved recordings and probes of the single player save states, then writes a reduced combo table
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Measures combo usage and writes a reduced combo table without redundant combos.')
+    parser.add_argument('-r', '--recordings', type= str, default= MatchRecording.DEFAULT_RECORDINGS_DIR_PATH, help= 'Directory of match recordings to count usage from')
+    parser.add_argument('-s', '--states', type= str, nargs= '*', default= None, help= 'Save states to probe, defaults to every single player state')
+    parser.add_argument('-p', '--probes', type= int, default= ActionProfiler.DEFAULT_PROBES_PER_STATE, help= 'Probe points sampled from each save state')
+    parser.add_argument('-a', '--agreement', type= float, default= ActionProfiler.DEFAULT_MIN_AGREEMENT, help= 'Fraction of probes two combos must agree on to be merged')
+    parser.add_argument('-o', '--output', type= str, default= os.path.join(Discretizer.DEFAULT_COMBO_TABLES_DIR_PATH, 'reduced.json'), help= 'Path the reduced combo table is written to')
+    parser.add_argument('-vb', '--verbose', action= 'store_true', help= 'set this flag to turn on print statements during execution')
+    args = parser.parse_args()
+
+    profiler = ActionProfiler(verbose= args.verbose)
+    if os.path.isdir(args.recordings):
+        for file in sorted(os.listdir(args.recordings)):
+            if file.endswith(MatchRecording.FILE_EXTENSION): profiler.profileRecording(MatchRecording.load(os.path.join(args.recordings, file)))
+
+    states = args.states
+    if states is None: states = sorted([file.split('.')[0] for file in os.listdir('../{0}'.format(profiler.game)) if file.endswith('.state') and file.startswith('single_player')])
+    for state in states: profiler.probeState(state, args.probes)
+
+    for row in profiler.getReport():
+        print('{0:<25}{1:<10}{2:<10}{3:<10}{4}'.format(str(row['combo']), row['usage'], round(row['share'], 3), round(row['damageDealt'], 2), round(row['damageTaken'], 2)))
+    table = profiler.saveComboTable(args.output, args.agreement)
+    print('Reduced {0} combos to {1} over {2} probes, saved to {3}'.format(len(profiler.combos), len(table['combos']), table['probes'], args.output))
@@ -0,0 +1,59 @@
+import argparse
+
+"""
+Maps every set of held controller buttons to one action of a discretized action space.
+The table is indexed by a bit mask of the held buttons, so looking up a human's input each frame is a single list index.
+"""
+
+def buildActionTable(buttons, combos):
+    """
+    Precomputes the action to take for every possible set of held buttons
+    A held set that exactly matches a combo maps to that combo, otherwise it maps to
+    the combo with the most buttons that are all being held, the earliest combo wins ties
+
+    Parameters
+    ----------
+    buttons
+        The list of button names of the controller, in the order the environment expects them
+
+    combos
+        The list of button combos that make up the discrete action space
+
+    Returns
+    -------
+    table
+        A list indexed by held button mask that holds the action index for that mask
+    """
+    comboMasks = [sum([1 << buttons.index(button) for button in combo]) for combo in combos]
+    exactMatches = {}
+    for action, mask in enumerate(comboMasks):
+        if mask not in exactMatches: exactMatches[mask] = action
+
+    table = [0] * (1 << len(buttons))
+    for heldMask in range(len(table)):
+        if heldMask in exactMatches:
+            table[heldMask] = exactMatches[heldMask]
+            continue
+        bestSize = -1
+        for action, mask in enumerate(comboMasks):
+            if mask & heldMask == mask and bin(mask).count('1') > bestSize:
+                table[heldMask] = action
+                bestSize = bin(mask).count('1')
+
+    return table
+
+"""
+Prints the action chosen for a few held button sets on the Genesis controller
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Shows which action each set of held buttons maps to.')
+    parser.add_argument('-b', '--buttons', type= str, nargs= '+', default= None, help= 'Held buttons to look up, a few examples are shown if not set')
+    args = parser.parse_args()
+
+    buttons = ['B', 'A', 'MODE', 'START', 'UP', 'DOWN', 'LEFT', 'RIGHT', 'C', 'Y', 'X', 'Z']
+    combos = [[], ['UP'], ['DOWN'], ['LEFT'], ['RIGHT'], ['B'], ['DOWN', 'B'], ['DOWN', 'RIGHT']]
+    table = buildActionTable(buttons, combos)
+    heldSets = [args.buttons] if args.buttons is not None else [['DOWN', 'B'], ['DOWN', 'RIGHT', 'B'], ['UP', 'LEFT'], ['A', 'C']]
+    for held in heldSets:
+        action = table[sum([1 << buttons.index(button) for button in held])]
+        print('{0} -> action {1} {2}'.format(held, action, combos[action]))
@@ -7,10 +7,11 @@ import numpy
 import time
 import random
 import numbers
-from collections import deque
-
-from tensorflow.python import keras
-from keras.models import load_model
+import re
+from ReplayMemory import ReplayMemory
+from PalettedFrame import PalettedFrame
+from PolicyCheckpoint import PolicyCheckpoint
+from ResourceManager import ResourceManager
 
 class Agent():
     """ 
@@ -31,19 +32,55 @@ class Agent():
     NEXT_STATE_INDEX = 5                                                                           # The next state that the action led to
     DONE_INDEX = 6                                                                                 # A flag signifying if the game is over
 
-    MAX_DATA_LENGTH = 50000                                                                        # Max number of decision frames the Agent can remember from a fight, average is about 2000 per fight
+    # Observation subscriptions, child Agents override these so the Lobby can skip handing over data they never look at
+    # The RAM info is always delivered since the Lobby relies on it to track match results
+    WANTS_FRAMES = True                                                                            # Whether the Agent uses the pixel observations, if not None is passed in their place
+    WANTS_REWARDS = True                                                                           # Whether the Agent uses the rewards, if not 0 is recorded in their place
+    FRAME_DOWNSAMPLE = 1                                                                           # Stride applied to both image axes before the frame is handed to the Agent, 1 keeps full resolution
+    CROP_FRAMES = False                                                                            # Whether frames are cropped to the playfield listed in the game's scenario.json
+    REAL_TIME = False                                                                              # Whether the Agent needs matches paced to the console's frame rate, like a human at the controls
+    COMPACT_FRAMES = False                                                                         # Whether frames are handed over as PalettedFrames that only rebuild their RGB pixels when read
+
+    PLAYER_KEY_PATTERN = re.compile(r'player([12])')                                               # Used to mirror RAM info so player 2 sees the game from player 1's side
+
+    MEMORY_BYTE_BUDGET = 256 * 1024 ** 2                                                           # Bytes of recorded steps kept in RAM, older steps spill to memory mapped files on local disk
+    MEMORY_SPILL_DIR_PATH = None                                                                   # Local dir spilled steps are written under, None uses the system's temporary dir
 
     DEFAULT_MODELS_DIR_PATH = '../local_models'               # Default path to the dir where the trained models are saved for later access
     DEFAULT_MODELS_SUB_DIR = '{0}'                            # Models are further organized into subdirectories to avoid checkpoint overwrites by this naming scheme
     DEFAULT_MODEL_FILE_EXTENSION = '.model'                   # Extension used to identify saved model weight files versus logs
-    DEFAULT_LOG_FILE_EXTENSION = '.log'                       # Extension used to identify training logs versus saved model weight files
+    DEFAULT_POLICY_FILE_EXTENSION = '.policy'                 # Extension of the weights only checkpoint actors load without TensorFlow
+    DEFAULT_TELEMETRY_SUB_DIR = 'telemetry'                   # Name of the dir inside the model's dir where the training telemetry is stored
 
 
     ### End of static variables 
 
+    ### Static methods
+
+    @staticmethod
+    def mirrorInfo(info):
+        """
+        Swaps every player1 and player2 RAM variable so a state seen by player 2 reads as if it were player 1's
+        Lets one Agent playing as player 1 look at and learn from both sides of a self play match
+
+        Parameters
+        ----------
+        info
+            Dictionary of RAM variables, keyworded values can be found in Data.json
+
+        Returns
+        -------
+        mirrored
+            A new dictionary with the players' variables swapped
+        """
+        swap = lambda match: 'player2' if match.group(1) == '1' else 'player1'
+        return {Agent.PLAYER_KEY_PATTERN.sub(swap, key) : value for key, value in info.items()}
+
+    ### End of static methods
+
     ### Object methods
 
-    def __init__(self, load= False, name= None, character= "ryu", verbose= False):
+    def __init__(self, load= False, name= None, character= "ryu", verbose= False, actingOnly= False):
         """
         Initializes the agent and the underlying neural network
         
@@ -63,6 +100,11 @@ class Agent():
             A boolean variable representing whether or not the print statements in the class are turned on
             Error messages however are not turned off
 
+        actingOnly
+            A boolean flag for Agents that will only play and never train, a loaded Agent then reads the lightweight
+            policy checkpoint instead of the full Keras model so it starts quickly without importing TensorFlow
+            An Agent that is not loaded starts from an empty policy checkpoint, ready for weights sent with setPolicyWeights
+
         Returns
         -------
         None
@@ -70,6 +112,7 @@ class Agent():
         assert(isinstance(load, bool))
         assert(name is None or isinstance(name, str))
         assert(isinstance(character, str))
+        assert(isinstance(actingOnly, bool))
 
         if name is None: self.name = self.__class__.__name__
         else: self.name = name
@@ -78,9 +121,18 @@ class Agent():
         self.numMatchesWon = 0
         self.verbose = verbose
         self.playerNumber = 0
+        self.lastFightWon = False
+        self.telemetry = None
+        self.sharedWeights = None                                                               # Set when weights are published to or followed from other processes
+        self.sharedWeightsVersion = 0
+        self.actingOnly = actingOnly
 
         if self.__class__.__name__ != "Agent":
-            if not load: self.model = self.initializeNetwork()    								# Only invoked in child subclasses, Agent has no network
+            if not load and actingOnly and self.getPolicyActivations() is not None:
+                self.model = PolicyCheckpoint.initialize(self.getPolicyLayerSizes(), self.getPolicyActivations())
+            elif not load:
+                self.model = self.initializeNetwork()                                           # Only invoked in child subclasses, Agent has no network
+            elif actingOnly: self.loadPolicyCheckpoint()
             elif load: self.loadModel()
 
     def prepareForNextFight(self, env, playerNumber):
@@ -106,8 +158,45 @@ class Agent():
         self.environment = env
         self.actionSpace = env.action_space
         self.playerNumber = playerNumber
-        self.memory = deque(maxlen= Agent.MAX_DATA_LENGTH)                                      # Double ended queue that stores states during the game
+        self.memory = self.makeMemory()                                                         # Byte budgeted replay memory that stores states during the game
         self.numMatchesPlayed += 1
+        self.lastFightWon = False
+        if self.sharedWeights is not None and not self.sharedWeights.owner: self.pullSharedWeights()
+
+    def makeMemory(self, steps= ()):
+        """
+        Creates a replay memory bounded by this Agent's byte budget
+
+        Parameters
+        ----------
+        steps
+            An optional iterable of recorded steps to start the memory with
+
+        Returns
+        -------
+        memory
+            The ReplayMemory
+        """
+        return ReplayMemory(steps, byteBudget= self.MEMORY_BYTE_BUDGET, spillDir= self.MEMORY_SPILL_DIR_PATH)
+
+    def onPhaseChange(self, phase, info):
+        """
+        Called by the environment whenever the round enters a new phase, can be overwritten in the child class to react to
+        round starts, knock outs and the end of the match without checking every frame
+        
+        Parameters
+        ----------
+        phase
+            The Round_Phases value that was just entered
+
+        info
+            Dictionary of the RAM variables on the frame the phase was entered
+
+        Returns
+        -------
+        None
+        """
+        pass
 
     def getRandomMove(self):
         """
@@ -133,6 +222,7 @@ class Agent():
             A tuple containing the following elements:
             observation
                 The current display image in the form of a 2D array containing RGB values of each pixel
+                None if the Agent does not subscribe to frames
             state
                 The state the Agent was presented with before it took an action.
                 A dictionary containing tagged RAM data
@@ -142,6 +232,7 @@ class Agent():
                 The reward the agent received for taking that action
             nextObservation
                 The resultant display image in the form of a 2D array containing RGB values of each pixel
+                None if the Agent does not subscribe to frames
             nextState
                 The state that the chosen action led to
             done
@@ -153,18 +244,20 @@ class Agent():
         """
         assert(isinstance(step, (list, tuple)))
         assert(len(step) == Agent.TRAINING_POINT_SIZE)
-        assert(isinstance(step[Agent.OBSERVATION_INDEX], numpy.ndarray))
+        assert(isinstance(step[Agent.OBSERVATION_INDEX], (numpy.ndarray, PalettedFrame)) or (not self.WANTS_FRAMES and step[Agent.OBSERVATION_INDEX] is None))
         assert(isinstance(step[Agent.STATE_INDEX], dict))
         assert(isinstance(step[Agent.ACTION_INDEX], numbers.Number))
         assert(isinstance(step[Agent.REWARD_INDEX], numbers.Number))
-        assert(isinstance(step[Agent.NEXT_OBSERVATION_INDEX], numpy.ndarray))
+        assert(isinstance(step[Agent.NEXT_OBSERVATION_INDEX], (numpy.ndarray, PalettedFrame)) or (not self.WANTS_FRAMES and step[Agent.NEXT_OBSERVATION_INDEX] is None))
         assert(isinstance(step[Agent.NEXT_STATE_INDEX], dict))
         assert(isinstance(step[Agent.DONE_INDEX], bool))
 
         # If the match is over and the agent's number of rounds won is 2, than they won the match
         if step[Agent.DONE_INDEX]:
             key = "player{0}_matches_won".format(self.playerNumber + 1)
-            if step[Agent.NEXT_STATE_INDEX][key] == 2 or step[Agent.STATE_INDEX][key] == 2: self.numMatchesWon += 1 
+            if step[Agent.NEXT_STATE_INDEX][key] == 2 or step[Agent.STATE_INDEX][key] == 2:
+                self.numMatchesWon += 1
+                self.lastFightWon = True
             
         self.memory.append(step) # Steps are stored as tuples to avoid unintended changes
 
@@ -174,39 +267,65 @@ class Agent():
         """
         data = self.prepareMemoryForTraining(self.memory)
         self.model = self.trainNetwork(data, self.model)   		                           # Only invoked in child subclasses, Agent does not learn
+        if self.sharedWeights is not None and self.sharedWeights.owner: self.sharedWeights.publish(self.getPolicyWeights())
+        self.recordFightTelemetry()
         self.saveModel()
 
-    def saveModel(self, lossUpdate= None):
+    def recordFightTelemetry(self):
         """
-        Saves the currently trained model in the default naming convention ../local_models/{Class_Name}/{Class_Name}.model
+        Appends a summary of the last fight to this model's telemetry store
         
         Parameters
         ----------
-        lossUpdate
-            An integer value representing the mean loss after one training epoch,
-            will be logged in this model's training log if supplied
+        None
 
         Returns
         -------
         None
         """
-        assert(lossUpdate is None or isinstance(lossUpdate, numbers.Number))
+        totalReward = sum([step[Agent.REWARD_INDEX] for step in self.memory])
+        epsilon = getattr(self, 'epsilon', numpy.nan)
+        telemetry = self.getTelemetry()
+        telemetry.append('fights', fight= telemetry.getNumberOfRows('fights'), epsilon= epsilon, reward= totalReward, length= len(self.memory), won= self.lastFightWon, loss= self.getFightLoss())
+
+    def getTelemetry(self):
+        """
+        Returns the telemetry store at ../local_models/{Model_Name}/telemetry, opening it on first use
+        
+        Parameters
+        ----------
+        None
 
+        Returns
+        -------
+        telemetry
+            The TelemetryStore this model's training records are appended to
+        """
+        if self.telemetry is None:
+            from TelemetryStore import TelemetryStore
+            totalDirPath = os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, Agent.DEFAULT_MODELS_SUB_DIR.format(self.name))
+            self.telemetry = TelemetryStore(os.path.join(totalDirPath, Agent.DEFAULT_TELEMETRY_SUB_DIR), verbose= self.verbose)
+        return self.telemetry
+
+    def saveModel(self):
+        """
+        Saves the currently trained model in the default naming convention ../local_models/{Class_Name}/{Class_Name}.model
+        A weights only policy checkpoint is written next to it for actors, and any buffered telemetry is queued to be written alongside it
+        
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
         totalDirPath = os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, Agent.DEFAULT_MODELS_SUB_DIR.format(self.name))
 
         self.model.save(os.path.join(totalDirPath, self.getModelName()))
+        self.savePolicyCheckpoint()
         if self.verbose: print('{0} Model successfully saved'.format(self.name))
-        
-        if lossUpdate is not None:
-            try:
-                with open(os.path.join(totalDirPath, self.getLogName()), 'a+') as file:
-                    file.write(str(lossUpdate))
-                    file.write('\n')
-                    if self.verbose: print('{0} Loss History Successfully Updated'.format(self.name))
-            except Exception as e:
-                print('Trouble updating {0} loss history:'.format(self.name), e)
-        else:
-            if self.verbose: print('{0} Loss History was not updated as there were no losses to report'.format(self.name))
+        if self.telemetry is not None: self.telemetry.flush(wait= False)
 
     def loadModel(self):
         """
@@ -220,21 +339,150 @@ class Agent():
         -------
         None
         """
+        ResourceManager.configureTensorFlow()                                                   # TensorFlow's thread pools are sized before the first model is loaded
+        from tensorflow.python import keras
         totalDirPath = os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, Agent.DEFAULT_MODELS_SUB_DIR.format(self.name))
         try:
-            self.model = keras.models.load_model(os.path.join(totalDirPath, self.getModelName()))
+            self.model = keras.models.load_model(os.path.join(totalDirPath, self.getModelName()), custom_objects= self.getCustomObjects())
             if self.verbose: print('{0} Model successfully loaded'.format(self.name))
         except Exception as e:
             print('Trouble Loading {0} Model:'.format(self.name), e)
 
+    def savePolicyCheckpoint(self):
+        """
+        Writes the network's weights as a PolicyCheckpoint to ../local_models/{Model_Name}/{Model_Name}.policy
+        Skipped if the Agent does not describe its network's activations, see getPolicyActivations
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        activations = self.getPolicyActivations()
+        if activations is None: return
+        PolicyCheckpoint.save(self.getPolicyCheckpointPath(), self.getPolicyWeights(), activations)
+
+    def loadPolicyCheckpoint(self):
+        """
+        Loads the weights only checkpoint written by savePolicyCheckpoint as this Agent's model, for acting only
+        Falls back on the full Keras model if no policy checkpoint has been saved yet
+        
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        path = self.getPolicyCheckpointPath()
+        if not os.path.exists(os.path.join(path, PolicyCheckpoint.MANIFEST_FILE_NAME)):
+            if self.verbose: print('{0} has no policy checkpoint, loading the full model'.format(self.name))
+            self.loadModel()
+            return
+        self.model = PolicyCheckpoint.load(path)
+        if self.verbose: print('{0} Policy checkpoint successfully loaded'.format(self.name))
+
+    def getPolicyWeights(self):
+        """
+        Returns the weights of the Agent's network so an identical player can act on another process or machine
+        
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        weights
+            A list of numpy arrays, None if the Agent has no network
+        """
+        model = getattr(self, 'model', None)
+        if model is None or not hasattr(model, 'get_weights'): return None
+        return model.get_weights()
+
+    def setPolicyWeights(self, weights):
+        """
+        Loads weights made by getPolicyWeights into the Agent's network
+        
+        Parameters
+        ----------
+        weights
+            A list of numpy arrays matching the layers of the Agent's network
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(weights, (list, tuple)))
+        self.model.set_weights(weights)
+
+    def shareWeights(self):
+        """
+        Publishes this Agent's network weights to shared memory, they are republished after every review
+        Call on the learner, then pass the returned spec to followSharedWeights in each actor process
+        
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        spec
+            The picklable description actors need to attach to the weights
+        """
+        from SharedWeights import SharedWeights
+        if self.sharedWeights is not None: self.sharedWeights.close()
+        self.sharedWeights = SharedWeights.create(self.getPolicyWeights())
+        return self.sharedWeights.getSpec()
+
+    def followSharedWeights(self, spec):
+        """
+        Makes this Agent act with the weights a learner in another process publishes, newer weights are picked up before each fight
+        
+        Parameters
+        ----------
+        spec
+            The dictionary returned by shareWeights on the learner
+
+        Returns
+        -------
+        None
+        """
+        from SharedWeights import SharedWeights
+        previous = self.sharedWeights
+        self.sharedWeights = SharedWeights.attach(spec)
+        self.sharedWeightsVersion = 0                                                           # A new block starts its versions over
+        self.pullSharedWeights()
+        if previous is not None: previous.close()                                               # Only after the network has stopped reading from it
+
+    def pullSharedWeights(self):
+        """
+        Loads the published weights into the network if they are newer than the ones it has
+        A PolicyCheckpoint network instead predicts straight from the shared block, so it acts on newly published weights without copying them
+        """
+        if self.model.__repr__() == "PolicyCheckpoint":
+            if self.model.sharedWeights is not self.sharedWeights: self.model.followSharedWeights(self.sharedWeights)
+            return
+        if self.sharedWeights.getVersion() == self.sharedWeightsVersion: return
+        self.sharedWeightsVersion, weights = self.sharedWeights.readWeights()
+        self.setPolicyWeights(weights)
+        if self.verbose: print('{0} picked up shared weights version {1}'.format(self.name, self.sharedWeightsVersion))
+
+    def getCheckpointPath(self):
+        """Returns the path the model is saved to and loaded from, ../local_models/{Model_Name}/{Model_Name}.model"""
+        return os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, Agent.DEFAULT_MODELS_SUB_DIR.format(self.name), self.getModelName())
+
+    def getPolicyCheckpointPath(self):
+        """Returns the dir the weights only policy checkpoint is saved to, ../local_models/{Model_Name}/{Model_Name}.policy"""
+        return os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, Agent.DEFAULT_MODELS_SUB_DIR.format(self.name), self.name + Agent.DEFAULT_POLICY_FILE_EXTENSION)
+
     def getModelName(self):
         """Returns the formatted model name for the current model"""
         return  self.name + Agent.DEFAULT_MODEL_FILE_EXTENSION
 
-    def getLogName(self):
-        """Returns the formatted log name for the current model"""
-        return self.name + Agent.DEFAULT_LOG_FILE_EXTENSION
-
     ### End of object methods
 
     ### Abstract methods for the child Agent to implement
@@ -247,6 +495,7 @@ class Agent():
         ----------
         obs
             The observation of the current environment, 2D numpy array of pixel values
+            None if the Agent does not subscribe to frames
         info
             An array of information about the current environment, like player health, enemy health, matches won, and matches lost, etc.
             A full list of info can be found in data.json
@@ -256,7 +505,7 @@ class Agent():
         move
             Integer representing the move that was selected from the move list
         """
-        assert(isinstance(obs, numpy.ndarray))
+        assert(isinstance(obs, (numpy.ndarray, PalettedFrame)) or (not self.WANTS_FRAMES and obs is None))
         assert(isinstance(info, dict))
 
         if self.__class__.__name__ == "Agent":
@@ -265,6 +514,26 @@ class Agent():
         else:
             raise NotImplementedError("Implement getMove in the inherited agent")
 
+    def getMoves(self, observations, infos):
+        """
+        Picks a move for several states at once, used in self play where one Agent controls both players
+        Child Agents with networks can override this to evaluate every state in one batched forward pass
+
+        Parameters
+        ----------
+        observations
+            A list of observations, one per state
+
+        infos
+            A list of RAM info dictionaries, each seen from player 1's side
+
+        Returns
+        -------
+        moves
+            A list of integers representing the move selected for each state
+        """
+        return [self.getMove(obs, info) for obs, info in zip(observations, infos)]
+
     def initializeNetwork(self):
         """
         To be implemented in child class, should initialize or load in the Agent's neural network
@@ -297,6 +566,66 @@ class Agent():
         """
         raise NotImplementedError("Implement prepareMemoryForTraining in the inherited agent")
 
+    def getPolicyActivations(self):
+        """
+        Can be overwritten in the child class whose network is a plain stack of dense layers so it is also saved as a PolicyCheckpoint
+        
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        activations
+            A list of the Keras name of each dense layer's activation, None if the network cannot be saved as a PolicyCheckpoint
+        """
+        return None
+
+    def getPolicyLayerSizes(self):
+        """
+        Can be overwritten in the child class that describes its activations so an acting only Agent can start from an empty PolicyCheckpoint
+        
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        layerSizes
+            A list of the number of inputs followed by the number of neurons in each dense layer, None if not described
+        """
+        return None
+
+    def getCustomObjects(self):
+        """
+        Can be overwritten in the child class to hand Keras any custom losses or layers it needs to load the full model
+        
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        customObjects
+            A dictionary of names to the objects they refer to
+        """
+        return {}
+
+    def getFightLoss(self):
+        """
+        Can be overwritten in the child class to report the mean training loss of the last review in the fight telemetry
+        
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        loss
+            A float of the mean loss, NaN if the Agent does not track its loss
+        """
+        return numpy.nan
+
     def trainNetwork(self, data, model):
         """
         To be implemented in child class, Runs through a training epoch reviewing the training data and returns the trained model
@@ -315,6 +644,31 @@ class Agent():
         """
         raise NotImplementedError("Implement trainNetwork in the inherited agent")
 
+    def cloneBehavior(self, infos, actions, epochs, batchSize):
+        """
+        Can be overwritten in the child class with a network so it can be pretrained to imitate demonstrations, see BehaviorCloner
+        
+        Parameters
+        ----------
+        infos
+            A list of the RAM info dictionary of every demonstrated decision, seen from player 1's side
+
+        actions
+            An array of the combo picked at every decision
+
+        epochs
+            Integer number of passes over the demonstrations
+
+        batchSize
+            Integer number of demonstrations per gradient update
+
+        Returns
+        -------
+        history
+            A list of (loss, accuracy) tuples, one per epoch
+        """
+        raise NotImplementedError("Implement cloneBehavior in the inherited agent")
+
     ### End of Abstract methods
 
     def getName(self):
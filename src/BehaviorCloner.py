@@ -0,0 +1,339 @@
+import argparse
+import multiprocessing
+import os
+import numpy
+from Agent import Agent
+from Discretizer import Discretizer, StreetFighter2Discretizer, StreetFighter2PhaseTracker
+from MatchRecording import MatchRecording
+from MatchReplayer import MatchReplayer
+
+class BehaviorCloner():
+    """
+    Gathers (state, action) demonstrations from recorded matches and pretrains a network based Agent to imitate them
+    before it starts learning from its own play, so a new Agent does not have to discover competent play by random exploration.
+    Demonstrations come from three places: the fights a HumanAgent saves after every match, the expert targets a SearchAgent
+    saves after every fight, which share the same file layout, and MatchRecordings of any match, replayed headlessly.
+    Every demonstration keeps the RAM info the decision was made on, seen from player 1's side, and the combo that was picked.
+    The RAM info is only turned into features by the Agent being pretrained, so one set of demonstrations can train any
+    network, and the Agent fits the whole set in batches through its cloneBehavior method.
+    """
+
+    ### Static Variables
+
+    DEFAULT_DEMONSTRATIONS_SUB_DIR = 'demonstrations'                                 # Name of the dir inside a model's dir where its demonstrations are saved
+    FILE_EXTENSION = '.npz'                                                           # Extension of demonstration, expert target and recording files
+    DEFAULT_EPOCHS = 5                                                                # Passes over the demonstrations when pretraining
+    DEFAULT_BATCH_SIZE = 256                                                          # Demonstrations per gradient update when pretraining
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def saveDemonstrations(path, infos, actions, values= None):
+        """
+        Writes demonstrations as a compressed numpy archive, the file is swapped in whole so a reader never sees part of it
+
+        Parameters
+        ----------
+        path
+            String path of the file to write, its directory is created if it does not exist
+
+        infos
+            A list of the RAM info dictionary of every decision, seen from player 1's side
+
+        actions
+            A list of the combo picked at every decision
+
+        values
+            Optional (decisions, combos) array of how good each candidate combo was judged to be, as kept by a SearchAgent
+
+        Returns
+        -------
+        path
+            The path the demonstrations were saved to
+        """
+        assert(len(infos) == len(actions) and len(infos) > 0)
+
+        if os.path.dirname(path) != '': os.makedirs(os.path.dirname(path), exist_ok= True)
+        keys = sorted(infos[0].keys())
+        arrays = {'infoKeys' : numpy.array(keys),
+                  'infos' : numpy.array([[info[key] for key in keys] for info in infos], dtype= numpy.int64),
+                  'actions' : numpy.asarray(actions, dtype= numpy.int64)}
+        if values is not None: arrays['values'] = numpy.asarray(values, dtype= numpy.float32)
+        with open(path + '.tmp', 'wb') as file:
+            numpy.savez_compressed(file, **arrays)
+        os.replace(path + '.tmp', path)
+        return path
+
+    @staticmethod
+    def loadDemonstrations(path):
+        """
+        Reads demonstrations saved by saveDemonstrations, which includes a SearchAgent's expert targets
+
+        Parameters
+        ----------
+        path
+            String path of the demonstrations file
+
+        Returns
+        -------
+        infos
+            A list of the RAM info dictionary of every decision
+
+        actions
+            An array of the combo picked at every decision
+        """
+        with numpy.load(path, allow_pickle= False) as data:
+            keys = data['infoKeys'].tolist()
+            return [dict(zip(keys, row.tolist())) for row in data['infos']], data['actions']
+
+    @staticmethod
+    def getDemonstrationsPath(name):
+        """Returns the path of the next demonstrations file of the model with the given name, ../local_models/{Model_Name}/demonstrations/demonstrations_{number}.npz"""
+        totalDirPath = os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, Agent.DEFAULT_MODELS_SUB_DIR.format(name), BehaviorCloner.DEFAULT_DEMONSTRATIONS_SUB_DIR)
+        number = len([file for file in os.listdir(totalDirPath) if file.endswith(BehaviorCloner.FILE_EXTENSION)]) if os.path.isdir(totalDirPath) else 0
+        return os.path.join(totalDirPath, 'demonstrations_{0:06d}{1}'.format(number, BehaviorCloner.FILE_EXTENSION))
+
+    @staticmethod
+    def isRecording(path):
+        """Returns whether a file is a MatchRecording rather than a set of demonstrations"""
+        with numpy.load(path, allow_pickle= False) as data:
+            return 'metadata' in data.files
+
+    ### End of static methods
+
+    def __init__(self, combos= None, playerNames= None, onlyWinners= False, verbose= False):
+        """
+        Sets up an empty set of demonstrations
+
+        Parameters
+        ----------
+        combos
+            Optional list of the combos the demonstrated actions index into, defaults to StreetFighter2Discretizer.DEFAULT_COMBOS
+            Recordings played with a different combo table are skipped
+
+        playerNames
+            Optional list of player names, only their side of a recording is imitated, defaults to every side
+
+        onlyWinners
+            Whether only the side that won a recording is imitated
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(combos is None or (isinstance(combos, (list, tuple)) and len(combos) > 0))
+        assert(playerNames is None or isinstance(playerNames, (list, tuple)))
+        assert(isinstance(onlyWinners, bool))
+
+        self.combos = [list(combo) for combo in (combos if combos is not None else StreetFighter2Discretizer.DEFAULT_COMBOS)]
+        self.playerNames = list(playerNames) if playerNames is not None else None
+        self.onlyWinners = onlyWinners
+        self.verbose = verbose
+        self.infos = []
+        self.actions = []
+
+    def addDemonstrations(self, infos, actions):
+        """
+        Adds decisions to the set
+
+        Parameters
+        ----------
+        infos
+            A list of the RAM info dictionary of every decision, seen from player 1's side
+
+        actions
+            A list of the combo picked at every decision
+
+        Returns
+        -------
+        None
+        """
+        assert(len(infos) == len(actions))
+        assert(all([0 <= action < len(self.combos) for action in actions]))
+        self.infos += list(infos)
+        self.actions += [int(action) for action in actions]
+
+    def addRecording(self, recording):
+        """
+        Replays a recording and adds the decisions of every side being imitated
+        Only steps chosen by the players are kept, the steps the Lobby filled in while waiting for the round to start are not
+
+        Parameters
+        ----------
+        recording
+            The MatchRecording to replay, it must have been played with the same combos
+
+        Returns
+        -------
+        added
+            Whether the recording was replayed to the end without diverging
+        """
+        assert(recording.__repr__() == "MatchRecording")
+        if (recording.combos if recording.combos is not None else StreetFighter2Discretizer.DEFAULT_COMBOS) != self.combos:
+            print('Skipping recording of {0}, it was played with a different combo table'.format(recording.state))
+            return False
+
+        sides = [side for side in range(recording.getNumberOfPlayers()) if self.isImitated(recording, side)]
+        if len(sides) == 0: return True
+
+        tracker = StreetFighter2PhaseTracker(1)
+        infos, actionable = [], []
+        try:
+            for actions, observation, rewards, done, info in MatchReplayer(recording).iterateSteps():
+                infos.append(info)
+                actionable.append(tracker.update({variable : [info[variable]] for variable in StreetFighter2PhaseTracker.VARIABLES})[0])
+        except RuntimeError as e:
+            print(e)
+            return False
+
+        # The Lobby picks each step's action from the info of the step before, and only asks the players once they have control
+        decisions = [step for step in range(1, len(infos)) if actionable[step - 1]]
+        for side in sides:
+            self.addDemonstrations([infos[step - 1] if side == 0 else Agent.mirrorInfo(infos[step - 1]) for step in decisions],
+                                   recording.actions[decisions, side].tolist())
+        if self.verbose: print('Added {0} decisions from each of {1} sides of {2}'.format(len(decisions), len(sides), recording.state))
+        return True
+
+    def isImitated(self, recording, side):
+        """Returns whether a side of a recording passes the player name and winner filters"""
+        if self.onlyWinners and (side >= len(recording.won) or not recording.won[side]): return False
+        if self.playerNames is None: return True
+        return side < len(recording.players) and recording.players[side]['name'] in self.playerNames
+
+    def addFiles(self, paths, numProcesses= None):
+        """
+        Adds every demonstrations, expert targets and recording file, recordings are replayed in parallel one emulator per process
+
+        Parameters
+        ----------
+        paths
+            A list of file paths or directories whose files are all added
+
+        numProcesses
+            Integer number of recordings replayed at the same time, defaults to the number of cores
+
+        Returns
+        -------
+        None
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path): files += sorted([os.path.join(path, file) for file in os.listdir(path) if file.endswith(BehaviorCloner.FILE_EXTENSION)])
+            else: files.append(path)
+
+        recordings = []
+        for path in files:
+            if BehaviorCloner.isRecording(path): recordings.append(path)
+            else: self.addDemonstrations(*BehaviorCloner.loadDemonstrations(path))
+
+        if len(recordings) == 0: return
+        tasks = [(path, self.combos, self.playerNames, self.onlyWinners) for path in recordings]
+        with multiprocessing.get_context('spawn').Pool(processes= numProcesses) as pool:
+            for infos, actions in pool.map(extractRecording, tasks): self.addDemonstrations(infos, actions)
+
+    def getNumberOfDemonstrations(self):
+        """Getter for the number of decisions in the set"""
+        return len(self.actions)
+
+    def getActionCounts(self):
+        """Returns how many times each combo was picked"""
+        return numpy.bincount(numpy.asarray(self.actions, dtype= numpy.int64), minlength= len(self.combos))
+
+    def save(self, path):
+        """Writes the whole set to one demonstrations file, see saveDemonstrations"""
+        return BehaviorCloner.saveDemonstrations(path, self.infos, self.actions)
+
+    def pretrain(self, agent, epochs= DEFAULT_EPOCHS, batchSize= DEFAULT_BATCH_SIZE):
+        """
+        Trains an Agent to pick the demonstrated combos, logs every epoch to its telemetry and saves it
+
+        Parameters
+        ----------
+        agent
+            The Agent to pretrain, it has to implement cloneBehavior and act in the same combos
+
+        epochs
+            Integer number of passes over the demonstrations
+
+        batchSize
+            Integer number of demonstrations per gradient update
+
+        Returns
+        -------
+        history
+            A list of (loss, accuracy) tuples, one per epoch, accuracy being how often the Agent picked the demonstrated combo
+        """
+        assert(agent.__repr__() == "Agent")
+        assert(not agent.actingOnly)
+        assert(self.getNumberOfDemonstrations() > 0)
+        assert(isinstance(epochs, int) and epochs > 0)
+        assert(isinstance(batchSize, int) and batchSize > 0)
+
+        history = agent.cloneBehavior(self.infos, numpy.asarray(self.actions, dtype= numpy.int64), epochs, batchSize)
+        telemetry = agent.getTelemetry()
+        for epoch, (loss, accuracy) in enumerate(history):
+            telemetry.append('pretraining', epoch= telemetry.getNumberOfRows('pretraining'), samples= self.getNumberOfDemonstrations(), loss= loss, accuracy= accuracy)
+            if self.verbose: print('Pretraining epoch {0} : loss {1} : {2}% of demonstrations matched'.format(epoch, round(loss, 5), round(accuracy * 100, 2)))
+        telemetry.flush()
+        agent.saveModel()
+        return history
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "BehaviorCloner"
+
+"""
+Replays run in separate processes that each host their own emulator.
+extractRecording has to live at module level so pool processes can import it.
+"""
+def extractRecording(task):
+    """
+    Loads and replays one recording, returning the decisions of the sides being imitated
+
+    Parameters
+    ----------
+    task
+        A (path, combos, playerNames, onlyWinners) tuple
+
+    Returns
+    -------
+    infos
+        A list of the RAM info dictionary of every decision
+
+    actions
+        A list of the combo picked at every decision
+    """
+    path, combos, playerNames, onlyWinners = task
+    cloner = BehaviorCloner(combos, playerNames, onlyWinners)
+    cloner.addRecording(MatchRecording.load(path))
+    return cloner.infos, cloner.actions
+
+"""
+Pretrains a DeepQAgent on saved demonstrations, expert targets and recordings, then saves it ready for the Lobby to train on
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Pretrains an agent by behavior cloning recorded human and expert matches.')
+    parser.add_argument('paths', type= str, nargs= '+', help= 'Demonstration, expert target or recording files, or directories of them')
+    parser.add_argument('-n', '--name', type= str, default= None, help= 'Name of the agent to pretrain, an existing model is loaded and trained further')
+    parser.add_argument('-l', '--load', action= 'store_true', help= 'Boolean flag for if the agent\'s existing model should be loaded instead of starting from scratch')
+    parser.add_argument('-e', '--epochs', type= int, default= BehaviorCloner.DEFAULT_EPOCHS, help= 'Number of passes over the demonstrations')
+    parser.add_argument('-pl', '--players', type= str, nargs= '*', default= None, help= 'Only imitate the sides of recordings played by these players')
+    parser.add_argument('-w', '--onlyWinners', action= 'store_true', help= 'Boolean flag for if only the winning side of recordings should be imitated')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of recordings replayed at the same time')
+    parser.add_argument('-ct', '--comboTable', type= str, default= None, help= 'Path of the reduced combo table the demonstrations were played with')
+    args = parser.parse_args()
+
+    combos = Discretizer.loadCombos(args.comboTable) if args.comboTable is not None else None
+    cloner = BehaviorCloner(combos, args.players, args.onlyWinners, verbose= True)
+    cloner.addFiles(args.paths, args.processes)
+    print('{0} demonstrations, combo counts {1}'.format(cloner.getNumberOfDemonstrations(), cloner.getActionCounts().tolist()))
+
+    from DeepQAgent import DeepQAgent
+    agent = DeepQAgent(load= args.load, name= args.name, actionSize= len(cloner.combos))
+    cloner.pretrain(agent, epochs= args.epochs)
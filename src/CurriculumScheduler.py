@@ -0,0 +1,186 @@
+import argparse
+import random
+import math
+
+class CurriculumScheduler():
+    """
+    Chooses which save state a Lobby should load next during a training run.
+    Each state keeps a running win rate and reward trend for the Agent, and states
+    are sampled in proportion to how much the Agent is expected to learn from them.
+    Matchups near a 50% win rate, and matchups whose rewards are still moving,
+    are favored over ones the Agent always wins or always loses.
+    """
+
+    ### Static Variables
+
+    DEFAULT_EXPLORATION = 0.1                                 # Chance of ignoring the learning progress scores and picking a state uniformly
+    DEFAULT_SMOOTHING = 0.2                                   # Weight given to the newest result when updating the running averages
+    DEFAULT_TARGET_WIN_RATE = 0.5                             # The win rate a matchup is considered most useful to train on at
+    DEFAULT_TREND_WEIGHT = 1.0                                # How much a changing reward counts towards a state's score compared to its win rate
+    MIN_SCORE = 0.01                                          # Floor for a state's score so no state is ever starved completely
+
+    ### End of Static Variables
+
+    def __init__(self, states, exploration= DEFAULT_EXPLORATION, smoothing= DEFAULT_SMOOTHING, targetWinRate= DEFAULT_TARGET_WIN_RATE, trendWeight= DEFAULT_TREND_WEIGHT):
+        """
+        Initializes the statistics tracked for every save state
+
+        Parameters
+        ----------
+        states
+            A list of strings of the save state names the scheduler can pick from
+
+        exploration
+            Float between 0 and 1 representing the chance a state is chosen uniformly at random instead of by score
+
+        smoothing
+            Float between 0 and 1 used as the weight of the newest fight in the running win rate and reward averages
+
+        targetWinRate
+            Float between 0 and 1 of the win rate where a state receives the highest score
+
+        trendWeight
+            Float scaling how much the reward trend adds to a state's score
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(states, (list, tuple)) and len(states) > 0)
+        assert(all([isinstance(state, str) for state in states]))
+        assert(0 <= exploration <= 1)
+        assert(0 < smoothing <= 1)
+        assert(0 <= targetWinRate <= 1)
+        assert(trendWeight >= 0)
+
+        self.states = list(states)
+        self.exploration = exploration
+        self.smoothing = smoothing
+        self.targetWinRate = targetWinRate
+        self.trendWeight = trendWeight
+
+        self.numPlayed = {state : 0 for state in self.states}
+        self.numWon = {state : 0 for state in self.states}
+        self.winRates = {state : targetWinRate for state in self.states}            # Unplayed states are assumed to be at the target so they get tried early
+        self.averageRewards = {state : None for state in self.states}
+        self.rewardTrends = {state : 0.0 for state in self.states}
+
+    def recordResult(self, state, won, reward):
+        """
+        Updates the statistics of a state after the Agent finishes fighting in it
+
+        Parameters
+        ----------
+        state
+            String of the save state that was just played
+
+        won
+            Boolean representing whether the Agent won the match
+
+        reward
+            Number representing the total reward the Agent collected over the match
+
+        Returns
+        -------
+        None
+        """
+        assert(state in self.numPlayed)
+        assert(isinstance(won, bool))
+
+        self.numPlayed[state] += 1
+        if won: self.numWon[state] += 1
+
+        self.winRates[state] += self.smoothing * (float(won) - self.winRates[state])
+
+        previousAverage = self.averageRewards[state]
+        if previousAverage is None:
+            self.averageRewards[state] = float(reward)
+        else:
+            self.averageRewards[state] = previousAverage + self.smoothing * (reward - previousAverage)
+            change = self.averageRewards[state] - previousAverage
+            self.rewardTrends[state] += self.smoothing * (change - self.rewardTrends[state])
+
+    def getScore(self, state):
+        """
+        Returns how useful the scheduler expects the next fight in this state to be
+
+        Parameters
+        ----------
+        state
+            String of the save state to score
+
+        Returns
+        -------
+        score
+            A positive float, higher means the state is more likely to be picked
+        """
+        winRate = self.winRates[state]
+        furthestDistance = max(self.targetWinRate, 1 - self.targetWinRate)
+        winRateScore = 1 - abs(winRate - self.targetWinRate) / furthestDistance
+
+        # Normalize the reward trend against the size of the rewards seen in this state so every state is on the same scale
+        averageReward = self.averageRewards[state]
+        scale = abs(averageReward) if averageReward else 1.0
+        trendScore = math.tanh(abs(self.rewardTrends[state]) / max(scale, 1.0))
+
+        return max(winRateScore + self.trendWeight * trendScore, CurriculumScheduler.MIN_SCORE)
+
+    def pickState(self, states= None):
+        """
+        Samples the next save state to play
+
+        Parameters
+        ----------
+        states
+            Optional list of the save states to pick from, each must be one the scheduler tracks
+            If not set every state the scheduler was made with can be picked
+
+        Returns
+        -------
+        state
+            String of the chosen save state
+        """
+        assert(states is None or (isinstance(states, (list, tuple)) and len(states) > 0))
+        if states is None: states = self.states
+        assert(all([state in self.numPlayed for state in states]))
+
+        unplayed = [state for state in states if self.numPlayed[state] == 0]
+        if len(unplayed) > 0: return random.choice(unplayed)
+
+        if random.random() < self.exploration: return random.choice(states)
+
+        scores = [self.getScore(state) for state in states]
+        return random.choices(states, weights= scores)[0]
+
+    def getWinRate(self, state):
+        """Getter for the lifetime win rate of the Agent in a state, None if the state has not been played"""
+        if self.numPlayed[state] == 0: return None
+        return self.numWon[state] / self.numPlayed[state]
+
+    def getStates(self):
+        """Getter for the list of states the scheduler picks from"""
+        return self.states
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "CurriculumScheduler"
+
+"""
+Simulates an Agent whose odds of winning differ per state and prints how often the scheduler picks each one
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Simulates the curriculum scheduler on made up matchups.')
+    parser.add_argument('-f', '--fights', type= int, default= 500, help= 'Number of simulated fights to schedule')
+    args = parser.parse_args()
+
+    odds = {'easy' : 0.95, 'even' : 0.5, 'hard' : 0.05}
+    scheduler = CurriculumScheduler(list(odds.keys()))
+    picks = {state : 0 for state in odds}
+    for fight in range(args.fights):
+        state = scheduler.pickState()
+        picks[state] += 1
+        won = random.random() < odds[state]
+        scheduler.recordResult(state, won, 100 if won else -100)
+
+    for state in odds:
+        print('{0}: picked {1} times, win rate {2}'.format(state, picks[state], scheduler.getWinRate(state)))
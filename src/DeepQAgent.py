@@ -1,14 +1,9 @@
-import argparse, retro, threading, os, numpy, random, math
+import argparse, retro, threading, os, numpy, math
 from Agent import Agent
-from LossHistory import LossHistory
+from ResourceManager import ResourceManager
+from NStepReturns import computeNStepReturns, findRoundBoundaries
 
-import tensorflow as tf
-from tensorflow.keras import Sequential 
-from tensorflow.keras.layers import Dense
-from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.models import load_model
-from tensorflow.keras import backend as K
-import tensorflow.keras.losses
+# TensorFlow is only imported once a network is built or trained, so acting only Agents loading a policy checkpoint never pay for it
 
 from collections import deque
 
@@ -19,6 +14,13 @@ class DeepQAgent(Agent):
     DEFAULT_EPSILON_DECAY = 0.999                             # How fast the exploration rate falls as training persists
     DEFAULT_DISCOUNT_RATE = 0.98                              # How much future rewards influence the current decision of the model
     DEFAULT_LEARNING_RATE = 0.0001
+    DEFAULT_HIDDEN_LAYERS = (48, 96, 192, 96, 48)             # Number of neurons in each hidden layer of the network
+    DEFAULT_N_STEPS = 3                                       # Number of rewards summed into each training target before bootstrapping
+    DEFAULT_BATCH_SIZE = 32                                   # Number of steps per gradient update when training on a fight
+    CLONING_MARGIN = 0.8                                      # How far the demonstrated combo's value is pushed above every other combo's when pretraining
+    PRETRAINED_EPSILON = 0.3                                  # Highest exploration rate left after pretraining, the network already plays sensibly
+
+    WANTS_FRAMES = False                                      # The network only looks at the RAM info so the Lobby can skip storing frames
 
     # Mapping between player state values and their one hot encoding index
     stateIndices = {512 : 0, 514 : 1, 516 : 2, 518 : 3, 520 : 4, 522 : 5, 524 : 6, 526 : 7, 532 : 8} 
@@ -28,6 +30,8 @@ class DeepQAgent(Agent):
 
     def _huber_loss(y_true, y_pred, clip_delta=1.0):
         """Implementation of huber loss to use as the loss function for the model"""
+        import tensorflow as tf
+        from tensorflow.keras import backend as K
         error = y_true - y_pred
         cond  = K.abs(error) <= clip_delta
 
@@ -36,7 +40,8 @@ class DeepQAgent(Agent):
 
         return K.mean(tf.where(cond, squared_loss, quadratic_loss))
 
-    def __init__(self, stateSize= 32, actionSize= 51, load= False, epsilon= 1, name= None, character= "ryu", verbose= True):
+    def __init__(self, stateSize= 32, actionSize= 51, load= False, epsilon= 1, name= None, character= "ryu", learningRate= DEFAULT_LEARNING_RATE, 
+                 discountRate= DEFAULT_DISCOUNT_RATE, epsilonDecay= DEFAULT_EPSILON_DECAY, hiddenLayers= DEFAULT_HIDDEN_LAYERS, nSteps= DEFAULT_N_STEPS, verbose= True, actingOnly= False):
         """Initializes the agent and the underlying neural network
 
         Parameters
@@ -61,23 +66,48 @@ class DeepQAgent(Agent):
         character
             String representing the name of the character this Agent plays as
 
+        learningRate
+            The learning rate of the network's optimizer
+
+        discountRate
+            How much future rewards influence the current decision of the model
+
+        epsilonDecay
+            The factor the exploration rate is multiplied by after every training epoch
+
+        hiddenLayers
+            A list of the number of neurons in each hidden layer of the network
+
+        nSteps
+            The number of rewards summed into each training target before bootstrapping from the network
+
         verbose
             A boolean variable representing whether or not the print statements in the class are turned on
             Error messages however are not turned off
 
+        actingOnly
+            A boolean flag for an Agent that will only play, a loaded Agent then acts from its policy checkpoint without importing TensorFlow
+
         Returns
         -------
         None
         """
+        assert(isinstance(hiddenLayers, (list, tuple)) and len(hiddenLayers) > 0)
+
         self.stateSize = stateSize
         self.actionSize = actionSize
-        self.gamma = DeepQAgent.DEFAULT_DISCOUNT_RATE         # discount rate
+        self.gamma = discountRate                             # discount rate
         if load: self.epsilon = DeepQAgent.EPSILON_MIN        # If the model is already trained lower the exploration rate
         else: self.epsilon = epsilon                          # If the model is not trained set a high initial exploration rate
-        self.epsilonDecay = DeepQAgent.DEFAULT_EPSILON_DECAY  # How fast the exploration rate falls as training persists
-        self.learningRate = DeepQAgent.DEFAULT_LEARNING_RATE 
-        self.lossHistory = LossHistory()
-        super(DeepQAgent, self).__init__(load= load, name= name, character= character, verbose= verbose) 
+        self.epsilonDecay = epsilonDecay                      # How fast the exploration rate falls as training persists
+        self.learningRate = learningRate
+        self.hiddenLayers = list(hiddenLayers)
+        self.nSteps = nSteps
+        self.lossHistory = None
+        if not actingOnly:
+            from LossHistory import LossHistory
+            self.lossHistory = LossHistory()
+        super(DeepQAgent, self).__init__(load= load, name= name, character= character, verbose= verbose, actingOnly= actingOnly) 
 
     def getMove(self, obs, info):
         """Returns a set of button inputs generated by the Agent's network after looking at the current observation
@@ -105,6 +135,30 @@ class DeepQAgent(Agent):
             move = numpy.argmax(predictedRewards)
             return move
 
+    def getMoves(self, observations, infos):
+        """Returns a move for each of several states, every state that is not explored randomly is evaluated in one batched predict
+
+        Parameters
+        ----------
+        observations
+            A list of observations, one per state
+
+        infos
+            A list of RAM info dictionaries, each seen from player 1's side
+
+        Returns
+        -------
+        moves
+            A list of integers representing the move selected for each state
+        """
+        moves = [self.getRandomMove() if numpy.random.rand() <= self.epsilon else None for info in infos]
+        greedy = [index for index, move in enumerate(moves) if move is None]
+        if len(greedy) > 0:
+            stateData = numpy.concatenate([self.prepareNetworkInputs(infos[index]) for index in greedy])
+            predictedRewards = self.model.predict(stateData)
+            for row, index in enumerate(greedy): moves[index] = numpy.argmax(predictedRewards[row])
+        return moves
+
     def initializeNetwork(self):
         """Initializes a Neural Net for a Deep-Q learning Model
         
@@ -117,12 +171,15 @@ class DeepQAgent(Agent):
         model
             The initialized neural network model that Agent will interface with to generate game moves
         """
+        ResourceManager.configureTensorFlow()                                   # TensorFlow's thread pools are sized before the first model is built
+        from tensorflow.keras import Sequential
+        from tensorflow.keras.layers import Dense
+        from tensorflow.keras.optimizers import Adam
+
         model = Sequential()
-        model.add(Dense(48, input_dim= self.stateSize, activation='relu'))
-        model.add(Dense(96, activation='relu'))
-        model.add(Dense(192, activation='relu'))
-        model.add(Dense(96, activation='relu'))
-        model.add(Dense(48, activation='relu'))
+        model.add(Dense(self.hiddenLayers[0], input_dim= self.stateSize, activation='relu'))
+        for layerSize in self.hiddenLayers[1:]:
+            model.add(Dense(layerSize, activation='relu'))
         model.add(Dense(self.actionSize, activation='linear'))
         model.compile(loss=DeepQAgent._huber_loss, optimizer=Adam(lr=self.learningRate))
 
@@ -142,19 +199,25 @@ class DeepQAgent(Agent):
         -------
         data
             The prepared training data in whatever from the model needs to train
-            DeepQ needs a state, action, and reward sequence to train on
-            The observation data is thrown out for this model for training
+            A dictionary of arrays with one row per step: the network inputs, the action taken, the n-step return,
+            the network inputs of the state to bootstrap from, and the discount to apply to the bootstrapped value
+            Rounds are treated as separate episodes so returns never cross a round boundary
+            The observation data is thrown out for this model for training, None if the memory is empty
         """
-        data = []
-        for step in self.memory:
-            data.append(
-            [self.prepareNetworkInputs(step[Agent.STATE_INDEX]), 
-            step[Agent.ACTION_INDEX], 
-            step[Agent.REWARD_INDEX],
-            step[Agent.DONE_INDEX],
-            self.prepareNetworkInputs(step[Agent.NEXT_STATE_INDEX])])
+        steps = list(memory)
+        if len(steps) == 0: return None
+
+        states = numpy.concatenate([self.prepareNetworkInputs(step[Agent.STATE_INDEX]) for step in steps])
+        nextStates = numpy.concatenate([self.prepareNetworkInputs(step[Agent.NEXT_STATE_INDEX]) for step in steps])
+        rewards = numpy.array([step[Agent.REWARD_INDEX] for step in steps], dtype= numpy.float64)
+        terminals = findRoundBoundaries([step[Agent.STATE_INDEX] for step in steps], [step[Agent.NEXT_STATE_INDEX] for step in steps], [step[Agent.DONE_INDEX] for step in steps])
+        returns, bootstrapIndices, bootstrapDiscounts = computeNStepReturns(rewards, terminals, self.gamma, self.nSteps)
 
-        return data
+        return {'states' : states,
+                'actions' : numpy.array([step[Agent.ACTION_INDEX] for step in steps], dtype= numpy.int64),
+                'returns' : returns,
+                'bootstrapStates' : nextStates[bootstrapIndices],
+                'bootstrapDiscounts' : bootstrapDiscounts}
 
     def prepareNetworkInputs(self, step):
         """Generates a feature vector from the current game state information to feed into the network
@@ -213,7 +276,7 @@ class DeepQAgent(Agent):
         Parameters
         ----------
         data
-            The training data for the model to train on, a 2D array of state, action, reward, sequence
+            The training data for the model to train on, as returned by prepareMemoryForTraining
 
         model
             The model to train and return the Agent to continue playing with
@@ -222,23 +285,78 @@ class DeepQAgent(Agent):
         model
             The input model now updated after this round of training on data
         """
-        minibatch = random.sample(data, len(data))
         self.lossHistory.losses_clear()
-        for state, action, reward, done, next_state in minibatch:     
-            modelOutput = model.predict(state)[0]
-            if not done:
-                reward = (reward + self.gamma * numpy.amax(model.predict(next_state)[0]))
+        telemetry = self.getTelemetry()
+        self.lossHistory.attachTelemetry(telemetry, telemetry.getNumberOfRows('fights'))
+        if data is None: return model
 
-            modelOutput[action] = reward
-            modelOutput = numpy.reshape(modelOutput, [1, self.actionSize])
-            model.fit(state, modelOutput, epochs= 1, verbose= 0, callbacks= [self.lossHistory])
+        # Targets for the whole fight are built from two batched predictions instead of two predictions per step
+        targets = model.predict(data['states'], batch_size= DeepQAgent.DEFAULT_BATCH_SIZE)
+        bootstrapValues = numpy.amax(model.predict(data['bootstrapStates'], batch_size= DeepQAgent.DEFAULT_BATCH_SIZE), axis= 1)
+        targets[numpy.arange(len(targets)), data['actions']] = data['returns'] + data['bootstrapDiscounts'] * bootstrapValues
+        model.fit(data['states'], targets, batch_size= DeepQAgent.DEFAULT_BATCH_SIZE, epochs= 1, shuffle= True, verbose= 0, callbacks= [self.lossHistory])
 
         if self.epsilon > DeepQAgent.EPSILON_MIN: self.epsilon *= self.epsilonDecay
         return model
 
-from keras.utils.generic_utils import get_custom_objects
-loss = DeepQAgent._huber_loss
-get_custom_objects().update({"_huber_loss": loss})
+    def cloneBehavior(self, infos, actions, epochs, batchSize):
+        """Pretrains the network to rank the demonstrated combos highest with a large margin loss, as in Deep Q-learning from Demonstrations
+        Each epoch the demonstrated combo's target is raised to CLONING_MARGIN above the best other combo unless it is already that far ahead,
+        every other target is the network's own prediction, so the values keep their scale for the reinforcement learning that follows
+
+        Parameters
+        ----------
+        infos
+            A list of the RAM info dictionary of every demonstrated decision, seen from player 1's side
+
+        actions
+            An array of the combo picked at every decision
+
+        epochs
+            Integer number of passes over the demonstrations
+
+        batchSize
+            Integer number of demonstrations per gradient update
+
+        Returns
+        -------
+        history
+            A list of (loss, accuracy) tuples, one per epoch, accuracy being how often the network already ranked the demonstrated combo first
+        """
+        self.playerNumber = 0                                                                   # Demonstrations are seen from player 1's side
+        states = numpy.concatenate([self.prepareNetworkInputs(info) for info in infos])
+        actions = numpy.asarray(actions, dtype= numpy.int64)
+        rows = numpy.arange(len(actions))
+
+        history = []
+        for epoch in range(epochs):
+            targets = self.model.predict(states, batch_size= batchSize)
+            accuracy = float(numpy.mean(numpy.argmax(targets, axis= 1) == actions))
+            demonstrated = targets[rows, actions].copy()
+            targets[rows, actions] = -numpy.inf
+            targets[rows, actions] = numpy.maximum(demonstrated, numpy.amax(targets, axis= 1) + DeepQAgent.CLONING_MARGIN)
+            result = self.model.fit(states, targets, batch_size= batchSize, epochs= 1, shuffle= True, verbose= 0)
+            history.append((float(result.history['loss'][0]), accuracy))
+
+        self.epsilon = min(self.epsilon, DeepQAgent.PRETRAINED_EPSILON)
+        return history
+
+    def getFightLoss(self):
+        """Returns the mean loss over the batches of the last training epoch"""
+        if self.lossHistory is None: return super(DeepQAgent, self).getFightLoss()
+        return self.lossHistory.getMeanLoss()
+
+    def getPolicyActivations(self):
+        """Returns the activation of every dense layer, relu for the hidden layers and linear for the Q values"""
+        return ['relu'] * len(self.hiddenLayers) + ['linear']
+
+    def getPolicyLayerSizes(self):
+        """Returns the network's input size followed by the size of every hidden layer and the Q value layer"""
+        return [self.stateSize] + self.hiddenLayers + [self.actionSize]
+
+    def getCustomObjects(self):
+        """Returns the huber loss the full model was compiled with so Keras can load it"""
+        return {'_huber_loss' : DeepQAgent._huber_loss}
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description= 'Processes agent parameters.')
@@ -246,10 +364,31 @@ if __name__ == "__main__":
     parser.add_argument('-l', '--load', action= 'store_true', help= 'Boolean flag for if the user wants to load pre-existing weights')
     parser.add_argument('-e', '--episodes', type= int, default= 10, help= 'Intger representing the number of training rounds to go through, checkpoints are made at the end of each episode')
     parser.add_argument('-n', '--name', type= str, default= None, help= 'Name of the instance that will be used when saving the model or it\'s training logs')
+    parser.add_argument('-s', '--shapeRewards', action= 'store_true', help= 'Boolean flag for if rewards should come from the default RewardShaper terms instead of the Lua script')
+    parser.add_argument('-c', '--curriculum', action= 'store_true', help= 'Boolean flag for if the states should be picked by win rate instead of played in order')
+    parser.add_argument('-sp', '--selfPlay', action= 'store_true', help= 'Boolean flag for if the agent should play two player matches against itself, learning from both sides')
+    parser.add_argument('-ct', '--comboTable', type= str, default= None, help= 'Path of a reduced combo table made by the ActionProfiler to use as the action space')
+    parser.add_argument('-pt', '--pretrain', type= str, nargs= '+', default= None, help= 'Demonstration, expert target or recording files, or directories of them, to behavior clone before training')
     args = parser.parse_args()
-    qAgent = DeepQAgent(load= args.load, name= args.name)
-
-    from Lobby import Lobby
-    testLobby = Lobby()
+    from Discretizer import Discretizer, StreetFighter2Discretizer
+    combos = Discretizer.loadCombos(args.comboTable) if args.comboTable is not None else None
+    qAgent = DeepQAgent(load= args.load, name= args.name, actionSize= len(combos if combos is not None else StreetFighter2Discretizer.DEFAULT_COMBOS))
+    if args.pretrain is not None:
+        from BehaviorCloner import BehaviorCloner
+        cloner = BehaviorCloner(combos, verbose= True)
+        cloner.addFiles(args.pretrain)
+        cloner.pretrain(qAgent)
+
+    from Lobby import Lobby, Lobby_Modes
+    rewardShaper = None
+    if args.shapeRewards:
+        from RewardShaper import RewardShaper
+        rewardShaper = RewardShaper()
+    testLobby = Lobby(mode= Lobby_Modes.TWO_PLAYER if args.selfPlay else Lobby_Modes.SINGLE_PLAYER, rewardShaper= rewardShaper, combos= combos)
     testLobby.addPlayer(qAgent)
-    testLobby.executeTrainingRun(episodes= args.episodes, render= args.render)
+    if args.selfPlay: testLobby.addPlayer(qAgent)
+    scheduler = None
+    if args.curriculum:
+        from CurriculumScheduler import CurriculumScheduler
+        scheduler = CurriculumScheduler(testLobby.getSaveStateList())
+    testLobby.executeTrainingRun(episodes= args.episodes, render= args.render, scheduler= scheduler)
@@ -4,9 +4,20 @@ All credit too open-ai's examples: https://github.com/openai/retro/blob/master/r
 """
 
 import gym
+import json
 import numpy as np
 import retro
-import time
+from FrameClock import FrameClock
+import zlib
+from enum import Enum
+
+# The phases a round moves through, subscribers are notified whenever a new phase is entered
+class Round_Phases(Enum):
+    PRE_ROUND = 0                                                                                 # Before the round timer starts counting down
+    FIGHTING = 1                                                                                  # Players have control
+    KO = 2                                                                                        # A player's health has dropped below zero
+    ROUND_END = 3                                                                                 # The knocked out player's health has been reset before the next round
+    MATCH_END = 4                                                                                 # A player has won enough rounds to take the match
 
 class Discretizer(gym.Wrapper):
     """
@@ -15,10 +26,35 @@ class Discretizer(gym.Wrapper):
 
     ### Static Variables
 
-    FRAME_RATE = 1 / 200                                                                          # The time between frames if rendering is enabled
+    DEFAULT_CHECKSUM_INTERVAL = 60                                                                # Number of steps between RAM checksums while recording inputs
+    DEFAULT_COMBO_TABLES_DIR_PATH = '../local_models/combo_tables'                                # Default dir reduced combo tables made by the ActionProfiler are saved in
 
     ### End of Static Variables 
 
+    ### Static methods
+
+    @staticmethod
+    def loadCombos(path):
+        """
+        Reads the list of combos from a combo table, such as the reduced tables written by the ActionProfiler
+
+        Parameters
+        ----------
+        path
+            String path of the JSON combo table
+
+        Returns
+        -------
+        combos
+            A list of lists of button names, to be passed as the combos of a Discretizer
+        """
+        with open(path, 'r') as file:
+            combos = json.load(file)['combos']
+        assert(isinstance(combos, list) and len(combos) > 0)
+        return [list(combo) for combo in combos]
+
+    ### End of static methods
+
     def __init__(self, env, combos):
         """
         Initializes the environment wrapper that discretizes the action space and allows for multiple players
@@ -52,11 +88,103 @@ class Discretizer(gym.Wrapper):
             self._decode_discrete_action.append(arr)
 
         self.action_space = gym.spaces.Discrete(len(self._decode_discrete_action))
+        self.phase = None
+        self.actionable = False
+        self.phaseSubscribers = {phase : [] for phase in Round_Phases}
+        self.actionLog = None
+        self.checksums = None
+        self.checksumInterval = Discretizer.DEFAULT_CHECKSUM_INTERVAL
+        self.renderClock = None                                                                   # Paces direct calls to render, started on the first one
+
+    def subscribe(self, phase, callback):
+        """
+        Registers a function to be called every time the round enters a phase
+
+        Parameters
+        ----------
+        phase
+            The Round_Phases value to listen for
+
+        callback
+            A function taking the phase entered and the info dictionary of the frame it was entered on
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(phase, Round_Phases))
+        self.phaseSubscribers[phase].append(callback)
+
+    def unsubscribeAll(self):
+        """Removes every phase subscription"""
+        self.phaseSubscribers = {phase : [] for phase in Round_Phases}
+
+    def setPhase(self, phase, isActionable, info):
+        """Records the current phase and whether the players have control, notifying the phase's subscribers if it changed"""
+        self.actionable = isActionable
+        if phase is self.phase: return
+        self.phase = phase
+        for callback in self.phaseSubscribers[phase]: callback(phase, info)
+
+    def getPhase(self):
+        """Getter for the phase the round was in on the last frame stepped"""
+        return self.phase
+
+    def isActionable(self):
+        """Getter for whether the players had control on the last frame stepped"""
+        return self.actionable
+
+    def startRecording(self, checksumInterval= DEFAULT_CHECKSUM_INTERVAL):
+        """
+        Starts logging the discrete actions of every step along with periodic checksums of the emulator's RAM
+        Started right after a reset, the log and the save state are enough to play the match back exactly
+
+        Parameters
+        ----------
+        checksumInterval
+            Integer number of steps between RAM checksums
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(checksumInterval, int) and checksumInterval > 0)
+        self.actionLog = []
+        self.checksums = []
+        self.checksumInterval = checksumInterval
+
+    def stopRecording(self):
+        """
+        Stops logging actions
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        actions
+            A list with the tuple of every player's action for each step
+
+        checksums
+            A list of (number of steps taken, RAM checksum) tuples, the last step is always included
+        """
+        actions, checksums = self.actionLog, self.checksums
+        if actions is not None and len(actions) > 0 and (len(checksums) == 0 or checksums[-1][0] != len(actions)):
+            checksums.append((len(actions), self.getRamChecksum()))
+        self.actionLog = None
+        self.checksums = None
+        return actions, checksums
+
+    def getRamChecksum(self):
+        """Returns a CRC32 of the emulator's RAM, used to detect when a replay has drifted from the recorded match"""
+        return zlib.crc32(self.env.unwrapped.get_ram().tobytes())
 
 
     def render(self, mode='human', **kwargs):
         """
-        Renders the current contents of the environment and limits it to human watchable speeds
+        Renders the current contents of the environment and paces the calls to the console's frame rate with a FrameClock
+        The Lobby shows frames through a FrameViewer instead, this is for scripts that step and render the environment themselves
 
         Parameters
         ----------
@@ -86,12 +214,14 @@ class Discretizer(gym.Wrapper):
             A dictionary containing the current metadata extracted from RAM
         """
         returnValues =  self.env.render(mode, **kwargs)
-        time.sleep(Discretizer.FRAME_RATE)
+        if self.renderClock is None: self.renderClock = FrameClock()
+        else: self.renderClock.tick()
         return returnValues
 
     def step(self, actionList):
         """
         Advances a step in the environment given the selected actions
+        The round phase is tracked on every step so subscribers hear about new phases without polling
 
         Parameters
         ----------
@@ -110,6 +240,10 @@ class Discretizer(gym.Wrapper):
             A dictionary containing the current metadata extracted from RAM
         """
         observation, reward, done, info = self.env.step(self.convertActionListToInputs(actionList))
+        self.isActionableState(info)
+        if self.actionLog is not None:
+            self.actionLog.append(tuple(int(action) for action in actionList))
+            if len(self.actionLog) % self.checksumInterval == 0: self.checksums.append((len(self.actionLog), self.getRamChecksum()))
         return observation, self.calculatePlayerRewards(reward), done, info
 
     def convertActionListToInputs(self, actionList):
@@ -176,8 +310,8 @@ class Discretizer(gym.Wrapper):
 
     def isActionableState(self, info):
         """
-        Determines if any players have control over the game in it's current state
-        Can be overwrited by a wrapper discretizer for special conditions in other games
+        Determines if any players have control over the game in it's current state, called by step on every frame
+        Can be overwrited by a wrapper discretizer for special conditions in other games, it should report the result through setPhase
 
         Parameters
         ----------
@@ -195,87 +329,228 @@ class Discretizer(gym.Wrapper):
         """Getter for the list of characters allowed in this game"""
         return self.characterList
 
+    def getCombos(self):
+        """Getter for the list of button combos making up the action space"""
+        return [list(combo) for combo in self._combos]
+
 class StreetFighter2Discretizer(Discretizer):
     """
     Use Street Fighter 2
     based on https://github.com/openai/retro-baselines/blob/master/agents/sonic_util.py
     """
-    def __init__(self, env):
-        self.ROUND_TIMER_NOT_STARTED = 39208      # Stores the round timer value before countdown has begun so the lobby can tell when to start recording steps
-        super().__init__(env=env, combos=[[], 
-                                         ['UP'], 
-                                         ['DOWN'], 
-                                         ['LEFT'], 
-                                         ['UP', 'LEFT'],
-                                         ['DOWN', 'LEFT'],
-                                         ['RIGHT'], 
-                                         ['UP', 'RIGHT'], 
-                                         ['DOWN', 'RIGHT'],
-                                         ['A'],
-                                         ['A', 'UP'],
-                                         ['A', 'DOWN'],
-                                         ['A', 'LEFT'],
-                                         ['A', 'RIGHT'],
-                                         ['A', 'DOWN', 'LEFT'],
-                                         ['A', 'DOWN', 'RIGHT'],
-                                         ['B'],
-                                         ['B', 'UP'],
-                                         ['B', 'DOWN'],
-                                         ['B', 'LEFT'],
-                                         ['B', 'RIGHT'],
-                                         ['B', 'DOWN', 'LEFT'],
-                                         ['B', 'DOWN', 'RIGHT'],
-                                         ['C'],
-                                         ['C', 'UP'],
-                                         ['C', 'DOWN'],
-                                         ['C', 'LEFT'],
-                                         ['C', 'RIGHT'],
-                                         ['C', 'DOWN', 'LEFT'],
-                                         ['C', 'DOWN', 'RIGHT'],
-                                         ['X'],
-                                         ['X', 'UP'],
-                                         ['X', 'DOWN'],
-                                         ['X', 'LEFT'],
-                                         ['X', 'RIGHT'],
-                                         ['X', 'DOWN', 'LEFT'],
-                                         ['X', 'DOWN', 'RIGHT'],
-                                         ['Y'],
-                                         ['Y', 'UP'],
-                                         ['Y', 'DOWN'],
-                                         ['Y', 'LEFT'],
-                                         ['Y', 'RIGHT'],
-                                         ['Y', 'DOWN', 'LEFT'],
-                                         ['Y', 'DOWN', 'RIGHT'],
-                                         ['Z'],
-                                         ['Z', 'UP'],
-                                         ['Z', 'DOWN'],
-                                         ['Z', 'LEFT'],
-                                         ['Z', 'RIGHT'],
-                                         ['Z', 'DOWN', 'LEFT'],
-                                         ['Z', 'DOWN', 'RIGHT']])
+    ROUND_TIMER_NOT_STARTED = 39208      # Stores the round timer value before countdown has begun so the lobby can tell when to start recording steps
+
+    # The full action space, a reduced table from the ActionProfiler can be passed in its place
+    DEFAULT_COMBOS = [[], 
+                      ['UP'], 
+                      ['DOWN'], 
+                      ['LEFT'], 
+                      ['UP', 'LEFT'],
+                      ['DOWN', 'LEFT'],
+                      ['RIGHT'], 
+                      ['UP', 'RIGHT'], 
+                      ['DOWN', 'RIGHT'],
+                      ['A'],
+                      ['A', 'UP'],
+                      ['A', 'DOWN'],
+                      ['A', 'LEFT'],
+                      ['A', 'RIGHT'],
+                      ['A', 'DOWN', 'LEFT'],
+                      ['A', 'DOWN', 'RIGHT'],
+                      ['B'],
+                      ['B', 'UP'],
+                      ['B', 'DOWN'],
+                      ['B', 'LEFT'],
+                      ['B', 'RIGHT'],
+                      ['B', 'DOWN', 'LEFT'],
+                      ['B', 'DOWN', 'RIGHT'],
+                      ['C'],
+                      ['C', 'UP'],
+                      ['C', 'DOWN'],
+                      ['C', 'LEFT'],
+                      ['C', 'RIGHT'],
+                      ['C', 'DOWN', 'LEFT'],
+                      ['C', 'DOWN', 'RIGHT'],
+                      ['X'],
+                      ['X', 'UP'],
+                      ['X', 'DOWN'],
+                      ['X', 'LEFT'],
+                      ['X', 'RIGHT'],
+                      ['X', 'DOWN', 'LEFT'],
+                      ['X', 'DOWN', 'RIGHT'],
+                      ['Y'],
+                      ['Y', 'UP'],
+                      ['Y', 'DOWN'],
+                      ['Y', 'LEFT'],
+                      ['Y', 'RIGHT'],
+                      ['Y', 'DOWN', 'LEFT'],
+                      ['Y', 'DOWN', 'RIGHT'],
+                      ['Z'],
+                      ['Z', 'UP'],
+                      ['Z', 'DOWN'],
+                      ['Z', 'LEFT'],
+                      ['Z', 'RIGHT'],
+                      ['Z', 'DOWN', 'LEFT'],
+                      ['Z', 'DOWN', 'RIGHT']]
+
+    def __init__(self, env, combos= None):
+        """
+        Wraps a Street Fighter 2 environment
+
+        Parameters
+        ----------
+        env
+            The gym environment to wrap around
+
+        combos
+            Optional list of combos to use instead of DEFAULT_COMBOS, see Discretizer.loadCombos
+
+        Returns
+        -------
+        None
+        """
+        self.prevHealths = None
+        super().__init__(env=env, combos=combos if combos is not None else StreetFighter2Discretizer.DEFAULT_COMBOS)
 
 
+    def reset(self, **kwargs):
+        """Resets the environment along with the round phase tracking"""
+        self.prevHealths = None
+        self.phase = None
+        self.actionable = False
+        return self.env.reset(**kwargs)
+
     def isActionableState(self, info):
-        if(not hasattr(self, 'prevHealths')): self.prevHealths = [info['player1_health'], info['player2_health']]
-
-        isActionable = True
-
-        if info['round_timer'] == self.ROUND_TIMER_NOT_STARTED:                                                       
-            isActionable = False
-        elif info['player1_health'] < 0 and info['player2_matches_won'] == 1 and self.prevHealths[0] >= 0: # There is one frame before a player death and the win is counted 
-            isActionable = True
-        elif info['player2_health'] < 0 and info['player1_matches_won'] == 1 and self.prevHealths[1] >= 0: # There is one frame before a player death and the win is counted
-            isActionable = True
-        elif info['player1_health'] < 0 or info['player2_health'] < 0:
-            isActionable = False
-        elif self.prevHealths[0] < 0 and info['player1_health'] == 0:
-            isActionable = False
-        elif self.prevHealths[1] < 0 and info['player2_health'] == 0:
-            isActionable = False
-        
-        self.prevHealths = [info['player1_health'], info['player2_health']]
+        """
+        Advances the round phase tracking by one frame and returns whether the players have control, step calls this on every frame
+        Subscribers are notified whenever the round enters a new phase
+
+        Parameters
+        ----------
+        info
+            Dictionary of the current frame's RAM variables being watched, keyworded values can be found in Data.json
+
+        Returns
+        -------
+        isActionable
+            A boolean variable describing whether the Agent has control over the given state of the game
+        """
+        health1, health2 = info['player1_health'], info['player2_health']
+        if self.prevHealths is None: self.prevHealths = (health1, health2)
+        prevHealth1, prevHealth2 = self.prevHealths
+
+        if info['round_timer'] == self.ROUND_TIMER_NOT_STARTED:
+            phase, isActionable = Round_Phases.PRE_ROUND, False
+        elif health1 < 0 and info['player2_matches_won'] == 1 and prevHealth1 >= 0:   # There is one frame before a player death and the win is counted 
+            phase, isActionable = Round_Phases.KO, True
+        elif health2 < 0 and info['player1_matches_won'] == 1 and prevHealth2 >= 0:   # There is one frame before a player death and the win is counted
+            phase, isActionable = Round_Phases.KO, True
+        elif health1 < 0 or health2 < 0:
+            phase, isActionable = Round_Phases.KO, False
+        elif (prevHealth1 < 0 and health1 == 0) or (prevHealth2 < 0 and health2 == 0):
+            phase, isActionable = Round_Phases.ROUND_END, False
+        else:
+            phase, isActionable = Round_Phases.FIGHTING, True
+
+        if info['player1_matches_won'] == 2 or info['player2_matches_won'] == 2: phase = Round_Phases.MATCH_END
+
+        self.prevHealths = (health1, health2)
+        self.setPhase(phase, isActionable, info)
+        return isActionable
+
+class StreetFighter2PhaseTracker():
+    """
+    Tracks the round phase of many Street Fighter 2 environments at once with numpy arrays,
+    applying the same rules as StreetFighter2Discretizer.isActionableState to every environment per call
+    """
+
+    ### Static Variables
+
+    VARIABLES = ['round_timer', 'player1_health', 'player2_health', 'player1_matches_won', 'player2_matches_won']   # The RAM variables the tracker reads
+
+    ### End of Static Variables
+
+    def __init__(self, numEnvironments):
+        """
+        Initializes the tracked state of every environment
+
+        Parameters
+        ----------
+        numEnvironments
+            Integer number of environments being tracked
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(numEnvironments, int) and numEnvironments > 0)
+
+        self.numEnvironments = numEnvironments
+        self.prevHealths = None
+        self.phases = np.full(numEnvironments, -1, dtype= np.int8)
+        self.enteredPhases = np.zeros(numEnvironments, dtype= bool)
+
+    def reset(self, environments= None):
+        """Forgets the tracked state of the given environment indices, or of every environment if None"""
+        if environments is None: environments = slice(None)
+        if self.prevHealths is not None: self.prevHealths[:, environments] = np.nan
+        self.phases[environments] = -1
+
+    def update(self, columns):
+        """
+        Advances every environment by one frame
+
+        Parameters
+        ----------
+        columns
+            A dictionary from each name in VARIABLES to an array with that variable's value in every environment
+
+        Returns
+        -------
+        isActionable
+            A boolean array of whether the players have control in each environment
+        """
+        timer = np.asarray(columns['round_timer'])
+        healths = np.stack([np.asarray(columns['player1_health'], dtype= np.float64), np.asarray(columns['player2_health'], dtype= np.float64)])
+        matchesWon = np.stack([np.asarray(columns['player1_matches_won']), np.asarray(columns['player2_matches_won'])])
+        if self.prevHealths is None: self.prevHealths = healths.copy()
+        self.prevHealths = np.where(np.isnan(self.prevHealths), healths, self.prevHealths)
+
+        preRound = timer == StreetFighter2Discretizer.ROUND_TIMER_NOT_STARTED
+        lastFrameBeforeWin = ((healths[0] < 0) & (matchesWon[1] == 1) & (self.prevHealths[0] >= 0)) | ((healths[1] < 0) & (matchesWon[0] == 1) & (self.prevHealths[1] >= 0))
+        knockedOut = (healths < 0).any(axis= 0)
+        roundEnd = ((self.prevHealths < 0) & (healths == 0)).any(axis= 0)
+
+        phases = np.select([preRound, knockedOut, roundEnd], [Round_Phases.PRE_ROUND.value, Round_Phases.KO.value, Round_Phases.ROUND_END.value], default= Round_Phases.FIGHTING.value)
+        phases = np.where((matchesWon == 2).any(axis= 0), Round_Phases.MATCH_END.value, phases).astype(np.int8)
+        isActionable = ~preRound & (lastFrameBeforeWin | (~knockedOut & ~roundEnd))
+
+        self.enteredPhases = phases != self.phases
+        self.phases = phases
+        self.prevHealths = healths
         return isActionable
 
+    def getEnvironmentsEntering(self, phase):
+        """
+        Returns the indices of the environments that entered a phase on the last update
+
+        Parameters
+        ----------
+        phase
+            The Round_Phases value to look for
+
+        Returns
+        -------
+        environments
+            A 1D array of environment indices
+        """
+        assert(isinstance(phase, Round_Phases))
+        return np.flatnonzero(self.enteredPhases & (self.phases == phase.value))
+
+    def getPhases(self):
+        """Getter for the array of the current phase value of every environment"""
+        return self.phases
+
 """
 Initializes an example discrete environment and randomly selects moves for the agent to make.
 The meaning of each selected move in terms of what buttons are being pressed is also displayed.
@@ -0,0 +1,108 @@
+import argparse
+import time
+
+class FrameClock():
+    """
+    Paces a loop to a fixed frame rate against a monotonic clock.
+    Deadlines are laid out from when the clock started rather than from when the last frame finished,
+    so time spent emulating or choosing a move is absorbed by a shorter sleep and small errors never add up.
+    A frame that finishes after its deadline is counted as missed, when the loop falls more than a frame behind
+    the schedule is moved forward instead of rushing through the backlog.
+    """
+
+    ### Static Variables
+
+    DEFAULT_FRAME_RATE = 60                                   # Frames per second, the Genesis runs at 60
+    MAX_FRAMES_BEHIND = 1                                     # Frames the loop may fall behind before the schedule is reset to now
+
+    ### End of Static Variables
+
+    def __init__(self, frameRate= DEFAULT_FRAME_RATE):
+        """
+        Sets up the clock, call start right before the first frame
+
+        Parameters
+        ----------
+        frameRate
+            Number of frames per second to pace to
+
+        Returns
+        -------
+        None
+        """
+        assert(frameRate > 0)
+
+        self.framePeriod = 1 / frameRate
+        self.start()
+
+    def start(self):
+        """Lays out the frame deadlines from now and clears the statistics"""
+        self.startTime = time.monotonic()
+        self.nextDeadline = self.startTime + self.framePeriod
+        self.framesTicked = 0
+        self.deadlinesMissed = 0
+        self.totalLateness = 0.0
+
+    def tick(self):
+        """
+        Waits until the current frame's deadline and moves on to the next one
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        late
+            Seconds the frame finished after its deadline, 0 if it was on time
+        """
+        now = time.monotonic()
+        late = now - self.nextDeadline
+        if late <= 0:
+            time.sleep(-late)
+            late = 0.0
+        else:
+            self.deadlinesMissed += 1
+            self.totalLateness += late
+
+        self.framesTicked += 1
+        self.nextDeadline += self.framePeriod
+        if late > FrameClock.MAX_FRAMES_BEHIND * self.framePeriod: self.nextDeadline = now + self.framePeriod
+        return late
+
+    def getDeadlinesMissed(self):
+        """Getter for the number of frames that finished after their deadline"""
+        return self.deadlinesMissed
+
+    def getFramesTicked(self):
+        """Getter for the number of frames paced so far"""
+        return self.framesTicked
+
+    def getAverageLateness(self):
+        """Getter for the mean seconds a missed frame was late by"""
+        return self.totalLateness / self.deadlinesMissed if self.deadlinesMissed > 0 else 0.0
+
+    def getFrameRate(self):
+        """Getter for the frame rate actually achieved since the clock started"""
+        elapsed = time.monotonic() - self.startTime
+        return self.framesTicked / elapsed if elapsed > 0 else 0.0
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "FrameClock"
+
+"""
+Paces a loop whose work takes a random amount of time and reports how closely it kept the target rate
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Paces a simulated game loop to a target frame rate.')
+    parser.add_argument('-r', '--rate', type= float, default= FrameClock.DEFAULT_FRAME_RATE, help= 'Target frames per second')
+    parser.add_argument('-s', '--seconds', type= float, default= 3, help= 'Seconds to run for')
+    args = parser.parse_args()
+
+    import random
+    clock = FrameClock(args.rate)
+    while clock.getFramesTicked() < args.rate * args.seconds:
+        time.sleep(random.uniform(0, 0.8) / args.rate)                                   # Stands in for emulation and picking a move
+        clock.tick()
+    print('Ran at {0} fps, missed {1} of {2} deadlines'.format(round(clock.getFrameRate(), 2), clock.getDeadlinesMissed(), clock.getFramesTicked()))
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import numpy
+from PalettedFrame import PalettedFrame
+
+class FrameCodec():
+    """
+    Converts full RGB game frames into PalettedFrames, a byte per pixel plus a small table of colors.
+    The Genesis draws every frame from a palette of at most 64 colors at a time, so no information is lost.
+    Frames can also be cropped to the playfield listed in the game's scenario.json and downsampled
+    before encoding, which makes the encode itself cheaper as well as the stored frame smaller.
+    Frames that somehow hold more colors than fit in a byte are returned as plain cropped and downsampled arrays.
+    """
+
+    ### Static Variables
+
+    DEFAULT_GAME = 'StreetFighterIISpecialChampionEdition-Genesis'                   # Game whose scenario.json holds the playfield crop
+    MAX_COLORS = 256                                                                  # Most colors a palette index of one byte can address
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def loadCrop(game= DEFAULT_GAME):
+        """
+        Reads the playfield crop of a game from its scenario.json
+
+        Parameters
+        ----------
+        game
+            String of the game directory
+
+        Returns
+        -------
+        crop
+            An (x, y, width, height) tuple, or None if the scenario does not list one
+        """
+        with open(os.path.join('../{0}'.format(game), 'scenario.json'), 'r') as file:
+            crop = json.load(file).get('crop')
+        return tuple(crop) if crop is not None else None
+
+    ### End of static methods
+
+    def __init__(self, crop= None, downsample= 1):
+        """
+        Sets up the codec
+
+        Parameters
+        ----------
+        crop
+            Optional (x, y, width, height) tuple of the region of the frame to keep, see loadCrop
+
+        downsample
+            Integer stride applied to both image axes after cropping, 1 keeps full resolution
+
+        Returns
+        -------
+        None
+        """
+        assert(crop is None or len(crop) == 4)
+        assert(isinstance(downsample, int) and downsample > 0)
+
+        self.crop = crop
+        self.downsample = downsample
+
+    def prepare(self, frame):
+        """Returns a view of the frame with the crop and downsampling applied, nothing is copied"""
+        if self.crop is not None:
+            x, y, width, height = self.crop
+            frame = frame[y:y + height, x:x + width]
+        if self.downsample > 1: frame = frame[::self.downsample, ::self.downsample]
+        return frame
+
+    def encode(self, frame):
+        """
+        Encodes an RGB frame
+
+        Parameters
+        ----------
+        frame
+            A (height, width, 3) uint8 numpy array as returned by the environment
+
+        Returns
+        -------
+        encoded
+            A PalettedFrame, or a contiguous uint8 array if the frame has more than MAX_COLORS colors
+        """
+        assert(isinstance(frame, numpy.ndarray) and frame.ndim == 3 and frame.shape[2] == 3)
+
+        frame = self.prepare(frame)
+        # Each pixel is packed into one integer so the colors can be found in a single pass
+        packed = (frame[..., 0].astype(numpy.uint32) << 16) | (frame[..., 1].astype(numpy.uint32) << 8) | frame[..., 2]
+        colors, indices = numpy.unique(packed, return_inverse= True)
+        if len(colors) > FrameCodec.MAX_COLORS: return numpy.ascontiguousarray(frame)
+
+        palette = numpy.stack([(colors >> 16) & 0xFF, (colors >> 8) & 0xFF, colors & 0xFF], axis= 1).astype(numpy.uint8)
+        return PalettedFrame(indices.reshape(packed.shape).astype(numpy.uint8), palette)
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "FrameCodec"
+
+"""
+Encodes made up frames drawn from a small palette and reports the size and speed
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Encodes random paletted frames and checks they decode exactly.')
+    parser.add_argument('-f', '--frames', type= int, default= 100, help= 'Number of frames to encode')
+    parser.add_argument('-d', '--downsample', type= int, default= 1, help= 'Stride applied after cropping')
+    args = parser.parse_args()
+
+    import time
+    codec = FrameCodec(crop= FrameCodec.loadCrop(), downsample= args.downsample)
+    palette = numpy.random.randint(0, 8, size= (61, 3)).astype(numpy.uint8) * 36
+    frames = [palette[numpy.random.randint(0, len(palette), size= (224, 320))] for frame in range(args.frames)]
+
+    start = time.time()
+    encoded = [codec.encode(frame) for frame in frames]
+    elapsed = time.time() - start
+    assert(all([numpy.array_equal(numpy.asarray(frame), codec.prepare(raw)) for frame, raw in zip(encoded, frames)]))
+    print('Encoded {0} frames in {1} ms each, {2} bytes down to {3}'.format(args.frames, round(elapsed / args.frames * 1000, 3), codec.prepare(frames[0]).nbytes, encoded[0].getNumberOfBytes()))
@@ -0,0 +1,155 @@
+import argparse
+import threading
+import time
+
+class FrameViewer(threading.Thread):
+    """
+    Displays game frames on its own thread so watching a match never slows down the simulation.
+    The Lobby publishes every frame into a single slot buffer and moves on, the viewer
+    wakes up at its own fixed rate and shows whatever the newest frame is, skipping any
+    frames that were published in between.
+    """
+
+    ### Static Variables
+
+    DEFAULT_DISPLAY_RATE = 60                                 # Frames per second the viewer refreshes the window at, the Genesis runs at 60
+    WINDOW_CAPTION = 'Street Fighter AI'                      # Title shown on the viewer window
+
+    ### End of Static Variables
+
+    def __init__(self, displayRate= DEFAULT_DISPLAY_RATE, verbose= False):
+        """
+        Initializes the frame buffer and the viewer thread, call start to open the window
+
+        Parameters
+        ----------
+        displayRate
+            Number of times per second the window is refreshed with the newest frame
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(displayRate > 0)
+
+        self.displayPeriod = 1 / displayRate
+        self.verbose = verbose
+
+        self.frameLock = threading.Lock()
+        self.frame = None
+        self.framesPublished = 0
+        self.framesShown = 0
+        self.framesDropped = 0
+        self.stopEvent = threading.Event()
+
+        super(FrameViewer, self).__init__()
+        self.daemon = True
+
+    def publish(self, frame):
+        """
+        Hands the viewer the newest frame, never blocks on the display
+
+        Parameters
+        ----------
+        frame
+            A 2D numpy array of RGB pixel values, the environment returns a new array every step
+            so the reference is stored without copying
+
+        Returns
+        -------
+        None
+        """
+        with self.frameLock:
+            self.frame = frame
+            self.framesPublished += 1
+
+    def run(self):
+        """
+        Refreshes the window with the latest published frame at the display rate until closed
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        # The window has to be created on the thread that draws to it
+        from gym.envs.classic_control.rendering import SimpleImageViewer
+        viewer = SimpleImageViewer()
+        if self.verbose: print('Viewer window opened')
+
+        lastShown = 0
+        nextRefresh = time.monotonic()
+        while not self.stopEvent.is_set():
+            with self.frameLock:
+                frame = self.frame
+                published = self.framesPublished
+
+            if published != lastShown:
+                viewer.imshow(frame)
+                self.framesShown += 1
+                self.framesDropped += published - lastShown - 1
+                lastShown = published
+
+            nextRefresh += self.displayPeriod
+            delay = nextRefresh - time.monotonic()
+            if delay > 0: self.stopEvent.wait(delay)
+            else: nextRefresh = time.monotonic()                                 # Fell behind, start a fresh schedule instead of rushing to catch up
+
+        viewer.close()
+        if self.verbose: print('Viewer closed after showing {0} frames and dropping {1}'.format(self.framesShown, self.framesDropped))
+
+    def close(self):
+        """
+        Stops the viewer thread and closes the window
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self.stopEvent.set()
+        if self.is_alive(): self.join()
+
+    def getFramesDropped(self):
+        """Getter for the number of published frames that were never displayed"""
+        return self.framesDropped
+
+    def getFramesShown(self):
+        """Getter for the number of frames that were displayed"""
+        return self.framesShown
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "FrameViewer"
+
+"""
+Runs a random agent through a save state as fast as possible while the viewer displays it at a fixed rate
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Runs a random fight with the game rendered off thread.')
+    parser.add_argument('-s', '--state', type= str, default= 'single_player_ryuVSken', help= 'Name of the save state to play')
+    parser.add_argument('-dr', '--displayRate', type= int, default= FrameViewer.DEFAULT_DISPLAY_RATE, help= 'Frames per second the viewer refreshes at')
+    args = parser.parse_args()
+
+    import retro
+    from Discretizer import StreetFighter2Discretizer
+    env = StreetFighter2Discretizer(retro.make(game= 'StreetFighterIISpecialChampionEdition-Genesis', state= args.state))
+    env.reset()
+    viewer = FrameViewer(displayRate= args.displayRate, verbose= True)
+    viewer.start()
+    done = False
+    while not done:
+        obs, _, done, _ = env.step([env.action_space.sample()])
+        viewer.publish(obs)
+    viewer.close()
+    env.close()
@@ -2,12 +2,21 @@
 import threading
 import random 
 import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import retro
+import numpy
 
 # User created libraries
 import Lobby
 import Agent
 import HumanAgent
+from MatchCoordinator import MatchCoordinator
+from MatchWorker import MatchWorker
+from TournamentSnapshotter import TournamentSnapshotter
+from MatchHistory import MatchHistory
+from ResourceManager import ResourceManager
 
 class GameMaster(threading.Thread):
     """
@@ -25,12 +34,23 @@ class GameMaster(threading.Thread):
     CHARACTER_INDEX  = 2                # The name of the character this player will be playing as
     LOAD_INDEX       = 3                # Whether or not to load an existing model 
 
+    DEFAULT_SNAPSHOT_INTERVAL = 1       # Number of rounds between tournament snapshots
+
+    # Static variables used by the continuous scheduler
+    DEFAULT_TRAINING_THREADS = 2        # Number of players that can review their fights at the same time
+    DEFAULT_MATCH_DURATION = 120        # Seconds a player's match is predicted to take before any have been timed
+    DURATION_SMOOTHING = 0.2            # Weight of the newest timing in each player's moving average of match and training durations
+    PAUSE_POLL_DELAY = 0.5              # Seconds between checks of whether a paused tournament has been resumed
+
     ### Static methods
 
     @staticmethod
     def loadPlayers():
         """
         Reads the specified player list and initializes all the players
+        Lines that name the same model for the same class and character share one Agent, listed once per line,
+        so the model can be scheduled to play itself and learn from both sides with one network and one memory
+        Lines left without a model name always get their own Agent
 
         Parameters
         ----------
@@ -42,6 +62,7 @@ class GameMaster(threading.Thread):
             The list of initialized Agents
         """
         players = []
+        sharedPlayers = {}
         with open(GameMaster.PLAYER_ROSTER_PATH, 'r') as roster:
             lines = roster.readlines()
             for line in lines[1:]:
@@ -49,6 +70,10 @@ class GameMaster(threading.Thread):
                 elements = [element.strip() for element in elements]
                 className = elements[GameMaster.CLASS_NAME_INDEX]
                 modelName = elements[GameMaster.MODEL_NAME_INDEX]
+                shareKey = (className, modelName, elements[GameMaster.CHARACTER_INDEX]) if modelName != '' else None
+                if shareKey in sharedPlayers:
+                    players.append(sharedPlayers[shareKey])
+                    continue
                 if modelName == '':
                     modelName = className
                 character = elements[GameMaster.CHARACTER_INDEX]
@@ -64,13 +89,91 @@ class GameMaster(threading.Thread):
                 else:
                     player = Agent.Agent(name= modelName, character= character)
                     players.append(player)
+                if shareKey is not None: sharedPlayers[shareKey] = players[-1]
 
         print(players)
         return players
 
+    @staticmethod
+    def makePlayer(className, modelName, character, load):
+        """
+        Initializes one player from its class name, as done for each line of the roster
+
+        Parameters
+        ----------
+        className
+            Name of the class library to import
+
+        modelName
+            Name of the model used when saving checkpoints
+
+        character
+            The character the player plays as
+
+        load
+            Whether or not to load the player's existing model
+
+        Returns
+        -------
+        player
+            The initialized Agent
+        """
+        if className == "Agent": return Agent.Agent(name= modelName, character= character)
+        playerClass = getattr(__import__(className), className)
+        return playerClass(load= load, name= modelName, character= character)
+
+    @staticmethod
+    def resume(snapshotDir= TournamentSnapshotter.DEFAULT_SNAPSHOT_DIR_PATH, roundsToRun= None, **kwargs):
+        """
+        Rebuilds a tournament from its latest snapshot, reloading every player from its checkpoint
+
+        Parameters
+        ----------
+        snapshotDir
+            String of the directory the tournament's snapshots were saved in, new snapshots keep being saved there
+
+        roundsToRun
+            Int total number of rounds the tournament should run for, counting the rounds already played
+            Defaults to the total the tournament was started with
+
+        kwargs
+            Any other GameMaster constructor arguments
+
+        Returns
+        -------
+        master
+            The GameMaster ready to start playing the round after the snapshot was taken
+        """
+        snapshot = TournamentSnapshotter.loadLatest(snapshotDir)
+        if snapshot is None: raise FileNotFoundError('No tournament snapshot to resume from in {0}'.format(snapshotDir))
+
+        players = []
+        for entry in snapshot['players']:
+            player = GameMaster.makePlayer(entry['className'], entry['name'], entry['character'], os.path.exists(entry['checkpoint']))
+            player.numMatchesPlayed = entry['matchesPlayed']
+            player.numMatchesWon = entry['wins']
+            if entry['epsilon'] is not None: player.epsilon = entry['epsilon']
+            players.append(player)
+
+        if roundsToRun is None: roundsToRun = snapshot['roundsToRun']
+        selfPlayers = [players[index] for index in snapshot.get('selfPlayers', [])]
+        master = GameMaster(players + selfPlayers, roundsToRun= roundsToRun, snapshotDir= snapshotDir, **kwargs)
+        master.roundsRun = snapshot['roundsRun']
+        master.waitingPlayers = [players[index] for index in snapshot['waitingPlayers']]
+        if 'matchesThisTournament' in snapshot:
+            master.matchesThisTournament = {player : matches for player, matches in zip(players, snapshot['matchesThisTournament'])}
+
+        random.setstate((snapshot['randomState'][0], tuple(snapshot['randomState'][1]), snapshot['randomState'][2]))
+        numpyState = snapshot['numpyRandomState']
+        numpy.random.set_state((numpyState[0], numpy.array(numpyState[1], dtype= numpy.uint32), numpyState[2], numpyState[3], numpyState[4]))
+
+        if master.verbose: print('Resuming tournament after round {0}'.format(master.roundsRun))
+        return master
+
     ### End of static methods
 
-    def __init__(self, players, roundsToRun= -1, reviewGames= True, viewGames= True, verbose= False):
+    def __init__(self, players, roundsToRun= -1, reviewGames= True, viewGames= True, workers= None, snapshotDir= None, snapshotInterval= DEFAULT_SNAPSHOT_INTERVAL,
+                 continuous= False, trainingThreads= DEFAULT_TRAINING_THREADS, historyPath= None, resources= None, authkey= None, verbose= False):
         """
         Initializes the Game Master who will organize and execute matches between the players
 
@@ -78,6 +181,7 @@ class GameMaster(threading.Thread):
         ----------
         players
             List of the player Agents participating in the tournament
+            An Agent listed more than once takes a seat in the draw for each listing and may be paired with itself
 
         roundsToRun
             Int representing the number of rounds played, i.e. how many matches each Agent will play
@@ -88,6 +192,35 @@ class GameMaster(threading.Thread):
 
         viewGames
             Bool representing if the environment will be rendered while playing
+            Ignored when matches are played on workers
+
+        workers
+            Optional list of (host, port) tuples of MatchWorker daemons, if given matches are
+            dispatched to them instead of being played on this machine
+
+        snapshotDir
+            Optional string of the directory to save tournament snapshots in, the tournament can be resumed from it with GameMaster.resume
+
+        snapshotInterval
+            Int number of rounds between snapshots
+
+        continuous
+            Bool representing if matches are scheduled continuously instead of in lock step rounds
+            A new match starts as soon as two players are free and players review their fight while others keep playing
+
+        trainingThreads
+            Int number of players that can review their fights at the same time when scheduling continuously
+
+        historyPath
+            Optional string of a SQLite database every match result is written to, the leaderboard commands are answered from it
+
+        resources
+            Optional ResourceManager dividing this machine's cores between the emulator and the training threads
+            Its process budget should be applied before the players are built, see the __main__ block
+            Defaults to one that leaves thread pools and affinity untouched
+
+        authkey
+            Optional bytes shared with the workers to authenticate connections, workers not on a loopback address require it
 
         verbose
             Bool that turns on or off print statements during execution
@@ -101,10 +234,25 @@ class GameMaster(threading.Thread):
         assert(isinstance(roundsToRun, int))
         assert(isinstance(reviewGames, bool))
         assert(isinstance(viewGames, bool))
+        assert(workers is None or isinstance(workers, (list, tuple)))
+        assert(snapshotDir is None or isinstance(snapshotDir, str))
+        assert(isinstance(snapshotInterval, int) and snapshotInterval > 0)
+        assert(isinstance(continuous, bool))
+        assert(isinstance(trainingThreads, int) and trainingThreads > 0)
+        assert(historyPath is None or isinstance(historyPath, str))
+        assert(resources is None or resources.__repr__() == "ResourceManager")
+        assert(authkey is None or isinstance(authkey, bytes))
         assert(isinstance(verbose, bool))
   
+        # Only one emulator can run per process so local matches all share the emulator cores
+        if resources is None: resources = ResourceManager(numEmulators= 1, numLearners= trainingThreads if continuous else 1)
+        self.resources = resources
+
         self.numLobbies = int(len(players) / 2)                      # Make enough lobbies to hold all the players at once 
-        self.openLobbies = [Lobby.Lobby(mode= Lobby.Lobby_Modes.TWO_PLAYER) for i in range(self.numLobbies)]
+        uniquePlayers = [player for playerNum, player in enumerate(players) if player not in players[:playerNum]]
+        self.selfPlayers = [player for player in uniquePlayers if players.count(player) > 1]   # Agents with a second seat in the draw, they can be paired with themselves
+        players = uniquePlayers
+        self.openLobbies = [Lobby.Lobby(mode= Lobby.Lobby_Modes.TWO_PLAYER, cores= self.resources.getEmulatorCores(i)) for i in range(self.numLobbies)]
         self.closedLobbies = []
         
         self.players = players
@@ -119,6 +267,24 @@ class GameMaster(threading.Thread):
 
         self.viewGames = viewGames
 
+        self.coordinator = None
+        if workers is not None: self.coordinator = MatchCoordinator(workers, authkey= authkey, verbose= verbose)
+
+        self.snapshotter = None
+        self.snapshotInterval = snapshotInterval
+        if snapshotDir is not None: self.snapshotter = TournamentSnapshotter(snapshotDir, verbose= verbose)
+
+        self.continuous = continuous
+        self.trainingThreads = trainingThreads
+        self.playersTraining = []
+        self.matchDurations = {}                                     # Moving average of each player's match length in seconds
+        self.trainingDurations = {}                                  # Moving average of how long each player takes to review a fight in seconds
+        self.matchesThisTournament = {}                              # Matches each player has finished, rounds are complete once every player has played them
+        self.idleRecords = {}                                        # Snapshot entry of each player taken as it last left the waiting list, used while it is busy
+
+        self.history = None
+        if historyPath is not None: self.history = MatchHistory(historyPath, verbose= verbose)
+
         self.verbose = verbose
 
         super(GameMaster, self).__init__()
@@ -137,20 +303,237 @@ class GameMaster(threading.Thread):
         -------
         None
         """
-        while self.roundsRun != self.roundsToRun and not self.endTournament:
-            while not self.pauseTournament:
-                self.fillUpLobbies()
-                self.executeMatches()
+        try:
+            if self.continuous:
+                self.runContinuously()
+                return
+
+            while self.roundsRun != self.roundsToRun and not self.endTournament:
+                while not self.pauseTournament:
+                    self.fillUpLobbies()
+                    self.executeMatches()
+
+                    if self.reviewGames:
+                        self.allowPlayersToTrain()
+
+                    self.clearLobbies()
+
+                    if self.snapshotter is not None and self.roundsRun % self.snapshotInterval == 0:
+                        self.snapshotter.save(self.getSnapshot())
+
+                # Stop here if the tournament is put on hold
+                while self.pauseTournament:
+                    pass
+        finally:
+            # Each lobby keeps its viewer open between matches
+            for lobby in self.openLobbies + self.closedLobbies: lobby.closeViewer()
+
+    def runContinuously(self):
+        """
+        Keeps every available emulator busy until each player has played its rounds
+        Matches start as soon as a lobby and two players are free, longest predicted matches first, and each
+        player reviews its fight on a training thread while the other players keep playing
+        Only one emulator can run per process so local matches are played one at a time, with workers each worker plays one
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        numEmulators = 1 if self.coordinator is None else len(self.coordinator.workers)
+        idleLobbies = self.openLobbies[min(numEmulators, len(self.openLobbies)):]
+        for lobby in idleLobbies: self.openLobbies.remove(lobby)
+
+        pending = {}
+        with ThreadPoolExecutor(max_workers= numEmulators) as matchPool, ThreadPoolExecutor(max_workers= self.trainingThreads) as trainingPool:
+            while True:
+                while not self.pauseTournament and not self.endTournament and len(self.openLobbies) > 0:
+                    players = self.pickScheduledPlayers()
+                    if players is None: break
+                    lobby = self.openLobbies[0]
+                    self.addPlayersToLobby(lobby, players)
+                    if self.verbose: print('Now playing: {0} vs {1}'.format(players[0].getName(), players[1].getName()))
+                    pending[matchPool.submit(self.playScheduledMatch, lobby)] = ('match', lobby)
+
+                if len(pending) == 0:
+                    if self.pauseTournament and not self.endTournament:
+                        time.sleep(GameMaster.PAUSE_POLL_DELAY)
+                        continue
+                    break
+
+                finished, _ = wait(list(pending.keys()), timeout= GameMaster.PAUSE_POLL_DELAY, return_when= FIRST_COMPLETED)
+                for future in finished:
+                    kind, item = pending.pop(future)
+                    try: future.result()
+                    except Exception as e: print('Scheduled {0} failed:'.format(kind), e)
+
+                    if kind == 'match':
+                        for player in self.finishScheduledMatch(item):
+                            if self.reviewGames:
+                                self.playersTraining.append(player)
+                                pending[trainingPool.submit(self.trainScheduledPlayer, player)] = ('training', player)
+                            else: self.waitingPlayers.append(player)
+                    else:
+                        self.playersTraining.remove(item)
+                        self.waitingPlayers.append(item)
+                        self.updateRoundsRun()
+
+        self.openLobbies += idleLobbies
+        if self.roundsToRun != -1 and self.roundsRun < self.roundsToRun and not self.endTournament:
+            print('Tournament stopped after {0} of {1} rounds, there were not enough players left to pair up'.format(self.roundsRun, self.roundsToRun))
+
+    def pickScheduledPlayers(self):
+        """
+        Picks the next pairing out of the free players who still have matches left to play
+        Players who have played the fewest matches go first so rounds complete evenly, among them the player with the
+        longest predicted match is scheduled first so short matches fill in around it, its opponent is picked randomly
+        If only one player still has matches left, as happens with an odd roster, a free player that has finished its rounds fills the other seat
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        players
+            A list of the two Agents to play next, or None if fewer than two players can play
+        """
+        waitingSeats = self.getWaitingSeats()
+        candidates = [player for player in waitingSeats if self.roundsToRun == -1 or self.getMatchesThisTournament(player) < self.roundsToRun]
+        if len(candidates) == 1 and len(waitingSeats) > 1 and len(self.playersInGame + self.playersTraining) == 0:
+            return [candidates[0], random.choice([player for player in waitingSeats if player is not candidates[0]])]
+        if len(candidates) < 2: return None
+
+        candidates.sort(key= lambda player: (self.getMatchesThisTournament(player), -self.predictMatchDuration(player)))
+        player1 = candidates.pop(0)
+        fewestMatches = self.getMatchesThisTournament(candidates[0])
+        player2 = random.choice([player for player in candidates if self.getMatchesThisTournament(player) == fewestMatches])
+        return [player1, player2]
+
+    def playScheduledMatch(self, lobby):
+        """
+        Plays one lobby's match, on a worker if there are any, and times it
+
+        Parameters
+        ----------
+        lobby
+            The full lobby to play
+
+        Returns
+        -------
+        None
+        """
+        start = time.time()
+        if self.coordinator is not None:
+            result = self.coordinator.getResult(self.coordinator.submitMatch(lobby.players, lobby.getSaveStateList()[0]))
+            self.applyRemoteResult(lobby, result)
+        else:
+            lobby.play(state= lobby.getSaveStateList()[0], render= self.viewGames)
+            self.recordMatchHistory(lobby.players, lobby.getMatchWinners(), lobby.getMatchSummary(), time.time() - start)
+        for player in lobby.players: self.matchDurations[player] = self.smoothDuration(self.matchDurations.get(player), time.time() - start)
+
+    def finishScheduledMatch(self, lobby):
+        """
+        Reopens a lobby after its match and counts the match for both players
+
+        Parameters
+        ----------
+        lobby
+            The lobby whose match just finished
+
+        Returns
+        -------
+        players
+            The Agents that played, an Agent that played itself is listed once
+        """
+        players = lobby.getUniquePlayers()
+        lobby.clearLobby()
+        self.setGameStatusToOpen(lobby)
+        for player in players:
+            self.playersInGame.remove(player)
+            self.matchesThisTournament[player] = self.getMatchesThisTournament(player) + 1
+        if not self.reviewGames: self.updateRoundsRun()
+        return players
+
+    def trainScheduledPlayer(self, player):
+        """Has a player review its last fight on a training thread and times it"""
+        start = time.time()
+        player.reviewFight()
+        self.trainingDurations[player] = self.smoothDuration(self.trainingDurations.get(player), time.time() - start)
+
+    def updateRoundsRun(self):
+        """Advances the round count once every player has finished its matches for it, snapshotting as rounds complete"""
+        roundsRun = min([self.getMatchesThisTournament(player) for player in self.players])
+        while self.roundsRun < roundsRun:
+            self.roundsRun += 1
+            if self.verbose: print('Tournament Round {0} Complete'.format(self.roundsRun))
+            if self.snapshotter is not None and self.roundsRun % self.snapshotInterval == 0:
+                self.snapshotter.save(self.getSnapshot())
+
+    def getMatchesThisTournament(self, player):
+        """Getter for the number of matches a player has finished, a resumed tournament counts the rounds it already ran"""
+        return self.matchesThisTournament.get(player, self.roundsRun)
+
+    def predictMatchDuration(self, player):
+        """Returns the moving average of a player's match length, or the default if it has not been timed yet"""
+        return self.matchDurations.get(player, GameMaster.DEFAULT_MATCH_DURATION)
+
+    def smoothDuration(self, average, duration):
+        """Folds a new timing into a moving average, the first timing becomes the average"""
+        if average is None: return duration
+        return (1 - GameMaster.DURATION_SMOOTHING) * average + GameMaster.DURATION_SMOOTHING * duration
+
+    def getSnapshot(self):
+        """
+        Captures the tournament state, only ever from players that are idle
+        Between lock step rounds every player is waiting, when scheduling continuously a player that is still playing or reviewing
+        is captured as it was before its current match, so on resume it plays that match again from its last finished checkpoint
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        snapshot
+            A JSON serializable dictionary of the roster, per player stats and checkpoints, the rounds run, the matches each
+            player has finished, the players that can play themselves, the waiting order and the random number generator states
+        """
+        busyPlayers = self.playersInGame + self.playersTraining
+        players = [self.idleRecords[player] if player in busyPlayers and player in self.idleRecords else self.getIdleRecord(player) for player in self.players]
 
-                if self.reviewGames:
-                    self.allowPlayersToTrain()
+        randomState = random.getstate()
+        numpyState = numpy.random.get_state()
+        return {'roundsRun' : self.roundsRun,
+                'roundsToRun' : self.roundsToRun,
+                'players' : players,
+                'matchesThisTournament' : [record['matchesThisTournament'] for record in players],
+                'selfPlayers' : [self.players.index(player) for player in self.selfPlayers],
+                'waitingPlayers' : [self.players.index(player) for player in self.waitingPlayers + busyPlayers],
+                'randomState' : [randomState[0], list(randomState[1]), randomState[2]],
+                'numpyRandomState' : [numpyState[0], numpyState[1].tolist(), int(numpyState[2]), int(numpyState[3]), float(numpyState[4])]}
 
-                self.clearLobbies()
+    def getIdleRecord(self, player):
+        """
+        Describes a player that is not playing or reviewing a match for a snapshot
 
+        Parameters
+        ----------
+        player
+            The idle Agent
 
-            # Stop here if the tournament is put on hold
-            while self.pauseTournament:
-                pass
+        Returns
+        -------
+        record
+            A JSON serializable dictionary of the player's description, its wins, matches played, exploration rate and matches finished this tournament
+        """
+        record = self.describePlayer(player)
+        record.update({'wins' : player.getNumberOfWins(), 'matchesPlayed' : player.getNumberOfMatchesPlayed(), 'epsilon' : getattr(player, 'epsilon', None),
+                       'matchesThisTournament' : self.getMatchesThisTournament(player)})
+        return record
 
     def fillUpLobbies(self):
         """
@@ -165,13 +548,13 @@ class GameMaster(threading.Thread):
         None
         """
 
-        while len(self.openLobbies) > 0 and len(self.waitingPlayers) >= 2:
+        while len(self.openLobbies) > 0 and len(self.getWaitingSeats()) >= 2:
             players = self.pickTwoWaitingPlayers()            
             self.addPlayersToLobby(self.openLobbies[0], players)
 
     def pickTwoWaitingPlayers(self):
         """
-        Picks two random waiting players to play in the next match
+        Picks two random waiting players to play in the next match, an Agent with two seats may be picked for both
 
         Parameters
         ----------
@@ -182,13 +565,17 @@ class GameMaster(threading.Thread):
         players
             A list containing the two Agents selected to fight
         """
-        tempPlayerList = [player for player in self.waitingPlayers]
+        tempPlayerList = self.getWaitingSeats()
         choiceOne = random.randint(0, len(tempPlayerList) - 1)
         player1 = tempPlayerList.pop(choiceOne)
         choiceTwo = random.randint(0, len(tempPlayerList) - 1)
         player2 = tempPlayerList.pop(choiceTwo)
         return [player1, player2]
 
+    def getWaitingSeats(self):
+        """Returns the waiting players with every Agent that can play itself listed once for each of its two seats"""
+        return self.waitingPlayers + [player for player in self.waitingPlayers if player in self.selfPlayers]
+
     def addPlayersToLobby(self, game, players):
         """
         Add the two selected players to the lobby and close it
@@ -211,7 +598,7 @@ class GameMaster(threading.Thread):
 
         [game.addPlayer(player) for player in players]
         self.setGameToClosed(game)
-        [self.setPlayerStatusToInGame(player) for player in players]
+        [self.setPlayerStatusToInGame(player) for player in game.getUniquePlayers()]
 
     def setGameToClosed(self, game):
         """
@@ -246,6 +633,7 @@ class GameMaster(threading.Thread):
         """
         assert(player.__repr__() == "Agent")
 
+        self.idleRecords[player] = self.getIdleRecord(player)            # Snapshots taken before the player is idle again use this record
         self.playersInGame.append(player)
         self.waitingPlayers.remove(player)
 
@@ -262,13 +650,114 @@ class GameMaster(threading.Thread):
         None
         """
         if self.verbose: print('Beginning Tournament Round {0}..'.format(self.roundsRun + 1))
-        for lobby in self.closedLobbies:
-            state = lobby.getSaveStateList()[0]
-            if self.verbose: print('Now playing: {0} vs {1}'.format(lobby.players[0].getCharacter(), lobby.players[1].getCharacter()))
-            lobby.play(state= state, render= self.viewGames)
+        if self.coordinator is not None: self.executeRemoteMatches()
+        else:
+            for lobby in self.closedLobbies:
+                state = lobby.getSaveStateList()[0]
+                if self.verbose: print('Now playing: {0} vs {1}'.format(lobby.players[0].getCharacter(), lobby.players[1].getCharacter()))
+                start = time.time()
+                lobby.play(state= state, render= self.viewGames)
+                self.recordMatchHistory(lobby.players, lobby.getMatchWinners(), lobby.getMatchSummary(), time.time() - start)
         if self.verbose: print('Tournament Round {0} Complete'.format(self.roundsRun + 1))
         self.roundsRun += 1
 
+    def executeRemoteMatches(self):
+        """
+        Sends every full lobby's match to the workers at once and waits for all of them to finish
+        Each player's recorded trajectory and result are copied back so they can review the fight locally
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        jobs = []
+        for lobby in self.closedLobbies:
+            if self.verbose: print('Dispatching: {0} vs {1}'.format(lobby.players[0].getCharacter(), lobby.players[1].getCharacter()))
+            jobs.append((lobby, self.coordinator.submitMatch(lobby.players, lobby.getSaveStateList()[0])))
+
+        for lobby, job in jobs:
+            self.applyRemoteResult(lobby, self.coordinator.getResult(job))
+
+    def applyRemoteResult(self, lobby, result):
+        """
+        Copies each player's recorded trajectory and result from a worker's match back onto the players
+
+        Parameters
+        ----------
+        lobby
+            The lobby whose match was played on a worker
+
+        result
+            The message returned by MatchCoordinator.getResult
+
+        Returns
+        -------
+        None
+        """
+        if result['type'] != MatchWorker.RESULT_MESSAGE:
+            print('Match {0} vs {1} failed on every worker:'.format(lobby.players[0].getName(), lobby.players[1].getName()), result['error'])
+            return
+
+        # An Agent that played itself gets back one trajectory holding both sides, seen from player 1's side
+        for playerNum, player in enumerate(lobby.getUniquePlayers()):
+            player.memory = player.makeMemory(result['trajectories'][playerNum])
+            player.playerNumber = playerNum
+            player.numMatchesPlayed += 1
+            player.lastFightWon = result['won'][playerNum]
+            if result['won'][playerNum]: player.numMatchesWon += 1
+        self.recordMatchHistory(lobby.players, result['won'], result['summary'], result['duration'])
+
+    def recordMatchHistory(self, players, won, summary, duration):
+        """
+        Queues a finished match to be written to the match history, if the tournament keeps one
+
+        Parameters
+        ----------
+        players
+            The two Agents that played, in player order
+
+        won
+            A list of whether each player won
+
+        summary
+            The match summary returned by Lobby.getMatchSummary
+
+        duration
+            Float of the seconds the match took
+
+        Returns
+        -------
+        None
+        """
+        if self.history is None: return
+        self.history.recordMatch(summary['state'], [self.describePlayer(player) for player in players], won, summary['roundsWon'], summary['finalHealths'],
+                                 summary['damageTaken'], duration= duration, steps= summary['steps'], roundNumber= self.roundsRun + 1)
+
+    def describePlayer(self, player):
+        """
+        Describes who a player is and which checkpoint it is playing with
+
+        Parameters
+        ----------
+        player
+            The Agent to describe
+
+        Returns
+        -------
+        description
+            A JSON serializable dictionary of the player's class, name, character, checkpoint path and the checkpoint's modification time
+        """
+        checkpoint = player.getCheckpointPath()
+        return {'className' : player.__class__.__name__,
+                'name' : player.getName(),
+                'character' : player.getCharacter(),
+                'checkpoint' : checkpoint,
+                'checkpointTime' : os.path.getmtime(checkpoint) if os.path.exists(checkpoint) else None}
+
     def allowPlayersToTrain(self):
         """
         Runs through each player and has them review their last fight
@@ -315,7 +804,7 @@ class GameMaster(threading.Thread):
         """
         assert(game.__repr__() == "Lobby")
     
-        [self.setPlayerStatusToWaiting(player) for player in game.players]
+        [self.setPlayerStatusToWaiting(player) for player in game.getUniquePlayers()]
         game.clearLobby()
         self.setGameStatusToOpen(game)
 
@@ -400,6 +889,20 @@ class GameMaster(threading.Thread):
                 print("Match lineup for round {0}:".format(self.roundsRun + 1))
                 for i, lobby in enumerate(lobbies):
                     print("Game {0}: {1} vs {2}".format(i + 1, lobby.players[0].getCharacter(), lobby.players[1].getCharacter()))
+            elif (command == "view wins" or command == "vw") and self.history is not None:
+                print("Tournament Leaderboard:")
+                for leaderBoardIndex, (name, character, wins, played) in enumerate(self.history.getLeaderboard()):
+                    print("{0}. {1} playing {2} : {3} wins : {4}% win percentage".format(leaderBoardIndex + 1, name, character, wins, round(wins / played * 100, 2)))
+            elif command.startswith("view head to head ") or command.startswith("vh "):
+                prefix = "vh " if command.startswith("vh ") else "view head to head "
+                names = command[len(prefix):].split()
+                if self.history is None or len(names) != 2: print("Head to head records need a match history and two player names, e.g. vh player1 player2")
+                else:
+                    wins, losses, played = self.history.getHeadToHead(names[0], names[1])
+                    print("{0} {1} - {2} {3} in {4} matches".format(names[0], wins, losses, names[1], played))
+            elif (command == "view characters" or command == "vc") and self.history is not None:
+                for character, wins, played in self.history.getCharacterRecords():
+                    print("{0} : {1} wins : {2}% win percentage".format(character, wins, round(wins / played * 100, 2)))
             elif command == "view wins" or command == "vw":
                 sortedPlayerList = [player for player in master.players]
                 sortedPlayerList.sort(reverse= True, key= lambda x: x.getNumberOfWins())
@@ -429,16 +932,42 @@ if __name__ == "__main__":
     parser.add_argument('-rg', '--reviewGames', action= 'store_true', help= 'Boolean represnting whether or not Agents should train after a match')
     parser.add_argument('-v', '--visualize', action= 'store_true', help= 'set this flag to turn on the game visualization. this turns off paralization')
     parser.add_argument('-vb', '--verbose', action= 'store_true', help= 'set this flag to turn on print statements during execution')
+    parser.add_argument('-w', '--workers', type= str, default= None, help= 'Comma separated host:port list of MatchWorker daemons to play the matches on')
+    parser.add_argument('-k', '--authkey', type= str, default= None, help= 'Shared secret the workers were started with')
+    parser.add_argument('-sd', '--snapshotDir', type= str, default= None, help= 'Directory to save tournament snapshots in so the tournament can be resumed')
+    parser.add_argument('-rs', '--resume', action= 'store_true', help= 'Resume the tournament from the latest snapshot in the snapshot directory')
+    parser.add_argument('-c', '--continuous', action= 'store_true', help= 'Start matches as soon as players are free instead of playing in lock step rounds')
+    parser.add_argument('-tt', '--trainingThreads', type= int, default= GameMaster.DEFAULT_TRAINING_THREADS, help= 'Number of players that can review their fights at the same time when scheduling continuously')
+    parser.add_argument('-ls', '--learnerShare', type= float, default= ResourceManager.DEFAULT_LEARNER_SHARE, help= 'Fraction of the cores given to training, the rest run the emulator')
+    parser.add_argument('-pt', '--pinThreads', action= 'store_true', help= 'Pin TensorFlow to the training cores and the emulator to the rest')
+    parser.add_argument('-mh', '--matchHistory', type= str, default= MatchHistory.DEFAULT_DATABASE_PATH, help= 'SQLite database every match result is written to and the leaderboard is read from')
     args = parser.parse_args()
 
+    # The thread budget has to be in place before any player builds its network, it pins this thread and so TensorFlow's pools to the learner cores
+    resources = ResourceManager(numEmulators= 1, numLearners= args.trainingThreads if args.continuous else 1, learnerShare= args.learnerShare, pinThreads= args.pinThreads)
+    ResourceManager.applyBudget(resources.getProcessBudget())
+
+    workers = None
+    if args.workers is not None: workers = [(address.split(':')[0], int(address.split(':')[1])) for address in args.workers.split(',')]
+    authkey = args.authkey.encode() if args.authkey is not None else None
+
+    if args.resume:
+        if args.snapshotDir is None: args.snapshotDir = TournamentSnapshotter.DEFAULT_SNAPSHOT_DIR_PATH
+        master = GameMaster.resume(args.snapshotDir, reviewGames= args.reviewGames, viewGames= args.visualize, workers= workers, continuous= args.continuous, trainingThreads= args.trainingThreads,
+                                   historyPath= args.matchHistory, resources= resources, authkey= authkey, verbose= args.verbose)
+        master.start()
+        master.openUserTerminal()
+        exit()
+
     if not args.loadPlayers: 
         characters = ['ryu', 'blanka', 'guile', 'ehonda', 'ken', 'chunli', 'zangief', 'dhalsim']
         players = [Agent.Agent(character= characters[x % len(characters)]) for x in range(args.numPlayers)]
         players[0] = HumanAgent.HumanAgent()
     else:
         players = GameMaster.loadPlayers()
-    
-    master = GameMaster(players, roundsToRun= args.rounds, reviewGames= args.reviewGames, viewGames= args.visualize, verbose= args.verbose)
+
+    master = GameMaster(players, roundsToRun= args.rounds, reviewGames= args.reviewGames, viewGames= args.visualize, workers= workers, snapshotDir= args.snapshotDir, continuous= args.continuous,
+                        trainingThreads= args.trainingThreads, historyPath= args.matchHistory, resources= resources, authkey= authkey, verbose= args.verbose)
     master.start()
 
     master.openUserTerminal()
@@ -11,12 +11,15 @@ from collections import deque
 
 import Agent
 import Discretizer
+from BehaviorCloner import BehaviorCloner
+from ActionTable import buildActionTable
 
 class HumanAgent(Agent.Agent):
     """ 
     Human playable agent that can be thrown into tournaments to help train or for fun
     """
 
+    # Index of each button in the Genesis controller's button list, also used as that button's bit in the held button mask
     Z_INDEX = 1
     X_INDEX = 0
     C_INDEX = 8
@@ -30,7 +33,12 @@ class HumanAgent(Agent.Agent):
     keyToIndexDict = {'z' : Z_INDEX, 'x' : X_INDEX , 'c' : C_INDEX, 'a' : A_INDEX, 's' : S_INDEX, 'd' : D_INDEX, "left" : LEFT_INDEX, "right" : RIGHT_INDEX, "up" : UP_INDEX, "down" : DOWN_INDEX}
     keysToControllerInputDict = {'z' : 'A', 'x' : 'B' , 'c' : 'C', 'a' : 'X', 's' : 'Y', 'd' : 'Z', "left" : "LEFT", "right" : "RIGHT", "up" : "UP", "down" : "DOWN"}
 
-    def __init__(self, load= False, name= None, character= "ryu", verbose= True):
+    actionTables = {}                                         # Lookup tables from held button mask to action, cached by button list and combo list so they are only built once
+
+    WANTS_FRAMES = False                                      # The human watches the rendered game so no frames need to be passed or stored
+    REAL_TIME = True                                          # A human can only keep up with the game at the console's own speed
+
+    def __init__(self, load= False, name= None, character= "ryu", verbose= True, saveDemonstrations= True, actingOnly= False):
         """
         Initializes the agent and the underlying neural network
         
@@ -48,12 +56,20 @@ class HumanAgent(Agent.Agent):
             A boolean variable representing whether or not the print statements in the class are turned on
             Error messages however are not turned off
 
+        saveDemonstrations
+            A boolean flag for whether the human's decisions are saved after every fight for a BehaviorCloner to pretrain other Agents on
+
+        actingOnly
+            A boolean flag for Agents that will only play and never train, accepted so a HumanAgent can be built like any other player
+
         Returns
         -------
         None
         """
-        self.userInput = [0] * 12
-        super().__init__(load, name, character, verbose)
+        self.saveDemonstrations = saveDemonstrations
+        self.heldButtons = 0                                  # Bitmask of the buttons currently held, bit i is set if button i of the controller is held
+        self.actionTable = None
+        super().__init__(load, name, character, verbose, actingOnly)
         self.bindKeyEvents()
 
         if self.__class__.__name__ != "Agent":
@@ -61,15 +77,13 @@ class HumanAgent(Agent.Agent):
             elif load: self.loadModel()
 
 
-    def saveModel(self, lossUpdate= None):
+    def saveModel(self):
         """
         Saves the currently trained model in the default naming convention ../local_models/{Class_Name}/{Class_Name}.model
         
         Parameters
         ----------
-        lossUpdate
-            An integer value representing the mean loss after one training epoch,
-            will be logged in this model's training log if supplied
+        None
 
         Returns
         -------
@@ -112,14 +126,31 @@ class HumanAgent(Agent.Agent):
         move
             Integer representing the move that was selected from the move list
         """
-        keysPressed = [key for key, value in HumanAgent.keyToIndexDict.items() if self.userInput[value] == 1]
-        controllerInputs = [HumanAgent.keysToControllerInputDict[key] for key in keysPressed]
-        for actionIndex, combo in enumerate(self.environment._combos):
-            truthValues = [button in combo for button in controllerInputs]
-            if all(truthValues): return actionIndex
-        else:
-            return 0
+        return self.actionTable[self.heldButtons]
+
+    def prepareForNextFight(self, env, playerNumber):
+        """
+        Clears the memory of the fighter and looks up the held buttons to action table for the environment's combos
+        
+        Parameters
+        ----------
+        env
+            the environment that the player will be fighting in, used to grab the action space and combo list
+
+        playerNumber
+            Integer representing whether the Agent is player 1(0) or player 2(1)
 
+        Returns
+        -------
+        None
+        """
+        super().prepareForNextFight(env, playerNumber)
+        buttons = tuple(env.unwrapped.buttons)
+        assert(all([buttons[HumanAgent.keyToIndexDict[key]] == button for key, button in HumanAgent.keysToControllerInputDict.items()]))
+        combos = tuple(tuple(combo) for combo in env._combos)
+        if (buttons, combos) not in HumanAgent.actionTables:
+            HumanAgent.actionTables[(buttons, combos)] = buildActionTable(buttons, combos)
+        self.actionTable = HumanAgent.actionTables[(buttons, combos)]
 
     def bindKeyEvents(self):
         hook(self.keyEvent)
@@ -130,32 +161,11 @@ class HumanAgent(Agent.Agent):
         elif event.event_type == KEY_UP:
             self.keyReleased(event)
 
-
     def keyPressed(self, event):
-        try:
-            index = HumanAgent.keyToIndexDict[event.name]
-            self.setUserInputIndex(index)
-        except:
-            pass # Not a valid game input, just ignore
+        if event.name in HumanAgent.keyToIndexDict: self.heldButtons |= 1 << HumanAgent.keyToIndexDict[event.name]
 
     def keyReleased(self, event):
-        try:
-            index = HumanAgent.keyToIndexDict[event.name]
-            self.clearUserInputIndex(index)
-        except:
-            pass # Not a valid game input, just ignore
-
-    def clearUserInputIndex(self, index):
-        self.updateUserInputIndex(index, 0)
-
-    def setUserInputIndex(self, index):
-        self.updateUserInputIndex(index, 1)
-
-    def updateUserInputIndex(self, index, value):
-        if index < 0 or index >= len(self.userInput):
-            return
-        
-        self.userInput[index] = value
+        if event.name in HumanAgent.keyToIndexDict: self.heldButtons &= ~(1 << HumanAgent.keyToIndexDict[event.name])
 
     def initializeNetwork(self):
         """
@@ -174,7 +184,7 @@ class HumanAgent(Agent.Agent):
     
     def prepareMemoryForTraining(self, memory):
         """
-        To be implemented in child class, should prepare the recorded fight sequences into training data
+        Collects the decisions the human made over the fight as demonstrations
         
         Parameters
         ----------
@@ -185,27 +195,34 @@ class HumanAgent(Agent.Agent):
         Returns
         -------
         data
-            The prepared training data
+            A tuple of the RAM info of every step, seen from player 1's side, and the action the human picked on it
+            None if the memory is empty
         """
-        pass
+        steps = list(memory)
+        if len(steps) == 0: return None
+        infos = [step[Agent.Agent.STATE_INDEX] if self.playerNumber == 0 else Agent.Agent.mirrorInfo(step[Agent.Agent.STATE_INDEX]) for step in steps]
+        return infos, [step[Agent.Agent.ACTION_INDEX] for step in steps]
 
     def trainNetwork(self, data, model):
         """
-        To be implemented in child class, Runs through a training epoch reviewing the training data and returns the trained model
+        The human does not train, their decisions are saved to ../local_models/{Model_Name}/demonstrations instead
         
         Parameters
         ----------
         data
-            The training data for the model
+            The demonstrations returned by prepareMemoryForTraining
         model
-            The model for the function to train
+            The Agent's placeholder model
 
         Returns
         -------
         model
-            The newly trained model
+            The same placeholder model
         """
-        pass
+        if data is None or not self.saveDemonstrations: return model
+        path = BehaviorCloner.saveDemonstrations(BehaviorCloner.getDemonstrationsPath(self.name), *data)
+        if self.verbose: print('Saved {0} demonstrations to {1}'.format(len(data[1]), path))
+        return model
 
     ### End of Abstract methods
 
@@ -0,0 +1,276 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import random
+from ResourceManager import ResourceManager
+
+"""
+Trials are run in separate processes that each host their own emulator and TensorFlow runtime.
+runTrial has to live at module level so the spawned processes can import it.
+"""
+def runTrial(task):
+    """
+    Trains one DeepQAgent configuration for a number of episodes, resuming from its last checkpoint if it has one
+
+    Parameters
+    ----------
+    task
+        A dictionary with the keys name, config, episodes, resume, epsilon, character and budget
+
+    Returns
+    -------
+    result
+        A dictionary with the trial name, its win rate and mean reward over the episodes just played, and its epsilon
+    """
+    ResourceManager.applyBudget(task['budget'])                                      # Trials share the machine, so each one's thread pools are capped before TensorFlow starts
+    from DeepQAgent import DeepQAgent
+    from Lobby import Lobby
+
+    config = task['config']
+    agent = DeepQAgent(load= task['resume'], name= task['name'], character= task['character'], verbose= False,
+                       learningRate= config['learningRate'], discountRate= config['discountRate'],
+                       epsilonDecay= config['epsilonDecay'], hiddenLayers= config['hiddenLayers'], nSteps= config['nSteps'])
+    if task['epsilon'] is not None: agent.epsilon = task['epsilon']
+
+    lobby = Lobby(verbose= False)
+    lobby.addPlayer(agent)
+    telemetry = agent.getTelemetry()
+    firstFight = telemetry.getNumberOfRows('fights')
+    lobby.executeTrainingRun(episodes= task['episodes'])
+    telemetry.flush()
+
+    wins = telemetry.query('fights', 'won', firstFight)
+    rewards = telemetry.query('fights', 'reward', firstFight)
+    return {'name' : task['name'],
+            'winRate' : float(wins.mean()) if len(wins) > 0 else 0.0,
+            'meanReward' : float(rewards.mean()) if len(rewards) > 0 else 0.0,
+            'epsilon' : agent.epsilon}
+
+class HyperparameterSweep():
+    """
+    Searches over DeepQAgent hyperparameters by training many configurations at once across a process pool.
+    Trials are trained in rungs, after each rung only the best fraction of trials by win rate keep training
+    (successive halving) so emulator time is not spent on configurations that are clearly behind.
+    Every trial checkpoints into its own local_models subdirectory and the sweep ends with a ranked results table.
+    """
+
+    ### Static Variables
+
+    # The hyperparameters that can be searched over and the value used when a search space leaves them out
+    DEFAULT_CONFIG = {'learningRate' : 0.0001, 'discountRate' : 0.98, 'epsilonDecay' : 0.999, 'hiddenLayers' : [48, 96, 192, 96, 48], 'nSteps' : 3}
+
+    DEFAULT_EPISODES_PER_RUNG = 2                             # Training episodes each surviving trial plays per rung
+    DEFAULT_REDUCTION_FACTOR = 2                              # Only 1 / this many trials move on to the next rung
+    RESULTS_FILE_NAME = '{0}_results.csv'                     # Name of the ranked results table saved in the models dir
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def makeGrid(space):
+        """
+        Expands a search space where every hyperparameter maps to a list of values into every combination
+
+        Parameters
+        ----------
+        space
+            A dictionary from hyperparameter name to a list of values to try
+
+        Returns
+        -------
+        configs
+            A list of configuration dictionaries
+        """
+        names = list(space.keys())
+        return [dict(zip(names, values)) for values in itertools.product(*[space[name] for name in names])]
+
+    @staticmethod
+    def makeRandom(space, numTrials, seed= None):
+        """
+        Samples configurations from a search space where every hyperparameter maps to either a list to choose from
+        or a (low, high) tuple to sample from, tuples of floats are sampled on a log scale
+
+        Parameters
+        ----------
+        space
+            A dictionary from hyperparameter name to a list or a (low, high) tuple
+
+        numTrials
+            Integer number of configurations to sample
+
+        seed
+            Optional seed so a sweep can be reproduced
+
+        Returns
+        -------
+        configs
+            A list of configuration dictionaries
+        """
+        generator = random.Random(seed)
+        configs = []
+        for trial in range(numTrials):
+            config = {}
+            for name, values in space.items():
+                if isinstance(values, list): config[name] = generator.choice(values)
+                elif all([isinstance(value, int) for value in values]): config[name] = generator.randint(*values)
+                else:
+                    low, high = values
+                    config[name] = low * (high / low) ** generator.random()
+            configs.append(config)
+        return configs
+
+    ### End of static methods
+
+    def __init__(self, sweepName, configs, numProcesses= None, episodesPerRung= DEFAULT_EPISODES_PER_RUNG, reductionFactor= DEFAULT_REDUCTION_FACTOR, character= "ryu", verbose= True):
+        """
+        Sets up the trials of the sweep
+
+        Parameters
+        ----------
+        sweepName
+            String used to name each trial's checkpoint directory, trials are saved as {sweepName}_trial{number}
+
+        configs
+            A list of configuration dictionaries, from makeGrid or makeRandom, keys left out use DEFAULT_CONFIG
+
+        numProcesses
+            Integer number of trials trained at the same time, defaults to the number of cores
+
+        episodesPerRung
+            Integer number of training episodes each surviving trial plays per rung
+
+        reductionFactor
+            Integer where only the best 1 / reductionFactor trials move on after each rung
+
+        character
+            String representing the name of the character every trial plays as
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(sweepName, str))
+        assert(isinstance(configs, (list, tuple)) and len(configs) > 0)
+        assert(all([set(config.keys()) <= set(HyperparameterSweep.DEFAULT_CONFIG.keys()) for config in configs]))
+        assert(isinstance(episodesPerRung, int) and episodesPerRung > 0)
+        assert(isinstance(reductionFactor, int) and reductionFactor > 1)
+
+        self.sweepName = sweepName
+        self.numProcesses = numProcesses or multiprocessing.cpu_count()
+        self.episodesPerRung = episodesPerRung
+        self.reductionFactor = reductionFactor
+        self.character = character
+        self.verbose = verbose
+
+        self.trials = []
+        for trialNumber, config in enumerate(configs):
+            fullConfig = dict(HyperparameterSweep.DEFAULT_CONFIG)
+            fullConfig.update(config)
+            self.trials.append({'name' : '{0}_trial{1:03d}'.format(sweepName, trialNumber), 'config' : fullConfig,
+                                'rungsCompleted' : 0, 'winRate' : None, 'meanReward' : None, 'epsilon' : None, 'stopped' : False})
+
+    def run(self):
+        """
+        Trains the trials rung by rung until one trial is left or every trial has been stopped
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        results
+            The ranked results table, see getResults
+        """
+        survivors = list(self.trials)
+        # Trials land on whichever process is free, so they get an even share of the threads rather than fixed cores
+        budget = ResourceManager(numEmulators= self.numProcesses).getWorkerBudget(0, self.numProcesses)
+        # TensorFlow does not survive being forked so trial processes are always spawned fresh
+        with multiprocessing.get_context('spawn').Pool(processes= self.numProcesses, maxtasksperchild= 1) as pool:
+            while len(survivors) > 0:
+                rung = survivors[0]['rungsCompleted']
+                if self.verbose: print('Rung {0}: training {1} trials for {2} episodes each'.format(rung, len(survivors), self.episodesPerRung))
+
+                tasks = [{'name' : trial['name'], 'config' : trial['config'], 'episodes' : self.episodesPerRung, 'resume' : rung > 0,
+                          'epsilon' : trial['epsilon'], 'character' : self.character, 'budget' : budget} for trial in survivors]
+                for trial, result in zip(survivors, pool.map(runTrial, tasks)):
+                    trial.update({'winRate' : result['winRate'], 'meanReward' : result['meanReward'], 'epsilon' : result['epsilon'], 'rungsCompleted' : rung + 1})
+
+                if len(survivors) == 1: break
+                survivors.sort(key= lambda trial: (trial['winRate'], trial['meanReward']), reverse= True)
+                numKept = max(1, len(survivors) // self.reductionFactor)
+                for trial in survivors[numKept:]:
+                    trial['stopped'] = True
+                    if self.verbose: print('Stopping {0} with a win rate of {1}'.format(trial['name'], trial['winRate']))
+                survivors = survivors[:numKept]
+
+        self.saveResults()
+        return self.getResults()
+
+    def getResults(self):
+        """
+        Ranks the trials, trials that trained for more rungs come first and ties are broken by win rate then mean reward
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        results
+            A list of trial dictionaries from best to worst
+        """
+        played = [trial for trial in self.trials if trial['winRate'] is not None]
+        return sorted(played, key= lambda trial: (trial['rungsCompleted'], trial['winRate'], trial['meanReward']), reverse= True)
+
+    def saveResults(self):
+        """Writes the ranked results table as a csv file in the models dir"""
+        from Agent import Agent
+        path = os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, HyperparameterSweep.RESULTS_FILE_NAME.format(self.sweepName))
+        with open(path, 'w', newline= '') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Rank', 'Trial', 'Rungs', 'Win_Rate', 'Mean_Reward'] + list(HyperparameterSweep.DEFAULT_CONFIG.keys()))
+            for rank, trial in enumerate(self.getResults()):
+                writer.writerow([rank + 1, trial['name'], trial['rungsCompleted'], trial['winRate'], trial['meanReward']] + [trial['config'][name] for name in HyperparameterSweep.DEFAULT_CONFIG])
+        if self.verbose: print('Results saved to {0}'.format(path))
+
+    def printResults(self):
+        """Prints the ranked results table"""
+        print('{0:<5}{1:<28}{2:<7}{3:<10}{4:<13}{5}'.format('Rank', 'Trial', 'Rungs', 'Win %', 'Mean Reward', 'Config'))
+        for rank, trial in enumerate(self.getResults()):
+            print('{0:<5}{1:<28}{2:<7}{3:<10}{4:<13}{5}'.format(rank + 1, trial['name'], trial['rungsCompleted'], round(trial['winRate'] * 100, 2), round(trial['meanReward'], 2), trial['config']))
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "HyperparameterSweep"
+
+"""
+Runs a sweep over a search space given as a JSON dictionary, lists are treated as choices and two element lists of numbers as ranges in random search
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Runs a parallel hyperparameter sweep for DeepQAgent.')
+    parser.add_argument('-n', '--name', type= str, default= 'sweep', help= 'Name of the sweep, used to name the trial checkpoints')
+    parser.add_argument('-s', '--space', type= str, default= '{"learningRate": [0.001, 0.0001], "discountRate": [0.95, 0.98], "epsilonDecay": [0.99, 0.999]}', help= 'JSON search space')
+    parser.add_argument('-rs', '--randomSearch', type= int, default= 0, help= 'Number of random configurations to sample, 0 runs the full grid')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of trials to train at the same time')
+    parser.add_argument('-e', '--episodes', type= int, default= HyperparameterSweep.DEFAULT_EPISODES_PER_RUNG, help= 'Training episodes per rung')
+    args = parser.parse_args()
+
+    space = json.loads(args.space)
+    if args.randomSearch > 0:
+        space = {name : tuple(values) if len(values) == 2 and all([isinstance(value, (int, float)) for value in values]) else values for name, values in space.items()}
+        configs = HyperparameterSweep.makeRandom(space, args.randomSearch)
+    else:
+        configs = HyperparameterSweep.makeGrid(space)
+
+    sweep = HyperparameterSweep(args.name, configs, numProcesses= args.processes, episodesPerRung= args.episodes)
+    sweep.run()
+    sweep.printResults()
@@ -2,10 +2,16 @@ import argparse
 import retro
 import os
 import time
+import numpy
 from enum import Enum
 
-from Discretizer import StreetFighter2Discretizer
+from Discretizer import StreetFighter2Discretizer, Round_Phases
 from Agent import Agent
+from FrameViewer import FrameViewer
+from FrameCodec import FrameCodec
+from FrameClock import FrameClock
+from MatchRecording import MatchRecording
+from ResourceManager import ResourceManager
 
 # Used incase too many players are added to the lobby
 class Lobby_Full_Exception(Exception):
@@ -33,7 +39,7 @@ class Lobby():
 
     ### End of Static Variables
 
-    def __init__(self, game= 'StreetFighterIISpecialChampionEdition-Genesis', mode= Lobby_Modes.SINGLE_PLAYER, verbose= True):
+    def __init__(self, game= 'StreetFighterIISpecialChampionEdition-Genesis', mode= Lobby_Modes.SINGLE_PLAYER, rewardShaper= None, combos= None, cores= None, verbose= True):
         """
         Initializes the agent and the underlying neural network
 
@@ -45,6 +51,17 @@ class Lobby():
         mode
             An enum type that describes whether this lobby is for single player or two player matches
 
+        rewardShaper
+            An optional RewardShaper, if given the rewards recorded by each player are recomputed from the RAM info
+            in one pass at the end of every fight instead of coming from the game's Lua reward script
+
+        combos
+            Optional list of button combos making up the action space instead of the discretizer's default, see Discretizer.loadCombos
+            Players' networks must be sized to the number of combos
+
+        cores
+            Optional list of cores the thread playing this lobby's matches is pinned to, see ResourceManager.getEmulatorCores
+
         verbose
             A boolean variable representing whether or not the print statements in the class are turned on
             Error messages however are not turned off
@@ -55,11 +72,20 @@ class Lobby():
         """
         assert(isinstance(game, str))
         assert(isinstance(mode, Lobby_Modes))
+        assert(rewardShaper is None or rewardShaper.__repr__() == "RewardShaper")
+        assert(combos is None or (isinstance(combos, (list, tuple)) and game in Lobby.DISCRETIZERS))
 
         self.game = game
         self.mode = mode
+        self.rewardShaper = rewardShaper
+        self.combos = combos
+        self.cores = cores
+        self.frameCodecs = {}                                                   # Frame codecs by downsample stride and crop, shared by every player subscribed to the same format
+        self.clock = None                                                       # FrameClock pacing the current match, None when it runs uncapped
         self.verbose = verbose
         self.done = True
+        self.environment = None                                                 # Environment of the match being played, closed once it is over
+        self.viewer = None                                                      # FrameViewer shared by every rendered match, see openViewer and closeViewer
         
         self.clearLobby()
 
@@ -86,7 +112,7 @@ class Lobby():
 
         return states
 
-    def initEnvironment(self, state):
+    def initEnvironment(self, state, recordInputs= False):
         """
         Initializes a game environment that the Agent can play a save state in
 
@@ -95,19 +121,21 @@ class Lobby():
         state
             A string of the name of the save state to load into the environment
 
+        recordInputs
+            A boolean flag that specifies whether the discretizer logs every action sent from the reset on
+
         Returns
         -------
         None
         """
         assert(isinstance(state, str))
         assert(os.path.exists(os.path.join('../{0}'.format(self.game), state + '.state')))
+        assert(not recordInputs or self.game in Lobby.DISCRETIZERS)
 
         self.environment = retro.make(game= self.game, state= state, players= self.mode.value)
-        if self.game in Lobby.DISCRETIZERS: self.environment = Lobby.DISCRETIZERS[self.game](self.environment)
+        if self.game in Lobby.DISCRETIZERS: self.environment = Lobby.DISCRETIZERS[self.game](self.environment, combos= self.combos)
         self.environment.reset()                
-        # The initial observation and state info are gathered by doing nothing the first frame and viewing the return data       
-        self.done = False                                        
-        self.lastObservation, _, _, self.lastInfo = self.environment.step([Lobby.NO_ACTION] * self.mode.value)                   
+        if recordInputs: self.environment.startRecording()
 
     def addPlayer(self, newPlayer):
         """
@@ -132,6 +160,14 @@ class Lobby():
 
         raise Lobby_Full_Exception("Lobby has already reached the maximum number of players")
 
+    def isSelfPlay(self):
+        """Returns whether one Agent is playing both sides of a two player match"""
+        return self.mode == Lobby_Modes.TWO_PLAYER and self.players[0] is not None and self.players[0] is self.players[1]
+
+    def getUniquePlayers(self):
+        """Returns the players in the lobby with an Agent playing itself listed once"""
+        return [player for playerNum, player in enumerate(self.players) if player is not None and player not in self.players[:playerNum]]
+
     def clearLobby(self):
         """
         Clears the players currently inside the lobby's play queue
@@ -146,7 +182,7 @@ class Lobby():
         """
         self.players = [None] * self.mode.value
 
-    def play(self, state, render= False):
+    def play(self, state, render= False, record= True, recordInputs= False, realTime= None, startDelay= 0):
         """
         The Agent will load the specified save state and play through it until finished, recording the fight for training
 
@@ -157,6 +193,24 @@ class Lobby():
 
         render
             A boolean flag that specifies whether or not to visually render the game while the Agent is playing
+            Frames are shown by a FrameViewer thread so rendering does not slow down the match
+            The viewer is kept open for the Lobby's later matches, whoever runs the matches closes it with closeViewer
+
+        record
+            A boolean flag that specifies whether the players record each step for training
+            When off nothing is stored, the Lobby only counts wins and the match statistics
+
+        recordInputs
+            A boolean flag that specifies whether to keep a MatchRecording of the match as lastRecording
+            Only the save state, every action sent and periodic RAM checksums are kept, see MatchReplayer
+
+        realTime
+            A boolean flag that specifies whether frames are paced to the console's frame rate by a FrameClock
+            Defaults to pacing only when a player needs real time, like a HumanAgent, so rendered matches between bots still run uncapped
+
+        startDelay
+            Integer number of frames the players sit idle once they first get control, the emulator is deterministic so
+            delaying the players against the CPU is what makes replays of one save state play out differently
 
         Returns
         -------
@@ -165,37 +219,272 @@ class Lobby():
         assert(isinstance(state, str))
         assert(os.path.exists(os.path.join('../{0}'.format(self.game), state + '.state')))
         assert(isinstance(render, bool))
+        assert(isinstance(record, bool))
+        assert(isinstance(recordInputs, bool))
+        assert(realTime is None or isinstance(realTime, bool))
+        assert(isinstance(startDelay, int) and startDelay >= 0)
+        if realTime is None: realTime = any([self.players[playerNum].REAL_TIME for playerNum in range(self.mode.value)])
+
+        previousCores = ResourceManager.pinCurrentThread(self.cores)                # The emulator runs on this Lobby's cores, the thread gets its own back after the match
+        try:
+            self.initEnvironment(state, recordInputs)
+            if render: self.openViewer()
+            selfPlay = self.isSelfPlay()
+            [player.prepareForNextFight(self.environment, playerNum) for playerNum, player in enumerate(self.getUniquePlayers())]
+            for phase in Round_Phases:
+                [self.environment.subscribe(phase, player.onPhaseChange) for player in self.getUniquePlayers()]
+            self.totalRewards = [0] * self.mode.value
+            self.damageTaken = [0, 0]                                               # Tracked for both fighters even in single player mode so damage dealt to the CPU is known
+            self.lastRecording = None
+            self.lastState = state
+            self.numSteps = 0
+            self.clock = FrameClock() if realTime else None
+
+            # The initial observation and state info are gathered by doing nothing the first frame and viewing the return data
+            self.done = False
+            self.lastObservation, _, _, self.lastInfo = self.environment.step([Lobby.NO_ACTION] * self.mode.value)
+            self.waitForActionableState(render)
+            for frame in range(startDelay):
+                if self.done: break
+                obs, _, self.done, info = self.environment.step([Lobby.NO_ACTION] * self.mode.value)
+                if render: self.viewer.publish(obs)
+                if self.clock is not None: self.clock.tick()
+                self.updateMatchStatistics(self.lastInfo, info)
+                self.lastObservation, self.lastInfo = [obs, info]
+            self.waitForActionableState(render)
+
+            mirroredSteps = []                                                      # Player 2's side of a self play match, seen from player 1's side
+            lastPlayerObservations = self.getPlayerObservations(self.lastObservation)
+            while not self.done:
+                # Get moves for each player, in self play both sides are evaluated together
+                if selfPlay: self.lastAction = self.players[0].getMoves(lastPlayerObservations, [self.lastInfo, Agent.mirrorInfo(self.lastInfo)])
+                else: self.lastAction = [self.players[playerNum].getMove(lastPlayerObservations[playerNum], self.lastInfo) for playerNum in range(self.mode.value)]
+
+                # Excute each players moves and calculate rewards
+                obs, self.lastReward, self.done, info = self.environment.step(self.lastAction)
+                if render: self.viewer.publish(obs)
+                if self.clock is not None: self.clock.tick()
+                self.totalRewards = [self.totalRewards[playerNum] + self.lastReward[playerNum] for playerNum in range(self.mode.value)]
+                self.updateMatchStatistics(self.lastInfo, info)
+
+                # Record Results, only handing each player the data they subscribed to
+                playerObservations = self.getPlayerObservations(obs)
+                if record:
+                    for playerNum in range(self.mode.value):
+                        reward = self.lastReward[playerNum] if self.players[playerNum].WANTS_REWARDS else 0
+                        if selfPlay and playerNum == 1:
+                            mirroredSteps.append((lastPlayerObservations[1], Agent.mirrorInfo(self.lastInfo), self.lastAction[1], reward, playerObservations[1], Agent.mirrorInfo(info), self.done))
+                        else:
+                            self.players[playerNum].recordStep((lastPlayerObservations[playerNum], self.lastInfo, self.lastAction[playerNum], reward, playerObservations[playerNum], info, self.done))
+                elif self.done:
+                    self.countWins(self.lastInfo, info)
+                self.lastObservation, self.lastInfo = [obs, info]                   # Overwrite after recording step so Agent remembers the previous state that led to this one
+                lastPlayerObservations = playerObservations
+
+                # If the round is over wait until the next round starts to fight
+                if not self.done:
+                    self.waitForActionableState(render)
+                    lastPlayerObservations = self.getPlayerObservations(self.lastObservation)
+
+            # Player 2's trajectory follows player 1's so returns are still computed over consecutive steps
+            # It is added directly to memory so the mirrored side's result is not counted as a second match
+            if selfPlay and record: self.players[0].memory.extend(mirroredSteps)
+            if self.rewardShaper is not None and record: self.shapeRewards()
+            if recordInputs: self.lastRecording = self.makeRecording(state)
+        finally:
+            # Clean up Environment after the match is over, the viewer stays open for the Lobby's next match
+            if self.environment is not None: self.environment.close()
+            self.environment = None
+            ResourceManager.pinCurrentThread(previousCores)
+        if self.clock is not None and self.verbose:
+            print('Played at {0} fps, missed {1} of {2} frame deadlines'.format(round(self.clock.getFrameRate(), 2), self.clock.getDeadlinesMissed(), self.clock.getFramesTicked()))
+
+    def openViewer(self):
+        """Starts the Lobby's FrameViewer if it is not already showing, every rendered match publishes to the same window"""
+        if self.viewer is not None: return
+        self.viewer = FrameViewer()
+        self.viewer.start()
+
+    def closeViewer(self):
+        """Stops the Lobby's FrameViewer and closes its window, if one is open"""
+        if self.viewer is None: return
+        self.viewer.close()
+        self.viewer = None
+
+    def makeRecording(self, state):
+        """
+        Collects the actions the discretizer logged over the match into a MatchRecording
+
+        Parameters
+        ----------
+        state
+            A string of the name of the save state the match started from
+
+        Returns
+        -------
+        recording
+            The MatchRecording
+        """
+        actions, checksums = self.environment.stopRecording()
+        players = [{'name' : self.players[playerNum].getName(), 'character' : self.players[playerNum].getCharacter()} for playerNum in range(self.mode.value)]
+        return MatchRecording(self.game, state, self.environment.__class__.__name__, actions, checksums, players, self.getMatchWinners(), self.environment.getCombos())
+
+    def getMatchWinners(self):
+        """Returns whether each seat won the last match, read from the RAM so an Agent playing itself is credited for the right side"""
+        return [self.lastInfo['player{0}_matches_won'.format(playerNum + 1)] == 2 for playerNum in range(self.mode.value)]
+
+    def getMatchSummary(self):
+        """
+        Summarizes the last match played for the tournament's match history
 
-        self.initEnvironment(state)
-        [self.players[playerNum].prepareForNextFight(self.environment, playerNum) for playerNum in range(self.mode.value)]
-        self.waitForActionableState(render)
+        Parameters
+        ----------
+        None
 
-        while not self.done:
-            # Get moves for each player
-            self.lastAction = [self.players[playerNum].getMove(self.lastObservation, self.lastInfo) for playerNum in range(self.mode.value)]
+        Returns
+        -------
+        summary
+            A dictionary of the save state, the match length in steps, the damage each fighter took,
+            and each fighter's rounds won and health on the last frame
+        """
+        return {'state' : self.lastState,
+                'steps' : self.numSteps,
+                'damageTaken' : [int(damage) for damage in self.damageTaken],
+                'roundsWon' : [int(self.lastInfo['player{0}_matches_won'.format(fighterNum + 1)]) for fighterNum in range(len(self.damageTaken))],
+                'finalHealths' : [int(self.lastInfo['player{0}_health'.format(fighterNum + 1)]) for fighterNum in range(len(self.damageTaken))]}
 
-            # Excute each players moves and calculate rewards
-            obs, self.lastReward, self.done, info = self.environment.step(self.lastAction)
-            if render: self.environment.render()
+    def updateMatchStatistics(self, lastInfo, info):
+        """
+        Adds one step to the match length and the damage each player has taken
 
-            # Record Results
-            [self.players[playerNum].recordStep((self.lastObservation, self.lastInfo, self.lastAction[playerNum], self.lastReward[playerNum], obs, info, self.done)) for playerNum in range(self.mode.value)]
-            self.lastObservation, self.lastInfo = [obs, info]                   # Overwrite after recording step so Agent remembers the previous state that led to this one
+        Parameters
+        ----------
+        lastInfo
+            Dictionary of the RAM variables before the step
 
-            # If the round is over wait until the next round starts to fight
-            if not self.done: self.waitForActionableState(render)
+        info
+            Dictionary of the RAM variables after the step
 
-        # Clean up Environment after the match is over
-        self.environment.close()
-        if render: self.environment.viewer.close()
+        Returns
+        -------
+        None
+        """
+        self.numSteps += 1
+        for fighterNum in range(len(self.damageTaken)):
+            key = "player{0}_health".format(fighterNum + 1)
+            if info[key] < lastInfo[key]: self.damageTaken[fighterNum] += lastInfo[key] - info[key]
+
+    def countWins(self, lastInfo, info):
+        """
+        Credits the winner of a match that was played without recording, players count their own wins while recording
+
+        Parameters
+        ----------
+        lastInfo
+            Dictionary of the RAM variables before the final step
+
+        info
+            Dictionary of the RAM variables after the final step
+
+        Returns
+        -------
+        None
+        """
+        for playerNum, player in enumerate(self.getUniquePlayers()):
+            key = "player{0}_matches_won".format(playerNum + 1)
+            if info[key] == 2 or lastInfo[key] == 2:
+                player.numMatchesWon += 1
+                player.lastFightWon = True
+
+    def shapeRewards(self):
+        """
+        Replaces the rewards each player recorded over the last fight with the ones computed by the reward shaper
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        # A self play memory holds both sides already seen from player 1's side, so it is rewarded once as player 1
+        for playerNum, player in enumerate(self.getUniquePlayers()):
+            rewards = self.rewardShaper.rewardMemory(player.memory, playerNum, Agent.STATE_INDEX, Agent.NEXT_STATE_INDEX)
+            self.totalRewards[playerNum] = float(rewards.sum())
+            if not player.WANTS_REWARDS: continue
+
+            player.memory.setRewards(rewards)
+
+    def getPlayerObservations(self, obs):
+        """
+        Builds the frame each player subscribed to, players that do not want frames get None
+        Players subscribed to the same frame format share the same frame so it is only formatted once
+
+        Parameters
+        ----------
+        obs
+            The full resolution observation returned by the environment
+
+        Returns
+        -------
+        observations
+            A list with the frame, or None, to hand to each player
+        """
+        framesByFormat = {}
+        observations = []
+        for playerNum in range(self.mode.value):
+            player = self.players[playerNum]
+            if not player.WANTS_FRAMES:
+                observations.append(None)
+                continue
+
+            frameFormat = (player.FRAME_DOWNSAMPLE, player.CROP_FRAMES, player.COMPACT_FRAMES)
+            if frameFormat not in framesByFormat: framesByFormat[frameFormat] = self.formatFrame(obs, *frameFormat)
+            observations.append(framesByFormat[frameFormat])
+
+        return observations
+
+    def formatFrame(self, obs, stride, crop, compact):
+        """
+        Crops, downsamples and encodes a frame the way a player subscribed to
+
+        Parameters
+        ----------
+        obs
+            The full resolution observation returned by the environment
+
+        stride
+            Integer stride applied to both image axes
+
+        crop
+            Whether to crop the frame to the playfield in the game's scenario.json
+
+        compact
+            Whether to encode the frame as a PalettedFrame
+
+        Returns
+        -------
+        frame
+            The formatted frame
+        """
+        if (stride, crop) not in self.frameCodecs:
+            self.frameCodecs[(stride, crop)] = FrameCodec(crop= FrameCodec.loadCrop(self.game) if crop else None, downsample= stride)
+        codec = self.frameCodecs[(stride, crop)]
+
+        if compact: return codec.encode(obs)
+        frame = codec.prepare(obs)
+        # Cropped or downsampled views are copied so recorded steps do not keep the full resolution frame alive
+        return obs if frame is obs else numpy.ascontiguousarray(frame)
 
     def waitForActionableState(self, render= False):
         """
         Waits to start recording training points again until the game is ready
-        This triggers between rounds or before the match has started
+        This triggers between rounds or before the match has started, the frames are skipped without asking the players
+        for moves until they have control again, the environment works that out as it steps so this only reads its flag
         ----------
         render
-            Dictionary of the current RAM variables being wathced, keyworded values can be found in Data.json
+            A boolean flag that specifies whether or not to publish the frames to the Lobby's viewer
 
         Returns
         -------
@@ -203,11 +492,12 @@ class Lobby():
         """
         assert(isinstance(render, bool))
         
-        while not self.environment.isActionableState(self.lastInfo):
+        while not self.environment.isActionable() and not self.done:
             self.lastObservation, _, self.done, self.lastInfo = self.environment.step([Lobby.NO_ACTION] * self.mode.value)
-            if render: self.environment.render()
+            if render: self.viewer.publish(self.lastObservation)
+            if self.clock is not None: self.clock.tick()
 
-    def executeTrainingRun(self, states= None, review= True, episodes= 1, render= False):
+    def executeTrainingRun(self, states= None, review= True, episodes= 1, render= False, scheduler= None):
         """
         The lobby will load each of the saved states to generate data for the agent to train on
         Note: This will only work for single player mode
@@ -226,6 +516,11 @@ class Lobby():
         render
             A boolean flag that specifies whether or not to visually render the game while the Agent is playing
 
+        scheduler
+            An optional CurriculumScheduler that picks which state to play next based on player 1's results
+            If states are given as well it only picks among those, otherwise among all of its own
+            If not set every state is played once per episode in order
+
         Returns
         -------
         None
@@ -235,21 +530,30 @@ class Lobby():
         assert(isinstance(review, bool))
         assert(isinstance(episodes, int))
         assert(isinstance(render, bool))
+        assert(scheduler is None or scheduler.__repr__() == "CurriculumScheduler")
 
         if states is None:                                                      # If no specific states are entered gather all the states of the lobby mode to train on 
-            states = self.getSaveStateList()
-
-        for episodeNumber in range(episodes):
-            if self.verbose: print('Starting episode', episodeNumber)
-            for state in states:
-                if self.verbose: print('Loading {0}..'.format(state))
-                self.play(state= state, render= render)
-            
-                for player in self.players:
-                    if player.__class__.__name__ != "Agent" and review == True: 
-                        player.reviewFight()
-
-            if self.verbose: print('Episode {0} completed'.format(episodeNumber))
+            if scheduler is not None: states = scheduler.getStates()
+            else: states = self.getSaveStateList()
+
+        try:
+            for episodeNumber in range(episodes):
+                if self.verbose: print('Starting episode', episodeNumber)
+                for stateNumber in range(len(states)):
+                    if scheduler is not None: state = scheduler.pickState(states)
+                    else: state = states[stateNumber]
+                    if self.verbose: print('Loading {0}..'.format(state))
+                    winsBefore = self.players[0].getNumberOfWins()
+                    self.play(state= state, render= render)
+                    if scheduler is not None: scheduler.recordResult(state, self.players[0].getNumberOfWins() > winsBefore, self.totalRewards[0])
+                
+                    for player in self.getUniquePlayers():
+                        if player.__class__.__name__ != "Agent" and review == True: 
+                            player.reviewFight()
+
+                if self.verbose: print('Episode {0} completed'.format(episodeNumber))
+        finally:
+            self.closeViewer()
 
     def gameOver(self):
         """Getter to check if the last ran game is complete"""
@@ -1,19 +1,40 @@
 from tensorflow.python import keras
+import numpy
 
 class LossHistory(keras.callbacks.Callback):
     """
     A class for keras to use to store training losses for the model to use:
     1. initialize a LossHistory object inside your agent
     2. and put callbacks= [self.lossHistory] in the model.fit() call
+    Batch losses are streamed into the Agent's TelemetryStore once one is attached,
+    only a running sum is kept in memory to report the mean loss of the current fight
     """
     def __init__(self):
-        self.losses = []
+        self.telemetry = None
+        self.fightNumber = 0
+        self.losses_clear()
+
+    def attachTelemetry(self, telemetry, fightNumber):
+        """Sets the store batch losses are appended to and the fight they belong to"""
+        assert(telemetry.__repr__() == "TelemetryStore")
+        self.telemetry = telemetry
+        self.fightNumber = fightNumber
 
     def on_train_begin(self, logs={}):
         pass
 
     def on_batch_end(self, batch, logs={}):
-        self.losses.append(logs.get('loss'))
+        loss = logs.get('loss')
+        if loss is None: return
+        self.lossSum += loss
+        self.batchCount += 1
+        if self.telemetry is not None: self.telemetry.append('batches', fight= self.fightNumber, batch= self.batchCount - 1, loss= loss)
 
     def losses_clear(self):
-        self.losses = []
\ No newline at end of file
+        self.lossSum = 0.0
+        self.batchCount = 0
+
+    def getMeanLoss(self):
+        """Returns the mean loss of the batches since the last clear, NaN if there were none"""
+        if self.batchCount == 0: return numpy.nan
+        return self.lossSum / self.batchCount
@@ -0,0 +1,275 @@
+import argparse
+import itertools
+import queue
+import threading
+import time
+from multiprocessing.connection import Client
+
+from MatchWorker import MatchWorker
+
+class MatchCoordinator():
+    """
+    Dispatches matches to a set of MatchWorker daemons and collects their results.
+    Each worker is served by its own thread that pulls the next match off a shared queue,
+    so faster workers naturally take on more matches. A worker that stops sending heartbeats
+    or drops its connection has its match put back on the queue for another worker to pick up,
+    and the coordinator keeps trying to reconnect to it in the background.
+    """
+
+    ### Static Variables
+
+    HEARTBEAT_TIMEOUT = 10.0                                  # Seconds without any message from a worker before it is considered dead
+    RECONNECT_DELAY = 5.0                                     # Seconds to wait before trying to reconnect to a dead worker
+    MAX_ATTEMPTS = 3                                          # Number of times a match is dispatched before it is reported as failed
+
+    ### End of Static Variables
+
+    def __init__(self, workers, authkey= None, verbose= False):
+        """
+        Starts a dispatch thread for every worker
+
+        Parameters
+        ----------
+        workers
+            A list of (host, port) tuples of the worker daemons to send matches to
+
+        authkey
+            Bytes shared with the workers to authenticate connections, None only reaches workers on loopback addresses that run without one
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(workers, (list, tuple)) and len(workers) > 0)
+        assert(all([isinstance(host, str) and isinstance(port, int) for host, port in workers]))
+        assert(authkey is None or isinstance(authkey, bytes))
+
+        self.workers = [tuple(worker) for worker in workers]
+        self.authkey = authkey
+        self.verbose = verbose
+
+        self.jobIds = itertools.count()
+        self.pendingJobs = queue.Queue()
+        self.results = {}
+        self.resultsReady = threading.Condition()
+        self.liveWorkers = set()
+        self.shuttingDown = threading.Event()
+
+        self.threads = [threading.Thread(target= self.serveWorker, args= (worker,), daemon= True) for worker in self.workers]
+        [thread.start() for thread in self.threads]
+
+    def submitMatch(self, players, state= None):
+        """
+        Queues a match to be played by the next free worker
+
+        Parameters
+        ----------
+        players
+            The two Agents playing the match, their current policy weights are shipped with the match
+            If both are the same Agent the worker has one Agent play itself too
+
+        state
+            String of the save state to play, if None the worker picks the first state for the matchup
+
+        Returns
+        -------
+        job
+            Integer id used to collect the result with getResult
+        """
+        assert(isinstance(players, (list, tuple)) and len(players) == 2)
+        assert(state is None or isinstance(state, str))
+
+        job = next(self.jobIds)
+        message = {'type' : MatchWorker.MATCH_MESSAGE, 'job' : job, 'state' : state, 'players' : [MatchWorker.makePlayerSpec(player) for player in players],
+                   'selfPlay' : players[0] is players[1]}
+        self.pendingJobs.put((message, 1))
+        return job
+
+    def getResult(self, job, timeout= None):
+        """
+        Blocks until the result of a submitted match is available
+
+        Parameters
+        ----------
+        job
+            Integer id returned by submitMatch
+
+        timeout
+            Seconds to wait before giving up, None waits forever
+
+        Returns
+        -------
+        result
+            The worker's result message, or an error message if every attempt failed
+            None if the timeout ran out first
+        """
+        with self.resultsReady:
+            self.resultsReady.wait_for(lambda: job in self.results, timeout= timeout)
+            return self.results.pop(job, None)
+
+    def serveWorker(self, worker):
+        """
+        Runs on one thread per worker, connecting to it and feeding it matches until shut down
+
+        Parameters
+        ----------
+        worker
+            The (host, port) tuple of the worker
+
+        Returns
+        -------
+        None
+        """
+        while not self.shuttingDown.is_set():
+            try:
+                connection = Client(worker, authkey= self.authkey)
+            except (OSError, EOFError):
+                if self.verbose: print('Could not reach worker {0}:{1}, retrying..'.format(*worker))
+                self.shuttingDown.wait(MatchCoordinator.RECONNECT_DELAY)
+                continue
+
+            self.liveWorkers.add(worker)
+            if self.verbose: print('Connected to worker {0}:{1}'.format(*worker))
+            try:
+                self.feedWorker(worker, connection)
+            finally:
+                self.liveWorkers.discard(worker)
+                connection.close()
+
+    def feedWorker(self, worker, connection):
+        """
+        Sends matches to a connected worker one at a time, requeueing the current match if the worker goes silent
+
+        Parameters
+        ----------
+        worker
+            The (host, port) tuple of the worker
+
+        connection
+            The open multiprocessing Connection to the worker
+
+        Returns
+        -------
+        None
+        """
+        lastHeard = time.time()
+        while not self.shuttingDown.is_set():
+            try:
+                job = self.pendingJobs.get(timeout= MatchWorker.HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                # Drain heartbeats while idle so a dead worker is noticed before it is handed a match
+                try:
+                    while connection.poll(0):
+                        connection.recv()
+                        lastHeard = time.time()
+                except (OSError, EOFError):
+                    lastHeard = 0
+                if time.time() - lastHeard > MatchCoordinator.HEARTBEAT_TIMEOUT:
+                    print('Lost idle worker {0}:{1}'.format(*worker))
+                    return
+                continue
+
+            message, attempt = job
+            try:
+                connection.send(message)
+                reply = self.waitForReply(connection, message['job'])
+            except (OSError, EOFError, TimeoutError) as e:
+                print('Lost worker {0}:{1} during job {2}:'.format(worker[0], worker[1], message['job']), e)
+                self.retryOrFail(message, attempt, repr(e))
+                return
+
+            lastHeard = time.time()
+            if reply['type'] == MatchWorker.ERROR_MESSAGE: self.retryOrFail(message, attempt, reply['error'])
+            else: self.storeResult(reply)
+
+    def waitForReply(self, connection, job):
+        """Reads messages from a worker until the reply for a job arrives, raises TimeoutError if the heartbeats stop"""
+        while True:
+            if not connection.poll(MatchCoordinator.HEARTBEAT_TIMEOUT): raise TimeoutError('no heartbeat for {0} seconds'.format(MatchCoordinator.HEARTBEAT_TIMEOUT))
+            reply = connection.recv()
+            if reply['type'] != MatchWorker.HEARTBEAT_MESSAGE and reply['job'] == job: return reply
+
+    def retryOrFail(self, message, attempt, error):
+        """Puts a failed match back on the queue, or reports it as failed once it is out of attempts"""
+        if attempt < MatchCoordinator.MAX_ATTEMPTS:
+            if self.verbose: print('Requeueing job {0}, attempt {1} failed'.format(message['job'], attempt))
+            self.pendingJobs.put((message, attempt + 1))
+        else:
+            self.storeResult({'type' : MatchWorker.ERROR_MESSAGE, 'job' : message['job'], 'error' : error})
+
+    def storeResult(self, reply):
+        """Hands a finished match to whoever is waiting on it"""
+        with self.resultsReady:
+            self.results[reply['job']] = reply
+            self.resultsReady.notify_all()
+
+    def shutdownWorkers(self):
+        """
+        Tells every connected worker to stop serving and stops the dispatch threads
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        self.shuttingDown.set()
+        [thread.join() for thread in self.threads]
+        for worker in self.workers:
+            try:
+                with Client(worker, authkey= self.authkey) as connection:
+                    connection.send({'type' : MatchWorker.SHUTDOWN_MESSAGE})
+            except (OSError, EOFError):
+                pass
+
+    def getNumberOfLiveWorkers(self):
+        """Getter for the number of workers currently connected"""
+        return len(self.liveWorkers)
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "MatchCoordinator"
+
+"""
+Starts several workers on localhost, kills one partway through, and checks every match still completes
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Runs matches across worker daemons on 127.0.0.1.')
+    parser.add_argument('-w', '--workers', type= int, default= 3, help= 'Number of local workers to start')
+    parser.add_argument('-m', '--matches', type= int, default= 6, help= 'Number of matches to play')
+    parser.add_argument('-p', '--port', type= int, default= MatchWorker.DEFAULT_PORT, help= 'Port of the first worker, the rest count up from it')
+    args = parser.parse_args()
+
+    import multiprocessing
+    import os
+    from Agent import Agent
+    from ResourceManager import ResourceManager
+
+    authkey = os.urandom(16)                                  # A fresh secret for this run, shared with the local workers as they are started
+    addresses = [(MatchWorker.DEFAULT_HOST, args.port + i) for i in range(args.workers)]
+    resources = ResourceManager(numEmulators= args.workers, pinThreads= True)   # Every local worker gets its own share of the cores
+    processes = [multiprocessing.Process(target= MatchWorker.launch, args= (host, port, authkey, resources.getWorkerBudget(i, args.workers)), kwargs= {'verbose' : True}, daemon= True)
+                 for i, (host, port) in enumerate(addresses)]
+    [process.start() for process in processes]
+
+    coordinator = MatchCoordinator(addresses, authkey= authkey, verbose= True)
+    players = [Agent(character= 'ryu'), Agent(character= 'ken')]
+    jobs = [coordinator.submitMatch(players) for match in range(args.matches)]
+
+    time.sleep(MatchCoordinator.HEARTBEAT_TIMEOUT / 2)
+    if len(processes) > 1:
+        print('Killing one worker to exercise requeueing..')
+        processes[0].terminate()
+
+    for job in jobs:
+        result = coordinator.getResult(job)
+        if result['type'] == MatchWorker.RESULT_MESSAGE: print('Job {0}: {1} won {2} in {3}s'.format(job, result['state'], result['won'], round(result['duration'], 2)))
+        else: print('Job {0} failed: {1}'.format(job, result['error']))
+
+    coordinator.shutdownWorkers()
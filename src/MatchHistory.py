@@ -0,0 +1,293 @@
+import argparse
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+class MatchHistory():
+    """
+    Keeps every tournament match result in an embedded SQLite database so the leaderboard survives restarts.
+    Each match is a row of the matches table and each side of it a row of the results table, indexed so the
+    leaderboard, head to head and per character queries are answered from the indexes instead of scanning every match.
+    Results are queued and written on a background thread, everything queued while a batch is being written goes
+    into the next one, so match threads never wait on the disk and each batch costs one commit.
+    The database runs in write ahead log mode so queries can read while a batch is being written.
+    """
+
+    ### Static Variables
+
+    DEFAULT_DATABASE_PATH = '../local_models/tournaments/match_history.db'   # Default file the match history is kept in
+    MAX_BATCH_SIZE = 256                                                      # Most queued matches written in one transaction
+
+    SCHEMA = ["""CREATE TABLE IF NOT EXISTS matches (
+                     id INTEGER PRIMARY KEY,
+                     finished REAL NOT NULL,
+                     round INTEGER,
+                     state TEXT NOT NULL,
+                     duration REAL,
+                     steps INTEGER)""",
+              """CREATE TABLE IF NOT EXISTS results (
+                     match_id INTEGER NOT NULL REFERENCES matches(id),
+                     side INTEGER NOT NULL,
+                     player TEXT NOT NULL,
+                     class_name TEXT,
+                     character TEXT NOT NULL,
+                     won INTEGER NOT NULL,
+                     rounds_won INTEGER,
+                     final_health INTEGER,
+                     damage_taken INTEGER,
+                     checkpoint TEXT,
+                     checkpoint_time REAL,
+                     PRIMARY KEY (match_id, side)) WITHOUT ROWID""",
+              "CREATE INDEX IF NOT EXISTS results_by_player ON results (player, character, won)",        # Covers the leaderboard
+              "CREATE INDEX IF NOT EXISTS results_by_player_match ON results (player, match_id, won)",    # Finds a player's side of each match for head to heads
+              "CREATE INDEX IF NOT EXISTS results_by_character ON results (character, won)",              # Covers the per character records
+              "CREATE INDEX IF NOT EXISTS matches_by_state ON matches (state)"]
+
+    ### End of Static Variables
+
+    def __init__(self, path= DEFAULT_DATABASE_PATH, verbose= False):
+        """
+        Opens or creates the database and starts the writer thread
+
+        Parameters
+        ----------
+        path
+            String of the database file, its directory is created if it does not exist
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(path, str))
+
+        self.path = path
+        self.verbose = verbose
+        if os.path.dirname(path) != '': os.makedirs(os.path.dirname(path), exist_ok= True)
+        connection = self.connect()
+        with connection:
+            for statement in MatchHistory.SCHEMA: connection.execute(statement)
+        connection.close()
+
+        self.readConnection = None                                              # Opened on the first query, shared by every thread that queries
+        self.readLock = threading.Lock()
+        self.writeQueue = queue.Queue()
+        self.writer = threading.Thread(target= self.writeMatches, daemon= True)
+        self.writer.start()
+        self.closed = False
+        atexit.register(self.close)
+
+    def connect(self):
+        """Opens a connection to the database in write ahead log mode"""
+        connection = sqlite3.connect(self.path, check_same_thread= False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def recordMatch(self, state, players, won, roundsWon, finalHealths, damageTaken, duration= None, steps= None, roundNumber= None):
+        """
+        Queues one match result to be written, returns immediately
+
+        Parameters
+        ----------
+        state
+            String of the save state the match was played in
+
+        players
+            A list with a dictionary per side holding the name, className, character, checkpoint and checkpointTime of the player
+
+        won
+            A list of whether each side won
+
+        roundsWon
+            A list of the rounds each side won
+
+        finalHealths
+            A list of each side's health on the last frame
+
+        damageTaken
+            A list of the total damage each side took
+
+        duration
+            Optional float of the seconds the match took
+
+        steps
+            Optional integer number of steps the match lasted
+
+        roundNumber
+            Optional integer of the tournament round the match was played in
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(state, str))
+        assert(all([len(values) == len(players) for values in [won, roundsWon, finalHealths, damageTaken]]))
+        assert(not self.closed)
+
+        results = [(side, player['name'], player.get('className'), player['character'], int(bool(won[side])), int(roundsWon[side]), int(finalHealths[side]),
+                    int(damageTaken[side]), player.get('checkpoint'), player.get('checkpointTime')) for side, player in enumerate(players)]
+        self.writeQueue.put(((time.time(), roundNumber, state, duration, steps), results))
+
+    def writeMatches(self):
+        """
+        Runs on the writer thread, writing every queued match in batches
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        connection = self.connect()
+        stopping = False
+        while not stopping:
+            batch = [self.writeQueue.get()]
+            while len(batch) < MatchHistory.MAX_BATCH_SIZE:
+                try: batch.append(self.writeQueue.get_nowait())
+                except queue.Empty: break
+            stopping = None in batch
+            matches = [match for match in batch if match is not None]
+            try:
+                if len(matches) > 0: self.writeBatch(connection, matches)
+            except Exception as e:
+                print('Trouble writing {0} matches to {1}:'.format(len(matches), self.path), e)
+            finally:
+                for item in batch: self.writeQueue.task_done()
+        connection.close()
+
+    def writeBatch(self, connection, matches):
+        """Inserts a batch of queued matches in one transaction"""
+        with connection:
+            for match, results in matches:
+                matchId = connection.execute('INSERT INTO matches (finished, round, state, duration, steps) VALUES (?, ?, ?, ?, ?)', match).lastrowid
+                connection.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [(matchId,) + result for result in results])
+        if self.verbose: print('Wrote {0} matches to the match history'.format(len(matches)))
+
+    def query(self, sql, parameters= ()):
+        """
+        Runs a read only query after writing out any queued matches so they are included
+
+        Parameters
+        ----------
+        sql
+            String of the SQL query
+
+        parameters
+            A tuple of the query's parameters
+
+        Returns
+        -------
+        rows
+            A list of the result rows as tuples
+        """
+        self.flush()
+        with self.readLock:
+            if self.readConnection is None: self.readConnection = self.connect()
+            return self.readConnection.execute(sql, parameters).fetchall()
+
+    def getLeaderboard(self, limit= None):
+        """
+        Ranks every player and character pairing by wins
+
+        Parameters
+        ----------
+        limit
+            Optional integer number of rows to return
+
+        Returns
+        -------
+        leaderboard
+            A list of (name, character, wins, matches played) tuples, most wins first
+        """
+        sql = 'SELECT player, character, SUM(won) AS wins, COUNT(*) AS played FROM results GROUP BY player, character ORDER BY wins DESC, played ASC'
+        if limit is not None: return self.query(sql + ' LIMIT ?', (int(limit),))
+        return self.query(sql)
+
+    def getHeadToHead(self, player, opponent):
+        """
+        Totals the matches two players have played against each other
+
+        Parameters
+        ----------
+        player
+            String name of the first player
+
+        opponent
+            String name of the second player
+
+        Returns
+        -------
+        record
+            A (player's wins, opponent's wins, matches played) tuple
+            Against itself a player's matches are counted once, from the first side
+        """
+        rows = self.query("""SELECT COALESCE(SUM(mine.won), 0), COALESCE(SUM(theirs.won), 0), COUNT(*) FROM results AS mine
+                             JOIN results AS theirs ON theirs.match_id = mine.match_id AND theirs.side != mine.side
+                             WHERE mine.player = ? AND theirs.player = ? AND (mine.player != theirs.player OR mine.side = 0)""", (player, opponent))
+        return tuple(rows[0])
+
+    def getCharacterRecords(self):
+        """
+        Totals the wins of every character across all players
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        records
+            A list of (character, wins, matches played) tuples, best win rate first
+        """
+        return self.query('SELECT character, SUM(won) AS wins, COUNT(*) AS played FROM results GROUP BY character ORDER BY CAST(SUM(won) AS REAL) / COUNT(*) DESC')
+
+    def getNumberOfMatches(self):
+        """Getter for the number of matches in the history"""
+        return self.query('SELECT COUNT(*) FROM matches')[0][0]
+
+    def flush(self):
+        """Blocks until every queued match is in the database"""
+        self.writeQueue.join()
+
+    def close(self):
+        """Writes out any queued matches and stops the writer thread"""
+        if self.closed: return
+        self.closed = True
+        self.writeQueue.put(None)
+        self.writer.join()
+        with self.readLock:
+            if self.readConnection is not None: self.readConnection.close()
+            self.readConnection = None
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "MatchHistory"
+
+"""
+Prints the leaderboard and character records kept in a match history database
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Shows the tournament leaderboard from the match history.')
+    parser.add_argument('-p', '--path', type= str, default= MatchHistory.DEFAULT_DATABASE_PATH, help= 'Match history database file')
+    parser.add_argument('-hh', '--headToHead', type= str, nargs= 2, default= None, help= 'Names of two players to show the head to head record of')
+    args = parser.parse_args()
+
+    history = MatchHistory(args.path)
+    print('{0} matches recorded'.format(history.getNumberOfMatches()))
+    for rank, (name, character, wins, played) in enumerate(history.getLeaderboard()):
+        print('{0}. {1} playing {2} : {3} wins : {4}% win percentage'.format(rank + 1, name, character, wins, round(wins / played * 100, 2)))
+    for character, wins, played in history.getCharacterRecords():
+        print('{0:<10}{1} wins in {2} matches'.format(character, wins, played))
+    if args.headToHead is not None:
+        playerWins, opponentWins, played = history.getHeadToHead(*args.headToHead)
+        print('{0} {1} - {2} {3} in {4} matches'.format(args.headToHead[0], playerWins, opponentWins, args.headToHead[1], played))
+    history.close()
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import numpy
+
+class MatchRecording():
+    """
+    A match stored as only what is needed to play it again: the save state it started from and the discrete
+    actions every player sent on every step, along with periodic checksums of the emulator's RAM.
+    The emulator is deterministic so frames, RAM info and rewards can all be regenerated by a MatchReplayer,
+    a whole fight takes a few KB on disk instead of the hundreds of MB its frames would.
+    """
+
+    ### Static Variables
+
+    DEFAULT_RECORDINGS_DIR_PATH = '../local_models/recordings'   # Default dir match recordings are saved in
+    FILE_EXTENSION = '.npz'                                      # Extension of saved recordings
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def load(path):
+        """
+        Reads a recording saved with save
+
+        Parameters
+        ----------
+        path
+            String path of the recording file
+
+        Returns
+        -------
+        recording
+            The MatchRecording
+        """
+        with numpy.load(path, allow_pickle= False) as data:
+            metadata = json.loads(str(data['metadata']))
+            checksums = list(zip(data['checksumSteps'].tolist(), data['checksums'].tolist()))
+            return MatchRecording(metadata['game'], metadata['state'], metadata['discretizer'], data['actions'], checksums, metadata['players'], metadata['won'], metadata.get('combos'))
+
+    ### End of static methods
+
+    def __init__(self, game, state, discretizer, actions, checksums, players= None, won= None, combos= None):
+        """
+        Holds a recorded match
+
+        Parameters
+        ----------
+        game
+            String of the game the match was played in
+
+        state
+            String of the save state the match started from
+
+        discretizer
+            String name of the Discretizer class the environment was wrapped in
+
+        actions
+            A list or 2D array with the tuple of every player's discrete action for each step, as returned by Discretizer.stopRecording
+
+        checksums
+            A list of (number of steps taken, RAM checksum) tuples, as returned by Discretizer.stopRecording
+
+        players
+            Optional list of dictionaries with the name and character of each player
+
+        won
+            Optional list of whether each player won the match
+
+        combos
+            Optional list of the button combos the actions index into, None if the discretizer's default combos were used
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(game, str))
+        assert(isinstance(state, str))
+        assert(isinstance(discretizer, str))
+
+        self.game = game
+        self.state = state
+        self.discretizer = discretizer
+        self.actions = numpy.asarray(actions, dtype= numpy.uint8)
+        self.checksums = [(int(step), int(checksum)) for step, checksum in checksums]
+        self.players = players if players is not None else []
+        self.won = [bool(result) for result in won] if won is not None else []
+        self.combos = [list(combo) for combo in combos] if combos is not None else None
+
+        assert(self.actions.ndim == 2)
+
+    def save(self, path= None):
+        """
+        Writes the recording as a compressed numpy archive
+
+        Parameters
+        ----------
+        path
+            Optional string path to save to, defaults to ../local_models/recordings/{state}_{number}.npz
+
+        Returns
+        -------
+        path
+            The path the recording was saved to
+        """
+        if path is None:
+            os.makedirs(MatchRecording.DEFAULT_RECORDINGS_DIR_PATH, exist_ok= True)
+            number = len([file for file in os.listdir(MatchRecording.DEFAULT_RECORDINGS_DIR_PATH) if file.startswith(self.state + '_')])
+            path = os.path.join(MatchRecording.DEFAULT_RECORDINGS_DIR_PATH, '{0}_{1:06d}{2}'.format(self.state, number, MatchRecording.FILE_EXTENSION))
+
+        metadata = {'game' : self.game, 'state' : self.state, 'discretizer' : self.discretizer, 'players' : self.players, 'won' : self.won, 'combos' : self.combos}
+        numpy.savez_compressed(path, actions= self.actions, metadata= numpy.array(json.dumps(metadata)),
+                               checksumSteps= numpy.array([step for step, checksum in self.checksums], dtype= numpy.int64),
+                               checksums= numpy.array([checksum for step, checksum in self.checksums], dtype= numpy.uint32))
+        return path
+
+    def getNumberOfSteps(self):
+        """Getter for the number of environment steps in the match"""
+        return len(self.actions)
+
+    def getNumberOfPlayers(self):
+        """Getter for the number of players whose actions were recorded"""
+        return self.actions.shape[1]
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "MatchRecording"
+
+"""
+Prints a summary of a saved recording
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Shows a summary of a match recording.')
+    parser.add_argument('path', type= str, help= 'Path of the recording file')
+    args = parser.parse_args()
+
+    recording = MatchRecording.load(args.path)
+    print('{0} from {1}: {2} steps, {3} checksums, {4} bytes on disk'.format(recording.game, recording.state, recording.getNumberOfSteps(), len(recording.checksums), os.path.getsize(args.path)))
+    for player, won in zip(recording.players, recording.won):
+        print('{0} playing {1} : {2}'.format(player['name'], player['character'], 'won' if won else 'lost'))
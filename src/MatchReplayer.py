@@ -0,0 +1,162 @@
+import argparse
+import multiprocessing
+import os
+import retro
+import Discretizer
+from MatchRecording import MatchRecording
+
+class MatchReplayer():
+    """
+    Plays a MatchRecording back through the emulator without rendering to regenerate anything the match produced.
+    Every step the recording checksummed is compared against the replay's RAM, so a replay that drifts from the
+    original match, from a different ROM, emulator version or save state, is caught on the step it is noticed.
+    Replays are independent of each other and can be spread over a process pool with replayFiles.
+    """
+
+    def __init__(self, recording, verbose= False):
+        """
+        Sets up a replay of a recording
+
+        Parameters
+        ----------
+        recording
+            The MatchRecording to play back
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(recording.__repr__() == "MatchRecording")
+        self.recording = recording
+        self.verbose = verbose
+        self.divergedAt = None
+
+    def iterateSteps(self):
+        """
+        Re-simulates the match one step at a time
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        steps
+            A generator of (actions, observation, rewards, done, info) tuples for every recorded step
+            Stops with a RuntimeError on the first checksum that does not match
+        """
+        recording = self.recording
+        environment = retro.make(game= recording.game, state= recording.state, players= recording.getNumberOfPlayers())
+        environment = getattr(Discretizer, recording.discretizer)(environment, combos= recording.combos)
+        checksums = dict(recording.checksums)
+        self.divergedAt = None
+        try:
+            environment.reset()
+            for stepNumber, actions in enumerate(recording.actions):
+                observation, rewards, done, info = environment.step(actions.tolist())
+                if stepNumber + 1 in checksums and environment.getRamChecksum() != checksums[stepNumber + 1]:
+                    self.divergedAt = stepNumber + 1
+                    raise RuntimeError('Replay of {0} diverged from the recording by step {1}'.format(recording.state, stepNumber + 1))
+                yield actions, observation, rewards, done, info
+        finally:
+            environment.close()
+
+    def replay(self, collectInfo= False, collectFrames= False, codec= None):
+        """
+        Re-simulates the whole match, optionally keeping the RAM info or frames of every step
+
+        Parameters
+        ----------
+        collectInfo
+            Whether to keep the info dictionary of every step
+
+        collectFrames
+            Whether to keep the frame of every step
+
+        codec
+            Optional FrameCodec used to encode kept frames so they take less memory
+
+        Returns
+        -------
+        result
+            A dictionary with the number of steps replayed, the total reward of each player, the final info,
+            the step the replay diverged at or None, and the infos and frames if collected
+        """
+        result = {'steps' : 0, 'totalRewards' : [0.0] * self.recording.getNumberOfPlayers(), 'finalInfo' : None, 'divergedAt' : None, 'infos' : [], 'frames' : []}
+        try:
+            for actions, observation, rewards, done, info in self.iterateSteps():
+                result['steps'] += 1
+                result['totalRewards'] = [total + reward for total, reward in zip(result['totalRewards'], rewards)]
+                result['finalInfo'] = info
+                if collectInfo: result['infos'].append(info)
+                if collectFrames: result['frames'].append(codec.encode(observation) if codec is not None else observation)
+        except RuntimeError as e:
+            print(e)
+            result['divergedAt'] = self.divergedAt
+
+        if self.verbose: print('Replayed {0} of {1} steps from {2}'.format(result['steps'], self.recording.getNumberOfSteps(), self.recording.state))
+        return result
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "MatchReplayer"
+
+"""
+Replays run in separate processes that each host their own emulator.
+replayFile has to live at module level so pool processes can import it.
+"""
+def replayFile(path):
+    """
+    Loads and replays one recording file without keeping any frames
+
+    Parameters
+    ----------
+    path
+        String path of the recording file
+
+    Returns
+    -------
+    result
+        The replay result dictionary along with the path it came from
+    """
+    result = MatchReplayer(MatchRecording.load(path)).replay()
+    result['path'] = path
+    return result
+
+def replayFiles(paths, numProcesses= None):
+    """
+    Replays many recordings in parallel, one emulator per process
+
+    Parameters
+    ----------
+    paths
+        A list of recording file paths
+
+    numProcesses
+        Integer number of replays run at the same time, defaults to the number of cores
+
+    Returns
+    -------
+    results
+        A list of replay result dictionaries in the same order as the paths
+    """
+    with multiprocessing.get_context('spawn').Pool(processes= numProcesses) as pool:
+        return pool.map(replayFile, paths)
+
+"""
+Replays every recording in a directory in parallel and checks each one still matches the emulator
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Re-simulates match recordings headlessly and verifies their checksums.')
+    parser.add_argument('-d', '--directory', type= str, default= MatchRecording.DEFAULT_RECORDINGS_DIR_PATH, help= 'Directory of recordings to replay')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of replays run at the same time')
+    args = parser.parse_args()
+
+    paths = sorted([os.path.join(args.directory, file) for file in os.listdir(args.directory) if file.endswith(MatchRecording.FILE_EXTENSION)])
+    for result in replayFiles(paths, args.processes):
+        status = 'ok' if result['divergedAt'] is None else 'diverged at step {0}'.format(result['divergedAt'])
+        print('{0:<60}{1:<8}{2:<25}{3}'.format(os.path.basename(result['path']), result['steps'], str([round(reward, 1) for reward in result['totalRewards']]), status))
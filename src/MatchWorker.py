@@ -0,0 +1,277 @@
+import argparse
+import importlib
+import ipaddress
+import socket
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import Lobby
+from ResourceManager import ResourceManager
+
+class MatchWorker():
+    """
+    A daemon that hosts a Lobby and plays matches sent to it by a MatchCoordinator.
+    For each match the coordinator ships a description of both players along with their current policy weights,
+    the worker rebuilds the players, plays the match, and sends back the result and both players' trajectories.
+    While connected the worker sends heartbeats so the coordinator can tell a long match from a dead host.
+    """
+
+    ### Static Variables
+
+    DEFAULT_HOST = '127.0.0.1'                                # Interface the worker listens on, use 0.0.0.0 to accept coordinators from other machines
+    DEFAULT_PORT = 6100                                       # Port the worker listens on
+    HEARTBEAT_INTERVAL = 1.0                                  # Seconds between heartbeats sent to the connected coordinator
+
+    # Message types of the protocol, every message is a pickled dictionary with a 'type' key
+    MATCH_MESSAGE = 'match'                                   # Coordinator -> worker, a match to play
+    RESULT_MESSAGE = 'result'                                 # Worker -> coordinator, the outcome of a match
+    ERROR_MESSAGE = 'error'                                   # Worker -> coordinator, the match could not be played
+    HEARTBEAT_MESSAGE = 'heartbeat'                           # Worker -> coordinator, the worker is still alive
+    SHUTDOWN_MESSAGE = 'shutdown'                             # Coordinator -> worker, stop serving
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def makePlayerSpec(player):
+        """
+        Describes an Agent so a worker can rebuild an equivalent player
+
+        Parameters
+        ----------
+        player
+            The Agent to describe
+
+        Returns
+        -------
+        spec
+            A dictionary with the Agent's class name, model name, character, epsilon and policy weights
+        """
+        assert(player.__repr__() == "Agent")
+
+        return {'className' : player.__class__.__name__,
+                'name' : player.getName(),
+                'character' : player.getCharacter(),
+                'epsilon' : getattr(player, 'epsilon', None),
+                'weights' : player.getPolicyWeights()}
+
+    @staticmethod
+    def isLoopback(host):
+        """Returns whether a host name or address only accepts connections from this machine"""
+        try: return ipaddress.ip_address(host).is_loopback
+        except ValueError: pass
+        try: return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+        except (OSError, ValueError): return False
+
+    @staticmethod
+    def launch(host= DEFAULT_HOST, port= DEFAULT_PORT, authkey= None, budget= None, verbose= False):
+        """Builds a worker and serves until shut down, usable as the target of a new process"""
+        MatchWorker(host= host, port= port, authkey= authkey, budget= budget, verbose= verbose).serve()
+
+    ### End of static methods
+
+    def __init__(self, host= DEFAULT_HOST, port= DEFAULT_PORT, authkey= None, budget= None, verbose= False):
+        """
+        Initializes the worker, call serve to start accepting coordinators
+
+        Parameters
+        ----------
+        host
+            String of the interface to listen on
+
+        port
+            Integer port to listen on
+
+        authkey
+            Bytes shared with the coordinator to authenticate connections
+            Required unless the worker only listens on a loopback address, every match message is unpickled so
+            anyone who can connect can run code on the worker
+
+        budget
+            Optional CPU budget made by ResourceManager.makeBudget, applied before any player builds its network so
+            several workers on one machine do not oversubscribe it, see ResourceManager.getWorkerBudget
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(host, str))
+        assert(isinstance(port, int))
+        assert(authkey is None or (isinstance(authkey, bytes) and len(authkey) > 0))
+        if authkey is None and not MatchWorker.isLoopback(host):
+            raise ValueError('A worker listening on {0} needs an authkey, only loopback addresses may run without one'.format(host))
+        if budget is not None: ResourceManager.applyBudget(budget)
+
+        self.address = (host, port)
+        self.authkey = authkey
+        self.verbose = verbose
+        self.players = {}                                                                 # Rebuilt players cached by class, model name and seat so networks are only built once
+        self.lobby = Lobby.Lobby(mode= Lobby.Lobby_Modes.TWO_PLAYER, verbose= False)
+        self.sendLock = threading.Lock()
+        self.running = True
+
+    def serve(self):
+        """
+        Accepts coordinators one at a time and plays the matches they send until told to shut down
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        with Listener(self.address, authkey= self.authkey) as listener:
+            if self.verbose: print('Worker listening on {0}:{1}'.format(*self.address))
+            while self.running:
+                with listener.accept() as connection:
+                    if self.verbose: print('Coordinator connected from {0}'.format(listener.last_accepted))
+                    self.handleConnection(connection)
+
+    def handleConnection(self, connection):
+        """
+        Plays matches for one coordinator until it disconnects
+
+        Parameters
+        ----------
+        connection
+            The multiprocessing Connection to the coordinator
+
+        Returns
+        -------
+        None
+        """
+        connected = threading.Event()
+        connected.set()
+        heartbeat = threading.Thread(target= self.sendHeartbeats, args= (connection, connected), daemon= True)
+        heartbeat.start()
+
+        try:
+            while True:
+                message = connection.recv()
+                if message['type'] == MatchWorker.SHUTDOWN_MESSAGE:
+                    self.running = False
+                    break
+                elif message['type'] == MatchWorker.MATCH_MESSAGE:
+                    self.send(connection, self.playMatch(message))
+        except (EOFError, OSError):
+            if self.verbose: print('Coordinator disconnected')
+        finally:
+            connected.clear()
+            heartbeat.join()
+
+    def sendHeartbeats(self, connection, connected):
+        """Runs on its own thread sending heartbeats to the coordinator while it is connected"""
+        while connected.is_set():
+            try:
+                self.send(connection, {'type' : MatchWorker.HEARTBEAT_MESSAGE, 'time' : time.time()})
+            except (EOFError, OSError):
+                return
+            time.sleep(MatchWorker.HEARTBEAT_INTERVAL)
+
+    def send(self, connection, message):
+        """Sends a message to the coordinator, heartbeats and results share the connection so sends are serialized"""
+        with self.sendLock:
+            connection.send(message)
+
+    def playMatch(self, message):
+        """
+        Rebuilds the players of a match, plays it, and packages up the outcome
+
+        Parameters
+        ----------
+        message
+            A match message with the keys job, players, state and selfPlay
+
+        Returns
+        -------
+        reply
+            A result message with whether each player won, their total rewards, the match summary and their recorded trajectories,
+            or an error message if the match could not be played
+            An Agent playing itself sends back one trajectory holding both sides
+        """
+        try:
+            if message.get('selfPlay', False): players = [self.getPlayer(message['players'][0], 0)] * 2
+            else: players = [self.getPlayer(spec, seat) for seat, spec in enumerate(message['players'])]
+            self.lobby.clearLobby()
+            [self.lobby.addPlayer(player) for player in players]
+            state = message['state']
+            if state is None: state = self.lobby.getSaveStateList()[0]
+
+            if self.verbose: print('Playing job {0}: {1}'.format(message['job'], state))
+            start = time.time()
+            self.lobby.play(state= state, render= False)
+
+            return {'type' : MatchWorker.RESULT_MESSAGE,
+                    'job' : message['job'],
+                    'state' : state,
+                    'won' : self.lobby.getMatchWinners(),
+                    'rewards' : list(self.lobby.totalRewards),
+                    'duration' : time.time() - start,
+                    'summary' : self.lobby.getMatchSummary(),
+                    'trajectories' : [list(player.memory) for player in self.lobby.getUniquePlayers()]}
+        except Exception as e:
+            print('Trouble playing job {0}:'.format(message['job']), e)
+            return {'type' : MatchWorker.ERROR_MESSAGE, 'job' : message['job'], 'error' : repr(e)}
+
+    def getPlayer(self, spec, seat):
+        """
+        Returns a local player matching a spec made by makePlayerSpec, loading in the shipped weights
+
+        Parameters
+        ----------
+        spec
+            The dictionary describing the player
+
+        seat
+            Integer index of the side the player plays on, every seat has its own player so two specs
+            with the same class and model name only end up as one Agent playing itself when the match asks for it
+
+        Returns
+        -------
+        player
+            The Agent that will play on this worker
+        """
+        key = (spec['className'], spec['name'], seat)
+        if key not in self.players:
+            playerClass = getattr(importlib.import_module(spec['className']), spec['className'])
+            self.players[key] = playerClass(name= spec['name'], character= spec['character'], actingOnly= True)   # Weights are shipped with every match, so no TensorFlow model is built
+
+        player = self.players[key]
+        player.character = spec['character']
+        if spec['epsilon'] is not None: player.epsilon = spec['epsilon']
+        if spec['weights'] is not None: player.setPolicyWeights(spec['weights'])
+        return player
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "MatchWorker"
+
+"""
+Starts a worker daemon that plays matches for a remote GameMaster
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Hosts a match runner for remote tournaments.')
+    parser.add_argument('-ho', '--host', type= str, default= MatchWorker.DEFAULT_HOST, help= 'Interface to listen on')
+    parser.add_argument('-p', '--port', type= int, default= MatchWorker.DEFAULT_PORT, help= 'Port to listen on')
+    parser.add_argument('-k', '--authkey', type= str, default= None, help= 'Shared secret coordinators must present, required unless the host is a loopback address')
+    parser.add_argument('-t', '--threads', type= int, default= None, help= 'Threads each of TensorFlow\'s and the numeric libraries\' pools may run, defaults to the number of cores given')
+    parser.add_argument('-c', '--cores', type= str, default= None, help= 'Comma separated list of the cores to pin the worker to, e.g. 0,1,2,3')
+    parser.add_argument('-vb', '--verbose', action= 'store_true', help= 'set this flag to turn on print statements during execution')
+    args = parser.parse_args()
+
+    if args.authkey is None and not MatchWorker.isLoopback(args.host): parser.error('--authkey is required when listening on {0}'.format(args.host))
+    budget = None
+    if args.threads is not None or args.cores is not None:
+        cores = [int(core) for core in args.cores.split(',')] if args.cores is not None else None
+        threads = args.threads if args.threads is not None else len(cores if cores is not None else ResourceManager.getAvailableCores())
+        budget = ResourceManager.makeBudget(threads, 1, cores)
+    worker = MatchWorker(host= args.host, port= args.port, authkey= args.authkey.encode() if args.authkey is not None else None, budget= budget, verbose= args.verbose)
+    worker.serve()
@@ -0,0 +1,109 @@
+import argparse
+import numpy
+
+"""
+Computes n-step discounted returns for a whole recorded fight in one vectorized pass.
+A fight is treated as a sequence of episodes split wherever a step is terminal, a round ending or the match ending,
+so rewards are never summed across a boundary and values are never bootstrapped from the other side of one.
+"""
+
+def computeNStepReturns(rewards, terminals, gamma, nSteps):
+    """
+    Computes the n-step return of every step along with where and how much to bootstrap from
+
+    Parameters
+    ----------
+    rewards
+        A 1D array of the reward received after each step
+
+    terminals
+        A 1D boolean array that is True where the episode ends after that step
+
+    gamma
+        The discount rate applied per step
+
+    nSteps
+        The maximum number of rewards summed before bootstrapping
+
+    Returns
+    -------
+    returns
+        A 1D float array of the discounted sum of up to nSteps rewards starting at each step
+
+    bootstrapIndices
+        A 1D int array of the step whose next state the return should bootstrap from,
+        the value of that next state is what follows the last reward included in the return
+
+    bootstrapDiscounts
+        A 1D float array to multiply the bootstrapped value by, gamma ** (number of rewards summed)
+        or 0 when the return reached a terminal step
+    """
+    rewards = numpy.asarray(rewards, dtype= numpy.float64)
+    terminals = numpy.asarray(terminals, dtype= bool)
+    assert(rewards.ndim == 1 and rewards.shape == terminals.shape)
+    assert(isinstance(nSteps, int) and nSteps > 0)
+    assert(0 <= gamma <= 1)
+
+    numSteps = len(rewards)
+    if numSteps == 0: return numpy.zeros(0), numpy.zeros(0, dtype= numpy.int64), numpy.zeros(0)
+
+    # Episode of each step, a step belongs to the same episode as the terminal step that ends it
+    episodes = numpy.concatenate([[0], numpy.cumsum(terminals)[:-1]])
+
+    # Window of the steps each return may include, masked wherever it runs off the end or into the next episode
+    offsets = numpy.arange(nSteps)
+    windows = numpy.arange(numSteps)[:, None] + offsets[None, :]
+    clippedWindows = numpy.minimum(windows, numSteps - 1)
+    valid = (windows < numSteps) & (episodes[clippedWindows] == episodes[:, None])
+
+    discounts = gamma ** offsets
+    returns = (rewards[clippedWindows] * discounts[None, :] * valid).sum(axis= 1)
+
+    numIncluded = valid.sum(axis= 1)
+    bootstrapIndices = numpy.arange(numSteps) + numIncluded - 1
+    bootstrapDiscounts = numpy.where(terminals[bootstrapIndices], 0.0, gamma ** numIncluded)
+
+    return returns, bootstrapIndices, bootstrapDiscounts
+
+def findRoundBoundaries(states, nextStates, dones):
+    """
+    Marks the steps after which a round or the match ended, using the rounds won in the RAM info
+
+    Parameters
+    ----------
+    states
+        A list of the info dictionaries each step started from
+
+    nextStates
+        A list of the info dictionaries each step led to
+
+    dones
+        A list of the done flag of each step
+
+    Returns
+    -------
+    terminals
+        A 1D boolean array that is True for the last step of every round
+    """
+    roundsPlayed = lambda info: info['player1_matches_won'] + info['player2_matches_won']
+    startRounds = numpy.fromiter((roundsPlayed(state) for state in states), dtype= numpy.int64, count= len(states))
+    endRounds = numpy.fromiter((roundsPlayed(state) for state in nextStates), dtype= numpy.int64, count= len(nextStates))
+
+    # The round can be counted within a step, or during the frames skipped between rounds before the next step
+    nextStartRounds = numpy.concatenate([startRounds[1:], startRounds[-1:]])
+    return numpy.asarray(dones, dtype= bool) | (endRounds != startRounds) | (nextStartRounds != startRounds)
+
+"""
+Prints the returns of a short made up fight with a round boundary in the middle
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Shows n-step returns on a made up fight.')
+    parser.add_argument('-n', '--nSteps', type= int, default= 3, help= 'Number of rewards summed before bootstrapping')
+    parser.add_argument('-g', '--gamma', type= float, default= 0.9, help= 'Discount rate')
+    args = parser.parse_args()
+
+    rewards = [0, 0, 10, 0, -100, 0, 5, 0, 0, 100]
+    terminals = [False, False, False, False, True, False, False, False, False, True]
+    returns, bootstrapIndices, bootstrapDiscounts = computeNStepReturns(rewards, terminals, args.gamma, args.nSteps)
+    for step in range(len(rewards)):
+        print('Step {0}: reward {1}, return {2}, bootstrap from step {3} scaled by {4}'.format(step, rewards[step], round(returns[step], 3), bootstrapIndices[step], round(bootstrapDiscounts[step], 3)))
@@ -0,0 +1,63 @@
+import numpy
+
+class PalettedFrame():
+    """
+    A game frame stored as one byte palette index per pixel along with the frame's table of RGB colors.
+    The RGB pixels are only rebuilt when something reads them, numpy.asarray(frame) or frame.decode(),
+    so frames that are passed around, recorded or pickled but never looked at stay a third of the size.
+    Created by FrameCodec.encode.
+    """
+
+    def __init__(self, indices, palette):
+        """
+        Wraps an already encoded frame
+
+        Parameters
+        ----------
+        indices
+            A 2D uint8 numpy array holding the palette index of each pixel
+
+        palette
+            A (colors, 3) uint8 numpy array of the RGB value of each palette index
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(indices, numpy.ndarray) and indices.ndim == 2 and indices.dtype == numpy.uint8)
+        assert(isinstance(palette, numpy.ndarray) and palette.ndim == 2 and palette.shape[1] == 3 and palette.dtype == numpy.uint8)
+
+        self.indices = indices
+        self.palette = palette
+
+    def decode(self):
+        """
+        Rebuilds the RGB pixels, a new array is returned every call
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        frame
+            A (height, width, 3) uint8 numpy array
+        """
+        return self.palette[self.indices]
+
+    def getShape(self):
+        """Getter for the shape of the decoded frame"""
+        return self.indices.shape + (3,)
+
+    def getNumberOfBytes(self):
+        """Getter for the bytes the encoded frame takes up"""
+        return self.indices.nbytes + self.palette.nbytes
+
+    def __array__(self, dtype= None):
+        """Lets numpy functions read the frame as if it were the RGB array"""
+        frame = self.decode()
+        return frame if dtype is None else frame.astype(dtype)
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "PalettedFrame"
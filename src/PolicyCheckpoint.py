@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import time
+import numpy
+
+class PolicyCheckpoint():
+    """
+    A weights only checkpoint of a fully connected network, kept for acting rather than for resuming training.
+    It is a directory holding a small JSON manifest of the layer sizes and activations and one flat float32 file
+    of every weight, each save writes a new weights file the manifest names, so a reader always finds the weights its
+    manifest describes, and loading memory maps the file and builds views of each layer on top of it, so nothing is read
+    until the first prediction touches it and processes loading the same checkpoint share the same pages.
+    The forward pass is plain numpy, so actors and evaluators can act without importing TensorFlow.
+    Loaded checkpoints answer predict, get_weights and set_weights like the Keras model they were saved from.
+    A checkpoint can also follow weights a learner publishes through SharedWeights, predicting straight from the shared block.
+    """
+
+    ### Static Variables
+
+    MANIFEST_FILE_NAME = 'manifest.json'                      # File holding the network architecture and the shape of each weight array
+    WEIGHTS_FILE_NAME = 'weights_{0}.npy'                     # Naming scheme of the files holding every weight array flattened end to end, one per save
+    FORMAT_VERSION = 2                                        # Bumped if the layout of the checkpoint ever changes, version 1 always used weights.npy
+    WEIGHTS_FILES_KEPT = 2                                    # Weights files kept per checkpoint, the previous one stays for readers still holding the old manifest
+
+    # Activations the forward pass supports, by their Keras names
+    ACTIVATIONS = {'linear' : lambda values: values,
+                   'relu' : lambda values: numpy.maximum(values, 0),
+                   'tanh' : numpy.tanh,
+                   'sigmoid' : lambda values: 1 / (1 + numpy.exp(-values))}
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def save(path, weights, activations):
+        """
+        Writes a checkpoint for a stack of dense layers into a new weights file, then swaps in the manifest naming it
+        A reader never sees a partial checkpoint, it either reads the old manifest and old weights or the new manifest and new weights
+
+        Parameters
+        ----------
+        path
+            String of the checkpoint directory, created if it does not exist
+
+        weights
+            A list of numpy arrays alternating kernel and bias for every layer, as returned by Agent.getPolicyWeights
+
+        activations
+            A list of the Keras name of each layer's activation
+
+        Returns
+        -------
+        None
+        """
+        assert(len(weights) == 2 * len(activations))
+        assert(all([activation in PolicyCheckpoint.ACTIVATIONS for activation in activations]))
+
+        os.makedirs(path, exist_ok= True)
+        weightsFileName = PolicyCheckpoint.WEIGHTS_FILE_NAME.format(time.time_ns())
+        flat = numpy.concatenate([numpy.asarray(array, dtype= numpy.float32).ravel() for array in weights])
+        numpy.save(os.path.join(path, weightsFileName + '.tmp.npy'), flat)
+        os.replace(os.path.join(path, weightsFileName + '.tmp.npy'), os.path.join(path, weightsFileName))
+
+        manifest = {'version' : PolicyCheckpoint.FORMAT_VERSION, 'weightsFile' : weightsFileName, 'activations' : list(activations), 'shapes' : [list(numpy.shape(array)) for array in weights]}
+        manifestPath = os.path.join(path, PolicyCheckpoint.MANIFEST_FILE_NAME)
+        with open(manifestPath + '.tmp', 'w') as file:
+            json.dump(manifest, file)
+        os.replace(manifestPath + '.tmp', manifestPath)
+
+        # Only weights files older than the ones the current and previous manifests name are removed
+        weightsFiles = sorted([file for file in os.listdir(path) if file.startswith('weights_') and file.endswith('.npy') and not file.endswith('.tmp.npy')])
+        for file in weightsFiles[:-PolicyCheckpoint.WEIGHTS_FILES_KEPT]: os.remove(os.path.join(path, file))
+
+    @staticmethod
+    def load(path):
+        """
+        Maps a checkpoint written by save
+
+        Parameters
+        ----------
+        path
+            String of the checkpoint directory
+
+        Returns
+        -------
+        checkpoint
+            The PolicyCheckpoint, ready to predict
+        """
+        with open(os.path.join(path, PolicyCheckpoint.MANIFEST_FILE_NAME), 'r') as file:
+            manifest = json.load(file)
+        assert(manifest['version'] in [1, PolicyCheckpoint.FORMAT_VERSION])
+
+        flat = numpy.load(os.path.join(path, manifest.get('weightsFile', 'weights.npy')), mmap_mode= 'r')
+        weights = []
+        offset = 0
+        for shape in manifest['shapes']:
+            length = int(numpy.prod(shape))
+            weights.append(flat[offset:offset + length].reshape(shape))
+            offset += length
+        return PolicyCheckpoint(weights, manifest['activations'])
+
+    @staticmethod
+    def initialize(layerSizes, activations):
+        """
+        Builds an all zero checkpoint for a stack of dense layers, for actors that are sent their weights rather than loading them
+
+        Parameters
+        ----------
+        layerSizes
+            A list of the number of inputs followed by the number of neurons in each layer
+
+        activations
+            A list of the Keras name of each layer's activation
+
+        Returns
+        -------
+        checkpoint
+            The PolicyCheckpoint, to be filled in with set_weights
+        """
+        assert(len(layerSizes) == len(activations) + 1)
+        weights = []
+        for inputs, outputs in zip(layerSizes[:-1], layerSizes[1:]):
+            weights += [numpy.zeros((inputs, outputs), dtype= numpy.float32), numpy.zeros(outputs, dtype= numpy.float32)]
+        return PolicyCheckpoint(weights, list(activations))
+
+    ### End of static methods
+
+    def __init__(self, weights, activations):
+        """
+        Wraps a list of layer weights, use load instead of calling this directly
+
+        Parameters
+        ----------
+        weights
+            A list of numpy arrays alternating kernel and bias for every layer
+
+        activations
+            A list of the Keras name of each layer's activation
+
+        Returns
+        -------
+        None
+        """
+        assert(len(weights) == 2 * len(activations))
+        self.weights = weights
+        self.activations = activations
+        self.sharedWeights = None                                               # Set while the weights are views on a learner's shared block
+
+    def predict(self, inputs, batch_size= None):
+        """
+        Runs the forward pass
+
+        Parameters
+        ----------
+        inputs
+            A (batch, features) array
+
+        batch_size
+            Ignored, accepted so the checkpoint can stand in for a Keras model
+
+        Returns
+        -------
+        outputs
+            A (batch, outputs) float32 array
+        """
+        values = numpy.asarray(inputs, dtype= numpy.float32)
+        if self.sharedWeights is not None: return self.sharedWeights.readWith(lambda views: self.forward(values, views))[1]
+        return self.forward(values, self.weights)
+
+    def forward(self, values, weights):
+        """Runs every layer over a float32 batch with the given weight arrays"""
+        for layer, activation in enumerate(self.activations):
+            values = PolicyCheckpoint.ACTIVATIONS[activation](values @ weights[2 * layer] + weights[2 * layer + 1])
+        return values
+
+    def get_weights(self):
+        """Returns copies of the weight arrays in the same order as a Keras model's get_weights"""
+        if self.sharedWeights is not None: return self.sharedWeights.readWeights()[1]
+        return [numpy.array(array) for array in self.weights]
+
+    def set_weights(self, weights):
+        """Replaces the weights with copies of the given arrays, stops following any shared weights"""
+        assert(len(weights) == len(self.weights))
+        assert(all([numpy.shape(new) == numpy.shape(old) for new, old in zip(weights, self.weights)]))
+        self.weights = [numpy.asarray(array, dtype= numpy.float32) for array in weights]
+        self.sharedWeights = None
+
+    def followSharedWeights(self, sharedWeights):
+        """
+        Acts with the weights on a learner's shared block from the next prediction on, nothing is copied
+        Each prediction is run again if the learner published while it ran, so it always sees one consistent version
+
+        Parameters
+        ----------
+        sharedWeights
+            The SharedWeights attached to the block, it must outlive the checkpoint following it
+
+        Returns
+        -------
+        None
+        """
+        views = sharedWeights.getWeightViews()
+        assert(len(views) == len(self.weights))
+        assert(all([numpy.shape(new) == numpy.shape(old) for new, old in zip(views, self.weights)]))
+        self.weights = views
+        self.sharedWeights = sharedWeights
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "PolicyCheckpoint"
+
+"""
+Saves a randomly initialized network the size of DeepQAgent's and times loading it and acting with it
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Times saving, loading and predicting with a weights only checkpoint.')
+    parser.add_argument('-p', '--path', type= str, default= '../local_models/policy_checkpoint_demo.policy', help= 'Directory to save the demo checkpoint in')
+    args = parser.parse_args()
+
+    sizes = [32, 48, 96, 192, 96, 48, 51]
+    weights = []
+    for inputs, outputs in zip(sizes[:-1], sizes[1:]):
+        weights += [numpy.random.randn(inputs, outputs).astype(numpy.float32) * 0.1, numpy.zeros(outputs, dtype= numpy.float32)]
+    PolicyCheckpoint.save(args.path, weights, ['relu'] * (len(sizes) - 2) + ['linear'])
+
+    start = time.time()
+    checkpoint = PolicyCheckpoint.load(args.path)
+    loaded = time.time()
+    moves = numpy.argmax(checkpoint.predict(numpy.random.rand(2, sizes[0])), axis= 1)
+    print('Loaded in {0} ms, first predict in {1} ms, moves {2}'.format(round((loaded - start) * 1000, 3), round((time.time() - loaded) * 1000, 3), moves))
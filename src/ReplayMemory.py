@@ -0,0 +1,408 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import weakref
+import numpy
+from PalettedFrame import PalettedFrame
+
+class ReplayMemory():
+    """
+    Stores an Agent's recorded steps within a budget of bytes held in RAM instead of a fixed number of steps.
+    Steps are appended into chunks, once the chunks held in RAM cost more than the budget the oldest full chunk
+    is spilled to memory mapped files on local disk, one file per field, and dropped from RAM.
+    The memory behaves like the deque it replaces, it can be appended to, iterated over, indexed and sampled from,
+    steps read back from a spilled chunk are rebuilt into the same tuple layout with frames as views of the mapped file.
+    Spilled files are deleted once the memory is cleared or garbage collected.
+    """
+
+    ### Static Variables
+
+    # Field stored at each index of a step tuple, the same order as the Agent's training point indices
+    STEP_FIELDS = ('observations', 'states', 'actions', 'rewards', 'nextObservations', 'nextStates', 'dones')
+    FRAME_FIELDS = ('observations', 'nextObservations')                                   # Pixel observations, None when the Agent does not subscribe to frames
+    INFO_FIELDS = ('states', 'nextStates')                                                # RAM info dictionaries, spilled as one column per variable
+    SCALAR_TYPES = {'actions' : numpy.int64, 'rewards' : numpy.float64, 'dones' : numpy.bool_}
+
+    DEFAULT_BYTE_BUDGET = 256 * 1024 ** 2                     # Bytes of steps kept in RAM before older chunks spill to disk
+    DEFAULT_CHUNK_SIZE = 1024                                 # Most steps spilled to disk at a time
+    CHUNKS_PER_BUDGET = 4                                     # Chunks are also closed once they cost this fraction of the budget, so large frames spill in smaller chunks
+    STEP_OVERHEAD = 200                                       # Estimated bytes of the tuple and scalars of each step
+    SPILL_FILE_NAME = 'chunk_{0:06d}_{1}.npy'                 # Naming scheme of the spilled field files
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def estimateBytes(step):
+        """
+        Estimates the RAM a step costs, frames are counted by their buffer size and info dictionaries by their entries
+
+        Parameters
+        ----------
+        step
+            A step tuple as recorded by Agent.recordStep
+
+        Returns
+        -------
+        bytes
+            Integer estimate of the bytes the step keeps alive
+        """
+        size = ReplayMemory.STEP_OVERHEAD
+        for index, field in enumerate(ReplayMemory.STEP_FIELDS):
+            if field in ReplayMemory.FRAME_FIELDS and isinstance(step[index], PalettedFrame): size += step[index].getNumberOfBytes()
+            elif field in ReplayMemory.FRAME_FIELDS and step[index] is not None: size += numpy.asarray(step[index]).nbytes
+            elif field in ReplayMemory.INFO_FIELDS: size += sys.getsizeof(step[index]) + 32 * len(step[index])
+        return size
+
+    ### End of static methods
+
+    def __init__(self, steps= (), byteBudget= DEFAULT_BYTE_BUDGET, chunkSize= DEFAULT_CHUNK_SIZE, maxlen= None, spillDir= None, verbose= False):
+        """
+        Creates an empty memory and appends any given steps
+
+        Parameters
+        ----------
+        steps
+            An optional iterable of step tuples to start with
+
+        byteBudget
+            Integer number of bytes of steps kept in RAM, older chunks are spilled to disk past it
+
+        chunkSize
+            Integer maximum number of steps spilled to disk at a time
+
+        maxlen
+            Optional integer maximum number of steps remembered, the oldest steps are dropped past it like a deque
+
+        spillDir
+            Optional string of the local directory spilled chunks are written under, defaults to the system's temporary directory
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(byteBudget, int) and byteBudget >= 0)
+        assert(isinstance(chunkSize, int) and chunkSize > 0)
+        assert(maxlen is None or (isinstance(maxlen, int) and maxlen > 0))
+
+        self.byteBudget = byteBudget
+        self.chunkSize = chunkSize
+        self.maxlen = maxlen
+        self.spillDir = spillDir
+        self.verbose = verbose
+
+        self.segments = []                                    # Oldest first, each is either a list of steps in RAM or a dictionary of spilled arrays
+        self.numSteps = 0
+        self.inMemoryBytes = 0
+        self.numChunksSpilled = 0
+        self.spillPath = None
+        self.cleanup = None
+        self.extend(steps)
+
+    def append(self, step):
+        """
+        Adds a step to the end of the memory, spilling the oldest chunks held in RAM if the budget is exceeded
+
+        Parameters
+        ----------
+        step
+            A step tuple as recorded by Agent.recordStep
+
+        Returns
+        -------
+        None
+        """
+        assert(len(step) == len(ReplayMemory.STEP_FIELDS))
+
+        if len(self.segments) == 0 or self.segments[-1]['spilled'] or self.isFull(self.segments[-1]):
+            self.segments.append({'spilled' : False, 'steps' : [], 'bytes' : 0})
+        size = ReplayMemory.estimateBytes(step)
+        self.segments[-1]['steps'].append(step)
+        self.segments[-1]['bytes'] += size
+        self.inMemoryBytes += size
+        self.numSteps += 1
+
+        if self.maxlen is not None and self.numSteps > self.maxlen: self.popleft()
+        while self.inMemoryBytes > self.byteBudget:
+            oldest = next((segment for segment in self.segments if not segment['spilled']), None)
+            if oldest is None or (oldest is self.segments[-1] and not self.isFull(oldest)): break
+            self.spill(oldest)
+
+    def isFull(self, segment):
+        """Returns whether an in RAM segment has stopped taking steps and can be spilled"""
+        return len(segment['steps']) >= self.chunkSize or segment['bytes'] * ReplayMemory.CHUNKS_PER_BUDGET >= self.byteBudget
+
+    def extend(self, steps):
+        """Appends every step of an iterable in order"""
+        for step in steps: self.append(step)
+
+    def popleft(self):
+        """
+        Removes and returns the oldest step
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        step
+            The oldest step tuple
+        """
+        if self.numSteps == 0: raise IndexError('pop from an empty ReplayMemory')
+
+        segment = self.segments[0]
+        step = self.getStep(segment, 0)
+        if segment['spilled']:
+            segment['start'] += 1
+        else:
+            size = ReplayMemory.estimateBytes(segment['steps'].pop(0))
+            segment['bytes'] -= size
+            self.inMemoryBytes -= size
+        self.numSteps -= 1
+
+        if self.getSegmentLength(segment) == 0:
+            self.segments.pop(0)
+            if segment['spilled']: self.deleteSpilledFiles(segment)
+        return step
+
+    def spill(self, segment):
+        """
+        Writes a chunk held in RAM to memory mapped files and replaces it with views of them
+
+        Parameters
+        ----------
+        segment
+            The in RAM segment to spill
+
+        Returns
+        -------
+        None
+        """
+        if self.spillPath is None:
+            self.spillPath = tempfile.mkdtemp(prefix= 'replay_', dir= self.spillDir)
+            self.cleanup = weakref.finalize(self, shutil.rmtree, self.spillPath, True)
+
+        steps = segment['steps']
+        keys = {}
+        arrays = {}
+        files = []
+        for index, field in enumerate(ReplayMemory.STEP_FIELDS):
+            if field in ReplayMemory.FRAME_FIELDS:
+                if steps[0][index] is None: continue
+                if all([isinstance(step[index], PalettedFrame) for step in steps]):
+                    # Paletted frames stay encoded on disk, palettes are padded to the largest one in the chunk
+                    numColors = max([len(step[index].palette) for step in steps])
+                    palettes = numpy.zeros((len(steps), numColors, 3), dtype= numpy.uint8)
+                    for row, step in enumerate(steps): palettes[row, :len(step[index].palette)] = step[index].palette
+                    self.writeSpillFile(arrays, files, field + 'Indices', numpy.stack([step[index].indices for step in steps]))
+                    self.writeSpillFile(arrays, files, field + 'Palettes', palettes)
+                    continue
+                values = numpy.stack([numpy.asarray(step[index]) for step in steps])
+            elif field in ReplayMemory.INFO_FIELDS:
+                keys[field] = sorted(steps[0][index].keys())
+                values = numpy.array([[step[index][key] for key in keys[field]] for step in steps], dtype= numpy.int64)
+            else:
+                values = numpy.array([step[index] for step in steps], dtype= ReplayMemory.SCALAR_TYPES[field])
+
+            self.writeSpillFile(arrays, files, field, values)
+
+        self.inMemoryBytes -= segment['bytes']
+        segment.clear()
+        segment.update({'spilled' : True, 'start' : 0, 'length' : len(steps), 'arrays' : arrays, 'keys' : keys, 'files' : files})
+        self.numChunksSpilled += 1
+        if self.verbose: print('Spilled {0} steps to {1}'.format(len(steps), self.spillPath))
+
+    def writeSpillFile(self, arrays, files, name, values):
+        """
+        Writes one array of the chunk being spilled to a memory mapped file
+
+        Parameters
+        ----------
+        arrays
+            Dictionary the mapped array is added to under name
+
+        files
+            List the file path is added to
+
+        name
+            String naming the array within the chunk
+
+        values
+            The numpy array to write
+
+        Returns
+        -------
+        None
+        """
+        path = os.path.join(self.spillPath, ReplayMemory.SPILL_FILE_NAME.format(self.numChunksSpilled, name))
+        mapped = numpy.lib.format.open_memmap(path, mode= 'w+', dtype= values.dtype, shape= values.shape)
+        mapped[...] = values
+        mapped.flush()
+        arrays[name] = mapped
+        files.append(path)
+
+    def deleteSpilledFiles(self, segment):
+        """Unmaps and deletes the files of a spilled segment"""
+        segment['arrays'].clear()
+        for path in segment['files']:
+            try: os.remove(path)
+            except OSError as e: print('Trouble deleting spilled replay file {0}:'.format(path), e)
+
+    def getSegmentLength(self, segment):
+        """Returns the number of steps left in a segment"""
+        if segment['spilled']: return segment['length'] - segment['start']
+        return len(segment['steps'])
+
+    def getStep(self, segment, index):
+        """
+        Reads one step out of a segment
+
+        Parameters
+        ----------
+        segment
+            The segment holding the step
+
+        index
+            Integer position of the step within what is left of the segment
+
+        Returns
+        -------
+        step
+            The step tuple, frames from a spilled segment are views of the mapped file
+        """
+        if not segment['spilled']: return segment['steps'][index]
+
+        row = segment['start'] + index
+        step = []
+        for field in ReplayMemory.STEP_FIELDS:
+            if field in ReplayMemory.FRAME_FIELDS:
+                if field + 'Indices' in segment['arrays']: step.append(PalettedFrame(segment['arrays'][field + 'Indices'][row], segment['arrays'][field + 'Palettes'][row]))
+                else: step.append(segment['arrays'][field][row] if field in segment['arrays'] else None)
+            elif field in ReplayMemory.INFO_FIELDS:
+                step.append(dict(zip(segment['keys'][field], segment['arrays'][field][row].tolist())))
+            else:
+                step.append(segment['arrays'][field][row].item())
+        return tuple(step)
+
+    def locate(self, index):
+        """Returns the segment holding the step at a position in the memory and the step's position within it"""
+        if index < 0: index += self.numSteps
+        if index < 0 or index >= self.numSteps: raise IndexError('ReplayMemory index out of range')
+        for segment in self.segments:
+            length = self.getSegmentLength(segment)
+            if index < length: return segment, index
+            index -= length
+
+    def sample(self, batchSize, generator= None):
+        """
+        Draws random steps from across the whole memory, in RAM and spilled alike
+
+        Parameters
+        ----------
+        batchSize
+            Integer number of steps to draw, without replacement unless more are asked for than are stored
+
+        generator
+            Optional numpy random Generator, defaults to the global numpy random state
+
+        Returns
+        -------
+        steps
+            A list of step tuples
+        """
+        assert(isinstance(batchSize, int) and batchSize >= 0)
+        if self.numSteps == 0: return []
+        random = numpy.random if generator is None else generator
+        indices = random.choice(self.numSteps, size= batchSize, replace= batchSize > self.numSteps)
+        return [self[int(index)] for index in indices]
+
+    def setRewards(self, rewards):
+        """
+        Overwrites the reward of every stored step in place, spilled rewards are rewritten in their mapped file
+
+        Parameters
+        ----------
+        rewards
+            A sequence with one reward per stored step, oldest first
+
+        Returns
+        -------
+        None
+        """
+        assert(len(rewards) == self.numSteps)
+        rewardIndex = ReplayMemory.STEP_FIELDS.index('rewards')
+        position = 0
+        for segment in self.segments:
+            length = self.getSegmentLength(segment)
+            values = rewards[position:position + length]
+            if segment['spilled']:
+                segment['arrays']['rewards'][segment['start']:segment['length']] = values
+            else:
+                segment['steps'] = [step[:rewardIndex] + (float(reward),) + step[rewardIndex + 1:] for step, reward in zip(segment['steps'], values)]
+            position += length
+
+    def clear(self):
+        """Forgets every step and deletes any spilled files"""
+        for segment in self.segments:
+            if segment['spilled']: self.deleteSpilledFiles(segment)
+        self.segments = []
+        self.numSteps = 0
+        self.inMemoryBytes = 0
+
+    def close(self):
+        """Clears the memory and removes its spill directory"""
+        self.clear()
+        if self.cleanup is not None: self.cleanup()
+        self.spillPath = None
+        self.cleanup = None
+
+    def getInMemoryBytes(self):
+        """Getter for the estimated bytes of steps held in RAM"""
+        return self.inMemoryBytes
+
+    def getNumberOfSpilledSteps(self):
+        """Getter for the number of steps currently stored on disk"""
+        return sum([self.getSegmentLength(segment) for segment in self.segments if segment['spilled']])
+
+    def __len__(self):
+        return self.numSteps
+
+    def __iter__(self):
+        for segment in self.segments:
+            for index in range(self.getSegmentLength(segment)):
+                yield self.getStep(segment, index)
+
+    def __getitem__(self, index):
+        segment, position = self.locate(index)
+        return self.getStep(segment, position)
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "ReplayMemory"
+
+"""
+Records made up full frame steps into a small budget and samples across RAM and disk
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Fills a replay memory past its RAM budget and samples from it.')
+    parser.add_argument('-s', '--steps', type= int, default= 5000, help= 'Number of steps to record')
+    parser.add_argument('-b', '--budget', type= int, default= 64, help= 'RAM budget in megabytes')
+    args = parser.parse_args()
+
+    memory = ReplayMemory(byteBudget= args.budget * 1024 ** 2, verbose= False)
+    frame = numpy.zeros((200, 256, 3), dtype= numpy.uint8)
+    for stepNumber in range(args.steps):
+        info = {'health' : stepNumber % 176, 'enemy_health' : 175, 'matches_won' : 0, 'enemy_matches_won' : 0}
+        memory.append((frame, info, stepNumber % 51, 0.0, frame, info, False))
+
+    print('Stored {0} steps, {1} spilled to disk, {2} MB held in RAM'.format(len(memory), memory.getNumberOfSpilledSteps(), round(memory.getInMemoryBytes() / 1024 ** 2, 2)))
+    print('Sampled actions:', [step[2] for step in memory.sample(10)])
+    memory.close()
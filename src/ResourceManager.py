@@ -0,0 +1,243 @@
+import argparse
+import os
+import sys
+
+class ResourceManager():
+    """
+    Splits a host's cores between the emulators playing matches and the learners training on them so parallel runs
+    do not oversubscribe the CPU. Left alone every TensorFlow runtime sizes its thread pools to the whole machine and
+    every emulator competes with them for the same cores, so adding workers makes each of them slower.
+    A process applies a budget before its first model is built, which caps TensorFlow's intra and inter op pools and
+    the OpenMP and BLAS pools under it, and threads can optionally be pinned to the cores they were given.
+    TensorFlow fixes its pool sizes when its runtime starts, so Agents configure it right before building or loading a network.
+    Its pool threads inherit the affinity of the thread that starts the runtime, so to separate learners from emulators the
+    main thread is pinned to the learner cores before any model is built and each emulator thread pins itself while it plays.
+    """
+
+    ### Static Variables
+
+    DEFAULT_LEARNER_SHARE = 0.5                               # Fraction of the cores given to learners, the rest run emulators
+
+    # Environment variables read by the native thread pools TensorFlow and numpy use, they only apply to pools not yet started
+    THREAD_ENVIRONMENT_VARIABLES = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS']
+    INTER_OP_ENVIRONMENT_VARIABLE = 'TF_NUM_INTEROP_THREADS'
+
+    processBudget = None                                      # The budget applied to this process, None leaves every library at its default
+    tensorFlowConfigured = False                              # TensorFlow's pools can only be sized once per process
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def getAvailableCores():
+        """Returns the sorted list of cores this process may run on"""
+        if hasattr(os, 'sched_getaffinity'): return sorted(os.sched_getaffinity(0))
+        return list(range(os.cpu_count() or 1))
+
+    @staticmethod
+    def makeBudget(threads, interOpThreads= 1, cores= None):
+        """
+        Describes how much of the CPU a process may use
+
+        Parameters
+        ----------
+        threads
+            Integer number of threads each compute pool, like TensorFlow's intra op pool, may run
+
+        interOpThreads
+            Integer number of independent TensorFlow operations that may run at the same time
+
+        cores
+            Optional list of cores the process is pinned to, None leaves it free to run anywhere
+
+        Returns
+        -------
+        budget
+            A picklable dictionary that can be handed to applyBudget in another process
+        """
+        assert(isinstance(threads, int) and threads > 0)
+        assert(isinstance(interOpThreads, int) and interOpThreads > 0)
+        return {'threads' : threads, 'interOpThreads' : interOpThreads, 'cores' : list(cores) if cores is not None else None}
+
+    @staticmethod
+    def applyBudget(budget):
+        """
+        Limits the current process to a budget, call before TensorFlow is imported or any model is built
+
+        Parameters
+        ----------
+        budget
+            A dictionary made by makeBudget
+
+        Returns
+        -------
+        None
+        """
+        ResourceManager.processBudget = budget
+        for variable in ResourceManager.THREAD_ENVIRONMENT_VARIABLES: os.environ[variable] = str(budget['threads'])
+        os.environ[ResourceManager.INTER_OP_ENVIRONMENT_VARIABLE] = str(budget['interOpThreads'])
+        ResourceManager.pinCurrentThread(budget['cores'])
+        if 'tensorflow' in sys.modules: ResourceManager.configureTensorFlow()
+
+    @staticmethod
+    def configureTensorFlow():
+        """
+        Sizes TensorFlow's thread pools to the process budget, does nothing if no budget was applied or it was already done
+        Called by Agents right before they build or load a network, after that TensorFlow can no longer be changed
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        budget = ResourceManager.processBudget
+        if budget is None or ResourceManager.tensorFlowConfigured: return
+        ResourceManager.tensorFlowConfigured = True
+        import tensorflow as tf
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(budget['threads'])
+            tf.config.threading.set_inter_op_parallelism_threads(budget['interOpThreads'])
+        except RuntimeError as e:
+            print('TensorFlow was already running before its thread budget was applied:', e)
+
+    @staticmethod
+    def pinCurrentThread(cores):
+        """
+        Restricts the calling thread, and any threads it starts afterwards, to a set of cores
+
+        Parameters
+        ----------
+        cores
+            A list of core indices, None leaves the thread where it is
+
+        Returns
+        -------
+        previousCores
+            The list of cores the thread could run on before, to restore with another call, None if nothing was changed
+        """
+        if cores is None or len(cores) == 0 or not hasattr(os, 'sched_setaffinity'): return None
+        previousCores = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, cores)                                           # On Linux 0 refers to the calling thread, not the whole process
+        return previousCores
+
+    ### End of static methods
+
+    def __init__(self, numEmulators= 1, numLearners= 1, learnerShare= DEFAULT_LEARNER_SHARE, pinThreads= False, cores= None):
+        """
+        Divides the cores between emulators and learners
+
+        Parameters
+        ----------
+        numEmulators
+            Integer number of emulators that run at the same time
+
+        numLearners
+            Integer number of players that can train at the same time
+
+        learnerShare
+            Fraction of the cores given to learners, with a single core both share it
+
+        pinThreads
+            Whether emulator and learner threads are pinned to their cores or only have their thread pools sized
+
+        cores
+            Optional list of the cores to divide, defaults to every core this process may run on
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(numEmulators, int) and numEmulators > 0)
+        assert(isinstance(numLearners, int) and numLearners > 0)
+        assert(0 < learnerShare < 1)
+        assert(isinstance(pinThreads, bool))
+
+        self.cores = list(cores) if cores is not None else ResourceManager.getAvailableCores()
+        self.numEmulators = numEmulators
+        self.numLearners = numLearners
+        self.pinThreads = pinThreads
+
+        numLearnerCores = min(len(self.cores) - 1, max(1, int(round(len(self.cores) * learnerShare))))
+        if numLearnerCores < 1:
+            self.emulatorCores = self.learnerCores = self.cores
+        else:
+            self.learnerCores = self.cores[:numLearnerCores]
+            self.emulatorCores = self.cores[numLearnerCores:]
+
+    def getProcessBudget(self):
+        """
+        Returns the budget for a process hosting all the emulators and learners as threads
+        TensorFlow's pools are shared by the whole process so they are sized to the learner cores, and when threads are pinned the
+        budget pins the main thread to the learner cores so the pool threads started from it stay there, apply it before any model is built
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        budget
+            A dictionary made by makeBudget
+        """
+        return ResourceManager.makeBudget(len(self.learnerCores), min(self.numLearners, len(self.learnerCores)), self.getLearnerCores())
+
+    def getWorkerBudget(self, workerIndex, numWorkers):
+        """
+        Returns the budget for one of several worker processes that each play and train on their own
+
+        Parameters
+        ----------
+        workerIndex
+            Integer index of the worker
+
+        numWorkers
+            Integer number of workers sharing the cores
+
+        Returns
+        -------
+        budget
+            A dictionary made by makeBudget with an even share of the cores
+        """
+        assert(0 <= workerIndex < numWorkers)
+        cores = self.splitCores(self.cores, workerIndex, numWorkers)
+        return ResourceManager.makeBudget(len(cores), 1, cores if self.pinThreads else None)
+
+    def getEmulatorCores(self, emulatorIndex):
+        """Returns the cores an emulator runs on, or None if threads are not pinned"""
+        if not self.pinThreads: return None
+        return self.splitCores(self.emulatorCores, emulatorIndex % self.numEmulators, self.numEmulators)
+
+    def getLearnerCores(self):
+        """Returns the cores learners train on, or None if threads are not pinned"""
+        if not self.pinThreads: return None
+        return list(self.learnerCores)
+
+    def splitCores(self, cores, index, parts):
+        """Returns one of several contiguous and nearly even slices of a list of cores, slices share cores when there are more parts than cores"""
+        if parts >= len(cores): return [cores[index % len(cores)]]
+        start, end = (index * len(cores)) // parts, ((index + 1) * len(cores)) // parts
+        return cores[start:end]
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "ResourceManager"
+
+"""
+Prints how the cores of this machine would be divided
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Shows how cores are split between emulators and learners.')
+    parser.add_argument('-e', '--emulators', type= int, default= 1, help= 'Number of emulators running at the same time')
+    parser.add_argument('-l', '--learners', type= int, default= 1, help= 'Number of players training at the same time')
+    parser.add_argument('-ls', '--learnerShare', type= float, default= ResourceManager.DEFAULT_LEARNER_SHARE, help= 'Fraction of the cores given to learners')
+    parser.add_argument('-w', '--workers', type= int, default= 4, help= 'Number of worker processes to show budgets for')
+    args = parser.parse_args()
+
+    resources = ResourceManager(args.emulators, args.learners, args.learnerShare, pinThreads= True)
+    print('Learner cores {0}, process budget {1}'.format(resources.getLearnerCores(), resources.getProcessBudget()))
+    for emulatorIndex in range(args.emulators): print('Emulator {0} cores {1}'.format(emulatorIndex, resources.getEmulatorCores(emulatorIndex)))
+    for workerIndex in range(args.workers): print('Worker {0} budget {1}'.format(workerIndex, resources.getWorkerBudget(workerIndex, args.workers)))
@@ -0,0 +1,229 @@
+import argparse
+import json
+import os
+import re
+import numpy
+
+class RewardShaper():
+    """
+    Computes rewards from the RAM variables in data.json without touching the Lua reward script.
+    Each reward term is a numpy expression over the variables of the frame after an action, written by name,
+    the variables of the frame before it, prefixed with prev_, and their difference, prefixed with delta_.
+    Terms are compiled once and evaluated on whole arrays at a time, so a fight's worth of steps,
+    or a batch of environments, is rewarded in a single pass.
+    Expressions are written from player 1's point of view, player 2's rewards use the same expressions
+    with every player1 and player2 swapped.
+    """
+
+    ### Static Variables
+
+    DEFAULT_GAME = 'StreetFighterIISpecialChampionEdition-Genesis'                   # Game whose data.json lists the variables expressions can use
+
+    # The same terms as the Lua calculate_reward script, health lost by either player and 100 points per round, but not its exact values
+    # The script only counts health that drops below the lowest value it has seen this match, so after the first knock out it
+    # misses damage until a fighter falls below that mark again, these terms count every point of health lost on every step
+    DEFAULT_TERMS = {'damage_dealt' : 'maximum(-delta_player2_health, 0)',
+                     'damage_taken' : '-maximum(-delta_player1_health, 0)',
+                     'round_won'    : '100 * (delta_player1_matches_won > 0)',
+                     'round_lost'   : '-100 * (delta_player2_matches_won > 0)'}
+
+    # Functions and constants expressions are allowed to call besides the variables
+    FUNCTIONS = {'abs' : numpy.abs, 'sign' : numpy.sign, 'clip' : numpy.clip, 'where' : numpy.where,
+                 'maximum' : numpy.maximum, 'minimum' : numpy.minimum, 'sqrt' : numpy.sqrt, 'exp' : numpy.exp, 'log' : numpy.log}
+
+    PLAYER_PATTERN = re.compile(r'player([12])')                                        # Used to mirror expressions for player 2
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def mirrorExpression(expression):
+        """Swaps every player1 and player2 in an expression so it is written from player 2's point of view"""
+        return RewardShaper.PLAYER_PATTERN.sub(lambda match: 'player2' if match.group(1) == '1' else 'player1', expression)
+
+    @staticmethod
+    def infosToColumns(infos, variables):
+        """
+        Converts a sequence of info dictionaries into one numpy array per variable
+
+        Parameters
+        ----------
+        infos
+            A list of info dictionaries returned by the environment
+
+        variables
+            The variable names to extract
+
+        Returns
+        -------
+        columns
+            A dictionary from variable name to a 1D float array with one element per info
+        """
+        return {variable : numpy.fromiter((info[variable] for info in infos), dtype= numpy.float64, count= len(infos)) for variable in variables}
+
+    ### End of static methods
+
+    def __init__(self, terms= None, weights= None, game= DEFAULT_GAME):
+        """
+        Compiles the reward terms for both players
+
+        Parameters
+        ----------
+        terms
+            A dictionary from term name to expression string, defaults to DEFAULT_TERMS
+
+        weights
+            An optional dictionary from term name to the float its value is scaled by, terms left out have weight 1
+
+        game
+            String of the game directory whose data.json lists the usable variables
+
+        Returns
+        -------
+        None
+        """
+        if terms is None: terms = RewardShaper.DEFAULT_TERMS
+        if weights is None: weights = {}
+        assert(isinstance(terms, dict) and len(terms) > 0)
+        assert(isinstance(weights, dict) and set(weights.keys()) <= set(terms.keys()))
+
+        with open(os.path.join('../{0}'.format(game), 'data.json'), 'r') as file:
+            self.variables = sorted(json.load(file)['info'].keys())
+
+        self.terms = dict(terms)
+        self.weights = {name : weights.get(name, 1.0) for name in terms}
+        self.compiledTerms = [{name : self.compileExpression(expression) for name, expression in terms.items()},
+                              {name : self.compileExpression(RewardShaper.mirrorExpression(expression)) for name, expression in terms.items()}]
+        self.usedVariables = set()
+        for compiledTerms in self.compiledTerms:
+            for code, usedVariables in compiledTerms.values(): self.usedVariables |= usedVariables
+
+    def compileExpression(self, expression):
+        """
+        Compiles an expression after checking it only refers to known variables and functions
+
+        Parameters
+        ----------
+        expression
+            The expression string to compile
+
+        Returns
+        -------
+        code
+            The compiled code object, along with the variables it uses
+        """
+        code = compile(expression, '<reward {0}>'.format(expression), 'eval')
+        usedVariables = set()
+        for name in code.co_names:
+            if name in RewardShaper.FUNCTIONS: continue
+            variable = re.sub(r'^(prev_|delta_)', '', name)
+            if variable not in self.variables: raise ValueError('Unknown name {0} in reward expression {1}'.format(name, expression))
+            usedVariables.add(variable)
+
+        return code, usedVariables
+
+    def getUsedVariables(self):
+        """Getter for the set of data.json variables any term reads, so only those need to be gathered"""
+        return self.usedVariables
+
+    def evaluateTerms(self, previous, current, playerNumber= 0):
+        """
+        Evaluates every term over arrays of frames at once
+
+        Parameters
+        ----------
+        previous
+            A dictionary from variable name to an array of values before each action
+            Arrays can have any shape, for example (steps,) for one fight or (environments, steps) for a batch
+
+        current
+            A dictionary from variable name to an array of the same shape of values after each action
+
+        playerNumber
+            Integer representing whether to reward player 1(0) or player 2(1)
+
+        Returns
+        -------
+        terms
+            A dictionary from term name to an array of its unweighted values
+        """
+        assert(playerNumber in [0, 1])
+
+        namespace = dict(RewardShaper.FUNCTIONS)
+        for variable in self.usedVariables:
+            namespace[variable] = numpy.asarray(current[variable], dtype= numpy.float64)
+            namespace['prev_' + variable] = numpy.asarray(previous[variable], dtype= numpy.float64)
+            namespace['delta_' + variable] = namespace[variable] - namespace['prev_' + variable]
+
+        # Terms that do not depend on every variable, like constants, are broadcast to the batch shape
+        shape = numpy.broadcast(*[namespace[variable] for variable in self.usedVariables]).shape if len(self.usedVariables) > 0 else ()
+        values = {}
+        for name, (code, usedVariables) in self.compiledTerms[playerNumber].items():
+            values[name] = numpy.broadcast_to(numpy.asarray(eval(code, {'__builtins__' : {}}, namespace), dtype= numpy.float64), shape)
+
+        return values
+
+    def evaluate(self, previous, current, playerNumber= 0):
+        """
+        Returns the weighted sum of every term over arrays of frames at once, see evaluateTerms for the parameters
+
+        Returns
+        -------
+        rewards
+            An array of the same shape as the inputs holding the reward of each step
+        """
+        terms = self.evaluateTerms(previous, current, playerNumber)
+        return sum([self.weights[name] * values for name, values in terms.items()])
+
+    def rewardMemory(self, memory, playerNumber, stateIndex, nextStateIndex):
+        """
+        Computes the shaped reward of every recorded step of a fight in one pass
+
+        Parameters
+        ----------
+        memory
+            A sequence of recorded steps as stored by Agent.recordStep
+
+        playerNumber
+            Integer representing whether the steps were recorded by player 1(0) or player 2(1)
+
+        stateIndex
+            Index of the info before the action inside each step
+
+        nextStateIndex
+            Index of the info after the action inside each step
+
+        Returns
+        -------
+        rewards
+            A 1D numpy array with the reward of each step
+        """
+        if len(memory) == 0: return numpy.zeros(0)
+        variables = self.usedVariables
+        previous = RewardShaper.infosToColumns([step[stateIndex] for step in memory], variables)
+        current = RewardShaper.infosToColumns([step[nextStateIndex] for step in memory], variables)
+        return self.evaluate(previous, current, playerNumber)
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "RewardShaper"
+
+"""
+Times the default terms on a batch of made up frames
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Evaluates reward terms over a batch of random frames.')
+    parser.add_argument('-e', '--environments', type= int, default= 16, help= 'Number of environments in the batch')
+    parser.add_argument('-s', '--steps', type= int, default= 5000, help= 'Number of steps per environment')
+    args = parser.parse_args()
+
+    import time
+    shaper = RewardShaper()
+    shape = (args.environments, args.steps)
+    current = {variable : numpy.random.randint(0, 176, size= shape) for variable in shaper.variables}
+    previous = {variable : values + numpy.random.randint(0, 3, size= shape) for variable, values in current.items()}
+
+    start = time.time()
+    rewards = shaper.evaluate(previous, current, playerNumber= 0)
+    print('Rewarded {0} steps in {1} seconds, mean reward {2}'.format(rewards.size, round(time.time() - start, 4), rewards.mean()))
@@ -0,0 +1,470 @@
+import argparse
+import atexit
+import multiprocessing
+import os
+import time
+import numpy
+import retro
+from Agent import Agent
+from BehaviorCloner import BehaviorCloner
+from Discretizer import StreetFighter2Discretizer
+
+class SearchAgent(Agent):
+    """
+    An agent that plans instead of learning, by branching the emulator at each decision point.
+    The emulator state is saved, every candidate combo is played out for a short rollout from that same state and
+    the combo whose rollout dealt the most damage for the least taken is picked, then the emulator is restored exactly.
+    Rollouts either branch the live emulator in process or are spread across a pool of emulator clones in other
+    processes, and the frames simulated per decision are capped by a compute budget.
+    Every decision keeps the value of each candidate it tried, so the agent also serves as an expert whose saved
+    targets other Agents can be trained on, and its rollout throughput is logged to its telemetry after every fight.
+    """
+
+    ### Static Variables
+
+    DEFAULT_HORIZON = 45                                      # Frames each rollout is played out for, long enough for most attacks to land
+    DEFAULT_DECISION_INTERVAL = 10                            # Frames a chosen combo is held before searching again
+    DEFAULT_FRAME_BUDGET = 2400                               # Most emulator frames simulated per decision, enough for one rollout of every default combo
+    DEFAULT_ROLLOUTS_PER_ACTION = 1                           # Rollouts per candidate, more than one continues each rollout with random combos
+    KO_VALUE = 200                                            # Value of knocking out the opponent within a rollout, the negative if knocked out
+    DEFAULT_TARGETS_SUB_DIR = 'expert_targets'                # Name of the dir inside the model's dir where the expert targets are saved
+
+    WANTS_FRAMES = False                                      # Search reads the emulator directly so no frames are handed over
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def playRollout(environment, snapshot, playerNumber, plan):
+        """
+        Restores an emulator state and plays a sequence of combos for one player, the other player does nothing
+        The emulator is driven directly so the discretizer's phase tracking, input recording and reward script are left untouched
+
+        Parameters
+        ----------
+        environment
+            The Discretizer wrapped environment whose emulator is used
+
+        snapshot
+            The emulator state to start from, as returned by em.get_state
+
+        playerNumber
+            Integer of the player the plan is played for, 0 or 1
+
+        plan
+            A list of the combo index to press on every frame
+
+        Returns
+        -------
+        value
+            The damage dealt minus the damage taken over the rollout, plus KO_VALUE for a knock out either way
+
+        frames
+            Integer number of frames simulated, a rollout stops early on a knock out
+        """
+        unwrapped = environment.unwrapped
+        unwrapped.em.set_state(snapshot)
+        unwrapped.data.update_ram()
+        start = unwrapped.data.lookup_all()
+        masks = [mask.astype(numpy.uint8) for mask in environment._decode_discrete_action]
+
+        info, frames = start, 0
+        for action in plan:
+            for player in range(environment.players): unwrapped.em.set_button_mask(masks[action] if player == playerNumber else masks[0], player)
+            unwrapped.em.step()
+            unwrapped.data.update_ram()
+            info = unwrapped.data.lookup_all()
+            frames += 1
+            if info['player1_health'] < 0 or info['player2_health'] < 0: break
+        return SearchAgent.scoreRollout(start, info, playerNumber), frames
+
+    @staticmethod
+    def scoreRollout(start, end, playerNumber):
+        """Returns the damage dealt minus the damage taken between two RAM states, with KO_VALUE added or taken for a knock out"""
+        myKey, enemyKey = 'player{0}_health'.format(playerNumber + 1), 'player{0}_health'.format(2 - playerNumber)
+        value = (start[enemyKey] - max(end[enemyKey], 0)) - (start[myKey] - max(end[myKey], 0))
+        if end[enemyKey] < 0 <= start[enemyKey]: value += SearchAgent.KO_VALUE
+        if end[myKey] < 0 <= start[myKey]: value -= SearchAgent.KO_VALUE
+        return float(value)
+
+    @staticmethod
+    def loadExpertTargets(path):
+        """
+        Reads expert targets saved by saveExpertTargets
+
+        Parameters
+        ----------
+        path
+            String path of the targets file
+
+        Returns
+        -------
+        infos
+            A list of the RAM info dictionary of every decision, seen from player 1's side
+
+        actions
+            An array of the combo chosen at every decision
+
+        values
+            A (decisions, combos) array of the rollout value of every candidate, NaN for candidates that were not tried
+        """
+        infos, actions = BehaviorCloner.loadDemonstrations(path)
+        with numpy.load(path, allow_pickle= False) as data:
+            return infos, actions, data['values']
+
+    ### End of static methods
+
+    def __init__(self, load= False, name= None, character= "ryu", horizon= DEFAULT_HORIZON, decisionInterval= DEFAULT_DECISION_INTERVAL,
+                 frameBudget= DEFAULT_FRAME_BUDGET, rolloutsPerAction= DEFAULT_ROLLOUTS_PER_ACTION, timeBudget= None, numProcesses= 0,
+                 recordTargets= True, verbose= False, actingOnly= False):
+        """
+        Initializes the search settings, the agent has no network to build or load
+
+        Parameters
+        ----------
+        load
+            Accepted so the agent can be built like any other, there is nothing to load
+
+        name
+            A string representing the name of the agent that will be used when saving the expert targets and telemetry
+            Defaults to the class name if none is provided
+
+        character
+            String representing the name of the character this Agent plays as
+
+        horizon
+            Integer number of frames each rollout is played out for
+
+        decisionInterval
+            Integer number of frames a chosen combo is held before searching again
+
+        frameBudget
+            Integer most emulator frames simulated per decision, if every candidate does not fit a random subset of them is tried
+
+        rolloutsPerAction
+            Integer number of rollouts averaged for each candidate
+
+        timeBudget
+            Optional float of the most seconds spent on a decision when rolling out in process, candidates not reached are skipped
+
+        numProcesses
+            Integer number of emulator clones rollouts are spread across, 0 branches the live emulator in this process
+
+        recordTargets
+            Whether each decision's candidate values are kept and saved as expert targets after every fight
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        actingOnly
+            Accepted so the agent can be built like any other, the agent never trains
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(horizon, int) and horizon > 0)
+        assert(isinstance(decisionInterval, int) and 0 < decisionInterval <= horizon)
+        assert(isinstance(frameBudget, int) and frameBudget >= horizon)
+        assert(isinstance(rolloutsPerAction, int) and rolloutsPerAction > 0)
+        assert(timeBudget is None or timeBudget > 0)
+        assert(isinstance(numProcesses, int) and numProcesses >= 0)
+
+        self.horizon = horizon
+        self.decisionInterval = decisionInterval
+        self.frameBudget = frameBudget
+        self.rolloutsPerAction = rolloutsPerAction
+        self.timeBudget = timeBudget
+        self.numProcesses = numProcesses
+        self.recordTargets = recordTargets
+        self.rolloutPool = None
+        self.rolloutPoolKey = None
+        self.heldAction = 0
+        self.framesUntilDecision = 0
+        self.expertTargets = []
+        self.resetSearchStatistics()
+        super(SearchAgent, self).__init__(load= load, name= name, character= character, verbose= verbose, actingOnly= actingOnly)
+        atexit.register(self.closeRolloutPool)
+
+    def initializeNetwork(self):
+        """The agent searches instead of using a network"""
+        return None
+
+    def loadModel(self):
+        """There is no model to load, the agent is ready as soon as it is built"""
+        self.model = None
+
+    def prepareForNextFight(self, env, playerNumber):
+        """
+        Clears the memory, expert targets and search statistics of the last fight and starts the emulator clones if rollouts use them
+
+        Parameters
+        ----------
+        env
+            The environment the player will be fighting in, its emulator is branched at every decision
+
+        playerNumber
+            Integer representing whether the Agent is player 1(0) or player 2(1)
+
+        Returns
+        -------
+        None
+        """
+        super(SearchAgent, self).prepareForNextFight(env, playerNumber)
+        self.heldAction = 0
+        self.framesUntilDecision = 0
+        self.expertTargets = []
+        self.resetSearchStatistics()
+        if self.numProcesses > 0: self.startRolloutPool()
+
+    def startRolloutPool(self):
+        """Starts the pool of emulator clones, it is kept across fights until the game, player count or combos change"""
+        unwrapped = self.environment.unwrapped
+        combos = self.environment.getCombos()
+        key = (unwrapped.gamename, unwrapped.players, str(combos))
+        if self.rolloutPoolKey == key: return
+        self.closeRolloutPool()
+        # Only one emulator can run per process, so every clone lives in its own spawned process
+        self.rolloutPool = multiprocessing.get_context('spawn').Pool(processes= self.numProcesses, initializer= initializeRolloutWorker,
+                                                                     initargs= (unwrapped.gamename, unwrapped.statename, unwrapped.players, combos))
+        self.rolloutPoolKey = key
+
+    def closeRolloutPool(self):
+        """Shuts down the emulator clones, if any"""
+        if self.rolloutPool is None: return
+        self.rolloutPool.terminate()
+        self.rolloutPool.join()
+        self.rolloutPool = None
+        self.rolloutPoolKey = None
+
+    def getMove(self, obs, info):
+        """
+        Holds the last chosen combo until the decision interval is up, then searches for the next one
+
+        Parameters
+        ----------
+        obs
+            Ignored, the agent reads the emulator directly
+
+        info
+            Dictionary of the current frame's RAM variables
+
+        Returns
+        -------
+        move
+            Integer representing the combo selected from the move list
+        """
+        if self.framesUntilDecision > 0:
+            self.framesUntilDecision -= 1
+            return self.heldAction
+
+        values = self.search()
+        move = int(numpy.nanargmax(values))
+        if self.recordTargets: self.expertTargets.append((info if self.playerNumber == 0 else Agent.mirrorInfo(info), move, values))
+        self.heldAction = move
+        self.framesUntilDecision = self.decisionInterval - 1
+        return move
+
+    def makePlans(self):
+        """
+        Lays out the rollouts of one decision within the frame budget
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        candidates
+            A list of the combo each plan evaluates
+
+        plans
+            A list of the per frame combos of each rollout, the candidate is held for the decision interval and then
+            the player does nothing, or presses random combos when several rollouts are averaged
+        """
+        numActions = self.actionSpace.n
+        candidatesInBudget = max(1, (self.frameBudget // self.horizon) // self.rolloutsPerAction)
+        candidates = list(range(numActions))
+        if candidatesInBudget < numActions: candidates = sorted(numpy.random.choice(numActions, candidatesInBudget, replace= False).tolist())
+
+        plans, planCandidates = [], []
+        continuationLength = self.horizon - self.decisionInterval
+        for candidate in candidates:
+            for rollout in range(self.rolloutsPerAction):
+                if self.rolloutsPerAction == 1: continuation = [0] * continuationLength
+                else: continuation = numpy.repeat(numpy.random.randint(numActions, size= -(-continuationLength // self.decisionInterval)), self.decisionInterval)[:continuationLength].tolist()
+                plans.append([candidate] * self.decisionInterval + continuation)
+                planCandidates.append(candidate)
+        return planCandidates, plans
+
+    def search(self):
+        """
+        Branches the emulator and rolls out every planned candidate, leaving the emulator exactly as it was
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        values
+            An array with the mean rollout value of every combo, NaN for combos that were not tried
+        """
+        start = time.time()
+        unwrapped = self.environment.unwrapped
+        snapshot = unwrapped.em.get_state()
+        candidates, plans = self.makePlans()
+
+        if self.rolloutPool is not None:
+            chunks = [(snapshot, self.playerNumber, plans[index::self.numProcesses]) for index in range(self.numProcesses)]
+            chunkResults = self.rolloutPool.map(runRollouts, chunks)
+            results = [None] * len(plans)
+            for index, chunk in enumerate(chunkResults): results[index::self.numProcesses] = chunk
+        else:
+            results = []
+            for plan in plans:
+                if self.timeBudget is not None and len(results) > 0 and time.time() - start > self.timeBudget: break
+                results.append(SearchAgent.playRollout(self.environment, snapshot, self.playerNumber, plan))
+            unwrapped.em.set_state(snapshot)
+            unwrapped.data.update_ram()                                         # So the next real step measures its change from the restored RAM
+
+        totals = numpy.zeros(self.actionSpace.n)
+        counts = numpy.zeros(self.actionSpace.n)
+        for candidate, (value, frames) in zip(candidates, results):
+            totals[candidate] += value
+            counts[candidate] += 1
+            self.framesSimulated += frames
+        self.rolloutsRun += len(results)
+        self.decisions += 1
+        self.searchSeconds += time.time() - start
+
+        values = numpy.full(self.actionSpace.n, numpy.nan)
+        values[counts > 0] = totals[counts > 0] / counts[counts > 0]
+        return values
+
+    def resetSearchStatistics(self):
+        """Zeroes the decision, rollout and frame counts used to measure throughput"""
+        self.decisions = 0
+        self.rolloutsRun = 0
+        self.framesSimulated = 0
+        self.searchSeconds = 0.0
+
+    def getRolloutThroughput(self):
+        """
+        Returns how fast the search has run since the fight started
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        throughput
+            A dictionary of the decisions made, rollouts run, frames simulated, seconds spent searching and frames simulated per second
+        """
+        return {'decisions' : self.decisions, 'rollouts' : self.rolloutsRun, 'frames' : self.framesSimulated, 'seconds' : self.searchSeconds,
+                'framesPerSecond' : self.framesSimulated / self.searchSeconds if self.searchSeconds > 0 else 0.0}
+
+    def reviewFight(self):
+        """
+        Nothing is learned, the fight's rollout throughput is logged and its expert targets are saved for other Agents to train on
+        """
+        self.recordFightTelemetry()
+        telemetry = self.getTelemetry()
+        telemetry.append('search', fight= telemetry.getNumberOfRows('search'), **self.getRolloutThroughput())
+        if self.recordTargets and len(self.expertTargets) > 0: self.saveExpertTargets()
+        if self.verbose:
+            throughput = self.getRolloutThroughput()
+            print('{0} ran {1} rollouts over {2} decisions at {3} frames per second'.format(self.name, throughput['rollouts'], throughput['decisions'], round(throughput['framesPerSecond'])))
+        telemetry.flush(wait= False)
+
+    def saveExpertTargets(self):
+        """
+        Writes the last fight's decisions to ../local_models/{Model_Name}/expert_targets/targets_{number}.npz
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        path
+            The path the targets were saved to
+        """
+        totalDirPath = os.path.join(Agent.DEFAULT_MODELS_DIR_PATH, Agent.DEFAULT_MODELS_SUB_DIR.format(self.name), SearchAgent.DEFAULT_TARGETS_SUB_DIR)
+        os.makedirs(totalDirPath, exist_ok= True)
+        path = os.path.join(totalDirPath, 'targets_{0:06d}.npz'.format(len([file for file in os.listdir(totalDirPath) if file.endswith('.npz')])))
+
+        BehaviorCloner.saveDemonstrations(path, [info for info, move, values in self.expertTargets], [move for info, move, values in self.expertTargets],
+                                          numpy.stack([values for info, move, values in self.expertTargets]))
+        if self.verbose: print('{0} saved {1} expert targets to {2}'.format(self.name, len(self.expertTargets), path))
+        return path
+
+"""
+Rollouts on clones run in separate processes that each host their own emulator.
+These functions have to live at module level so pool processes can import them.
+"""
+def initializeRolloutWorker(game, state, players, combos):
+    """
+    Builds this process's emulator clone
+
+    Parameters
+    ----------
+    game
+        String of the game to emulate
+
+    state
+        String of any save state of the game, every rollout restores its own emulator state over it
+
+    players
+        Integer number of players the emulator is set up for
+
+    combos
+        The list of combos the discrete actions index into
+
+    Returns
+    -------
+    None
+    """
+    global rolloutEnvironment
+    rolloutEnvironment = StreetFighter2Discretizer(retro.make(game= game, state= state, players= players), combos= combos)
+    rolloutEnvironment.reset()
+
+def runRollouts(task):
+    """
+    Plays a chunk of one decision's rollouts on this process's clone
+
+    Parameters
+    ----------
+    task
+        A (snapshot, player number, plans) tuple, see SearchAgent.playRollout
+
+    Returns
+    -------
+    results
+        A list of (value, frames) tuples in the same order as the plans
+    """
+    snapshot, playerNumber, plans = task
+    return [SearchAgent.playRollout(rolloutEnvironment, snapshot, playerNumber, plan) for plan in plans]
+
+"""
+Plays single player matches with the search agent and reports its rollout throughput
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Plays with a lookahead search agent.')
+    parser.add_argument('-r', '--render', action= 'store_true', help= 'Boolean flag for if the user wants the game environment to render during play')
+    parser.add_argument('-e', '--episodes', type= int, default= 1, help= 'Integer representing the number of passes through the save states')
+    parser.add_argument('-p', '--processes', type= int, default= 0, help= 'Number of emulator clones to spread rollouts across, 0 branches the live emulator')
+    parser.add_argument('-b', '--frameBudget', type= int, default= SearchAgent.DEFAULT_FRAME_BUDGET, help= 'Most emulator frames simulated per decision')
+    parser.add_argument('-ho', '--horizon', type= int, default= SearchAgent.DEFAULT_HORIZON, help= 'Frames each rollout is played out for')
+    parser.add_argument('-n', '--name', type= str, default= None, help= 'Name the expert targets and telemetry are saved under')
+    args = parser.parse_args()
+
+    from Lobby import Lobby
+    agent = SearchAgent(name= args.name, horizon= args.horizon, frameBudget= args.frameBudget, numProcesses= args.processes, verbose= True)
+    testLobby = Lobby()
+    testLobby.addPlayer(agent)
+    testLobby.executeTrainingRun(episodes= args.episodes, render= args.render)
+    agent.closeRolloutPool()
@@ -0,0 +1,253 @@
+import argparse
+import atexit
+import time
+import numpy
+from multiprocessing import resource_tracker, shared_memory
+
+class SharedWeights():
+    """
+    Publishes a network's weights through a block of shared memory so actor processes can follow a learner
+    without the weights ever being pickled or duplicated per process.
+    The learner flattens every weight array into one float32 block behind a version counter, actors map
+    the same block and build numpy views of each layer straight on top of it.
+    The version is odd while the learner is writing, readers use it to detect and retry torn reads.
+    """
+
+    ### Static Variables
+
+    HEADER_SIZE = 2                                           # Number of int64 values before the weights, the version and the number of weights
+    VERSION_INDEX = 0                                         # Index of the version counter in the header
+    SIZE_INDEX = 1                                            # Index of the number of weights in the header
+    READ_RETRY_DELAY = 0.0001                                 # Seconds to wait before retrying a read that overlapped a write
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def create(weights, name= None):
+        """
+        Allocates a new shared block sized for the given weights and publishes them as version 2
+
+        Parameters
+        ----------
+        weights
+            A list of numpy arrays, as returned by Agent.getPolicyWeights
+
+        name
+            Optional name of the shared memory block, one is generated if not given
+
+        Returns
+        -------
+        sharedWeights
+            The SharedWeights object owning the block, pass its getSpec() to the actor processes
+        """
+        assert(isinstance(weights, (list, tuple)) and len(weights) > 0)
+
+        shapes = [tuple(numpy.shape(array)) for array in weights]
+        numWeights = sum([int(numpy.prod(shape)) for shape in shapes])
+        size = SharedWeights.HEADER_SIZE * 8 + numWeights * 4
+        block = shared_memory.SharedMemory(name= name, create= True, size= size)
+        sharedWeights = SharedWeights(block, shapes, owner= True)
+        sharedWeights.trackerPid = resource_tracker._resource_tracker._pid
+        sharedWeights.header[SharedWeights.SIZE_INDEX] = numWeights
+        sharedWeights.publish(weights)
+        return sharedWeights
+
+    @staticmethod
+    def attach(spec):
+        """
+        Maps an existing shared block from another process
+        Before Python 3.13 attaching registers the block with this process's resource tracker, which unlinks it when the
+        process exits even though the learner still publishes to it, so the block is unregistered again unless
+        the tracker is the one the creating process shares with its children
+
+        Parameters
+        ----------
+        spec
+            The dictionary returned by getSpec in the process that created the block
+
+        Returns
+        -------
+        sharedWeights
+            A SharedWeights object reading from the block
+        """
+        try:
+            block = shared_memory.SharedMemory(name= spec['name'], track= False)
+        except TypeError:
+            tracker = resource_tracker._resource_tracker
+            sharedTracker = tracker._fd is not None and tracker._pid in (None, spec['trackerPid'])      # Spawned children inherit the tracker without its pid, forked ones with it
+            block = shared_memory.SharedMemory(name= spec['name'])
+            if not sharedTracker: resource_tracker.unregister(block._name, 'shared_memory')
+        return SharedWeights(block, [tuple(shape) for shape in spec['shapes']], owner= False)
+
+    ### End of static methods
+
+    def __init__(self, block, shapes, owner):
+        """
+        Builds the header and per layer views on top of a shared block, use create or attach instead of calling this directly
+
+        Parameters
+        ----------
+        block
+            The SharedMemory block
+
+        shapes
+            A list of the shapes of each weight array in order
+
+        owner
+            Boolean representing whether this process created the block and is responsible for freeing it
+
+        Returns
+        -------
+        None
+        """
+        self.block = block
+        self.shapes = shapes
+        self.owner = owner
+        self.trackerPid = None                                                        # Pid of the resource tracker the creating process registered the block with
+        self.closed = False
+        atexit.register(self.close)
+
+        self.header = numpy.ndarray((SharedWeights.HEADER_SIZE,), dtype= numpy.int64, buffer= block.buf)
+        numWeights = sum([int(numpy.prod(shape)) for shape in shapes])
+        self.flat = numpy.ndarray((numWeights,), dtype= numpy.float32, buffer= block.buf, offset= SharedWeights.HEADER_SIZE * 8)
+
+        self.views = []
+        offset = 0
+        for shape in shapes:
+            length = int(numpy.prod(shape))
+            self.views.append(self.flat[offset:offset + length].reshape(shape))
+            offset += length
+
+    def getSpec(self):
+        """Returns the small picklable description actor processes need to attach to the block"""
+        return {'name' : self.block.name, 'shapes' : [list(shape) for shape in self.shapes], 'trackerPid' : self.trackerPid}
+
+    def publish(self, weights):
+        """
+        Copies new weights into the block, the only cost is one memcpy per layer
+
+        Parameters
+        ----------
+        weights
+            A list of numpy arrays with the same shapes the block was created with
+
+        Returns
+        -------
+        None
+        """
+        assert(self.owner)
+        assert(len(weights) == len(self.views))
+
+        self.header[SharedWeights.VERSION_INDEX] += 1                                 # Odd while writing
+        for view, array in zip(self.views, weights):
+            view[...] = array
+        self.header[SharedWeights.VERSION_INDEX] += 1
+
+    def getVersion(self):
+        """Getter for the version of the weights currently in the block, odd means a write is in progress"""
+        return int(self.header[SharedWeights.VERSION_INDEX])
+
+    def getWeightViews(self):
+        """
+        Returns numpy views of every layer directly on the shared block, nothing is copied
+        The views change under the reader when the learner publishes, only read them through readWith if that matters
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        views
+            A list of numpy arrays backed by the shared block
+        """
+        return self.views
+
+    def readWith(self, function):
+        """
+        Calls a function on the weight views, running it again if the learner published while it ran
+
+        Parameters
+        ----------
+        function
+            A function taking the list of weight views, it must not write to them or keep them past the call
+
+        Returns
+        -------
+        version
+            The version of the weights the function read
+
+        result
+            Whatever the function returned for that version
+        """
+        while True:
+            version = self.getVersion()
+            if version % 2 == 0:
+                result = function(self.views)
+                if self.getVersion() == version: return version, result
+            time.sleep(SharedWeights.READ_RETRY_DELAY)
+
+    def readWeights(self):
+        """
+        Returns a consistent copy of the weights, retrying if the learner was mid publish
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        version
+            The version of the weights that were read
+
+        weights
+            A list of numpy arrays
+        """
+        return self.readWith(lambda views: [view.copy() for view in views])
+
+    def close(self):
+        """Unmaps the block, the process that created it also frees it, called at exit if it was not closed before"""
+        if self.closed: return
+        self.views = []
+        self.flat = None
+        self.header = None
+        self.block.close()
+        if self.owner: self.block.unlink()
+        self.closed = True
+        atexit.unregister(self.close)
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "SharedWeights"
+
+"""
+Publishes random weights from this process and has a second process follow along
+"""
+def followWeights(spec, numReads):
+    sharedWeights = SharedWeights.attach(spec)
+    lastVersion = 0
+    for read in range(numReads):
+        version, weights = sharedWeights.readWeights()
+        if version != lastVersion: print('Actor read version {0}, first weight {1}'.format(version, weights[0].flat[0]))
+        lastVersion = version
+        time.sleep(0.01)
+    sharedWeights.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Demonstrates publishing weights to another process through shared memory.')
+    parser.add_argument('-u', '--updates', type= int, default= 5, help= 'Number of times the weights are updated')
+    args = parser.parse_args()
+
+    import multiprocessing
+    layers = [numpy.zeros((32, 48), dtype= numpy.float32), numpy.zeros(48, dtype= numpy.float32), numpy.zeros((48, 51), dtype= numpy.float32), numpy.zeros(51, dtype= numpy.float32)]
+    learner = SharedWeights.create(layers)
+    actor = multiprocessing.Process(target= followWeights, args= (learner.getSpec(), args.updates * 10))
+    actor.start()
+    for update in range(args.updates):
+        time.sleep(0.1)
+        learner.publish([layer + update + 1 for layer in layers])
+        print('Learner published version {0}'.format(learner.getVersion()))
+    actor.join()
+    learner.close()
@@ -0,0 +1,316 @@
+import argparse
+import atexit
+import copy
+import json
+import os
+import queue
+import threading
+import numpy
+
+class TelemetryStore():
+    """
+    Append only, column oriented storage for training telemetry.
+    Every table is split into fixed size chunks where each column is stored as its own numpy array,
+    so reading one column over a range of rows only loads the chunks that overlap that range.
+    Rows are buffered in memory and full chunks are written to disk by a background thread
+    so the training loop never waits on the file system.
+    Running aggregates of every column are kept up to date on append and saved alongside the data.
+    """
+
+    ### Static Variables
+
+    # Schemas of the tables every Agent records, column name to numpy data type
+    TABLES = {
+        'fights'  : {'fight' : numpy.int64, 'epsilon' : numpy.float32, 'reward' : numpy.float32, 'length' : numpy.int32, 'won' : numpy.bool_, 'loss' : numpy.float32},
+        'batches' : {'fight' : numpy.int64, 'batch' : numpy.int64, 'loss' : numpy.float32},
+        'search'  : {'fight' : numpy.int64, 'decisions' : numpy.int64, 'rollouts' : numpy.int64, 'frames' : numpy.int64, 'seconds' : numpy.float32, 'framesPerSecond' : numpy.float32},
+        'pretraining' : {'epoch' : numpy.int64, 'samples' : numpy.int64, 'loss' : numpy.float32, 'accuracy' : numpy.float32}
+    }
+
+    DEFAULT_CHUNK_SIZE = 4096                                 # Number of rows stored in each chunk file
+    MANIFEST_FILE_NAME = 'manifest.json'                      # File holding the row counts and running aggregates of each table
+    CHUNK_FILE_NAME = 'chunk_{0:06d}.npz'                     # Naming scheme of the chunk files inside each table's directory
+
+    ### End of Static Variables
+
+    def __init__(self, path, chunkSize= DEFAULT_CHUNK_SIZE, verbose= False):
+        """
+        Opens the store at the given directory, picking up where any previous session left off
+
+        Parameters
+        ----------
+        path
+            String of the directory the telemetry is stored in, created on the first write if it does not exist
+
+        chunkSize
+            Integer number of rows stored per chunk file
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(path, str))
+        assert(isinstance(chunkSize, int) and chunkSize > 0)
+
+        self.path = path
+        self.chunkSize = chunkSize
+        self.verbose = verbose
+
+        self.numRows = {table : 0 for table in TelemetryStore.TABLES}
+        self.aggregates = {table : {column : TelemetryStore.emptyAggregate() for column in columns} for table, columns in TelemetryStore.TABLES.items()}
+        self.buffers = {table : self.makeBuffer(table) for table in TelemetryStore.TABLES}
+        self.loadManifest()
+
+        self.writeQueue = queue.Queue()
+        self.writer = threading.Thread(target= self.writeChunks, daemon= True)
+        self.writer.start()
+        self.closed = False
+        atexit.register(self.close)
+
+    ### Static methods
+
+    @staticmethod
+    def emptyAggregate():
+        """Returns the running aggregate of a column with no rows"""
+        return {'count' : 0, 'sum' : 0.0, 'min' : None, 'max' : None}
+
+    ### End of static methods
+
+    def makeBuffer(self, table):
+        """Returns empty column arrays big enough to hold one chunk of the given table"""
+        return {column : numpy.zeros(self.chunkSize, dtype= dtype) for column, dtype in TelemetryStore.TABLES[table].items()}
+
+    def getChunkPath(self, table, chunkIndex):
+        """Returns the path of one chunk file of a table"""
+        return os.path.join(self.path, table, TelemetryStore.CHUNK_FILE_NAME.format(chunkIndex))
+
+    def loadManifest(self):
+        """
+        Restores the row counts, aggregates and the partially filled last chunk of every table from disk
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        manifestPath = os.path.join(self.path, TelemetryStore.MANIFEST_FILE_NAME)
+        if not os.path.exists(manifestPath): return
+
+        with open(manifestPath, 'r') as file:
+            manifest = json.load(file)
+        assert(manifest['chunkSize'] == self.chunkSize)
+
+        for table in TelemetryStore.TABLES:
+            if table not in manifest['tables']: continue
+            self.numRows[table] = manifest['tables'][table]['rows']
+            self.aggregates[table].update(manifest['tables'][table]['aggregates'])
+
+            bufferedRows = self.numRows[table] % self.chunkSize
+            if bufferedRows > 0:
+                with numpy.load(self.getChunkPath(table, self.numRows[table] // self.chunkSize)) as chunk:
+                    for column in self.buffers[table]:
+                        self.buffers[table][column][:bufferedRows] = chunk[column][:bufferedRows]
+
+    def append(self, table, **record):
+        """
+        Adds one row to a table, the row is written to disk once its chunk fills up or the store is flushed
+
+        Parameters
+        ----------
+        table
+            String name of the table in TABLES to append to
+
+        record
+            Keyword values for every column of the table
+
+        Returns
+        -------
+        None
+        """
+        assert(table in TelemetryStore.TABLES)
+        assert(set(record.keys()) == set(TelemetryStore.TABLES[table].keys()))
+
+        row = self.numRows[table] % self.chunkSize
+        buffer = self.buffers[table]
+        for column, value in record.items():
+            buffer[column][row] = value
+            self.updateAggregate(self.aggregates[table][column], buffer[column][row])
+        self.numRows[table] += 1
+
+        if row + 1 == self.chunkSize:
+            # The full buffer is handed to the writer as is and a fresh one takes its place
+            self.writeQueue.put((table, (self.numRows[table] - 1) // self.chunkSize, buffer, self.chunkSize, self.makeManifest()))
+            self.buffers[table] = self.makeBuffer(table)
+
+    def updateAggregate(self, aggregate, value):
+        """Folds a new value into a column's running aggregate"""
+        value = float(value)
+        if numpy.isnan(value): return
+        aggregate['count'] += 1
+        aggregate['sum'] += value
+        aggregate['min'] = value if aggregate['min'] is None else min(aggregate['min'], value)
+        aggregate['max'] = value if aggregate['max'] is None else max(aggregate['max'], value)
+
+    def writeChunks(self):
+        """
+        Runs on the writer thread, saving chunks and the manifest as they are queued
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        while True:
+            item = self.writeQueue.get()
+            try:
+                if item is None: return
+                table, chunkIndex, buffer, numRows, manifest = item
+                os.makedirs(os.path.join(self.path, table), exist_ok= True)
+                numpy.savez(self.getChunkPath(table, chunkIndex), **{column : values[:numRows] for column, values in buffer.items()})
+                self.writeManifest(manifest)
+            except Exception as e:
+                print('Trouble writing telemetry to {0}:'.format(self.path), e)
+            finally:
+                self.writeQueue.task_done()
+
+    def makeManifest(self):
+        """Returns a copy of the row counts and aggregates of every table as they are right now"""
+        return {'chunkSize' : self.chunkSize, 'tables' : {table : {'rows' : self.numRows[table], 'aggregates' : copy.deepcopy(self.aggregates[table])} for table in TelemetryStore.TABLES}}
+
+    def writeManifest(self, manifest):
+        """Saves a manifest made when its chunk was queued, so the rows it lists are always on disk"""
+        manifestPath = os.path.join(self.path, TelemetryStore.MANIFEST_FILE_NAME)
+        with open(manifestPath + '.tmp', 'w') as file:
+            json.dump(manifest, file)
+        os.replace(manifestPath + '.tmp', manifestPath)
+
+    def flush(self, wait= True):
+        """
+        Queues the partially filled chunk of every table to be written
+
+        Parameters
+        ----------
+        wait
+            Boolean representing whether to block until everything queued is on disk
+
+        Returns
+        -------
+        None
+        """
+        for table in TelemetryStore.TABLES:
+            bufferedRows = self.numRows[table] % self.chunkSize
+            if bufferedRows > 0:
+                buffer = {column : values[:bufferedRows].copy() for column, values in self.buffers[table].items()}
+                self.writeQueue.put((table, self.numRows[table] // self.chunkSize, buffer, bufferedRows, self.makeManifest()))
+        if wait: self.writeQueue.join()
+
+    def close(self):
+        """Flushes everything to disk and stops the writer thread"""
+        if self.closed: return
+        self.flush()
+        self.writeQueue.put(None)
+        self.writer.join()
+        self.closed = True
+        atexit.unregister(self.close)
+
+    def query(self, table, column, start= 0, stop= None):
+        """
+        Reads a range of rows of one column, only touching the chunks that overlap the range
+
+        Parameters
+        ----------
+        table
+            String name of the table to read from
+
+        column
+            String name of the column to read
+
+        start
+            Integer index of the first row to read
+
+        stop
+            Integer index one past the last row to read, defaults to the end of the table
+
+        Returns
+        -------
+        values
+            A 1D numpy array of the column's values over the range
+        """
+        assert(table in TelemetryStore.TABLES)
+        assert(column in TelemetryStore.TABLES[table])
+
+        if stop is None or stop > self.numRows[table]: stop = self.numRows[table]
+        start = max(start, 0)
+        if start >= stop: return numpy.zeros(0, dtype= TelemetryStore.TABLES[table][column])
+
+        self.writeQueue.join()                                                    # Make sure every full chunk queued so far is readable
+        bufferedChunk = self.numRows[table] // self.chunkSize
+        pieces = []
+        for chunkIndex in range(start // self.chunkSize, (stop - 1) // self.chunkSize + 1):
+            chunkStart = chunkIndex * self.chunkSize
+            low, high = max(start - chunkStart, 0), min(stop - chunkStart, self.chunkSize)
+            if chunkIndex == bufferedChunk:
+                pieces.append(self.buffers[table][column][low:high].copy())
+            else:
+                with numpy.load(self.getChunkPath(table, chunkIndex)) as chunk:
+                    pieces.append(chunk[column][low:high])
+
+        return numpy.concatenate(pieces)
+
+    def getAggregate(self, table, column):
+        """
+        Returns the running count, sum, mean, min and max of a column over every row ever appended
+
+        Parameters
+        ----------
+        table
+            String name of the table
+
+        column
+            String name of the column
+
+        Returns
+        -------
+        aggregate
+            A dictionary with the keys count, sum, mean, min and max, NaN rows are left out
+        """
+        aggregate = dict(self.aggregates[table][column])
+        aggregate['mean'] = aggregate['sum'] / aggregate['count'] if aggregate['count'] > 0 else None
+        return aggregate
+
+    def getNumberOfRows(self, table):
+        """Getter for the number of rows that have been appended to a table"""
+        return self.numRows[table]
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "TelemetryStore"
+
+"""
+Prints a summary of the fight telemetry of a trained model
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Summarizes the training telemetry of a model.')
+    parser.add_argument('-n', '--name', type= str, default= 'DeepQAgent', help= 'Name of the model whose telemetry should be read')
+    parser.add_argument('-l', '--last', type= int, default= 100, help= 'Number of most recent fights to summarize')
+    args = parser.parse_args()
+
+    store = TelemetryStore(os.path.join('../local_models', args.name, 'telemetry'))
+    numFights = store.getNumberOfRows('fights')
+    print('{0} fights recorded'.format(numFights))
+    for column in ['reward', 'length', 'loss']:
+        print('{0}: {1}'.format(column, store.getAggregate('fights', column)))
+
+    recentWins = store.query('fights', 'won', numFights - args.last)
+    if len(recentWins) > 0: print('Win rate over the last {0} fights: {1}%'.format(len(recentWins), round(recentWins.mean() * 100, 2)))
+    store.close()
@@ -0,0 +1,200 @@
+import argparse
+import atexit
+import json
+import os
+import queue
+import re
+import threading
+
+class TournamentSnapshotter():
+    """
+    Writes GameMaster tournament snapshots to disk on a background thread so rounds never wait on the file system.
+    A snapshot is captured in memory between rounds, when no match is being played, so it is always consistent,
+    and is then queued to the writer which saves it under a new numbered file and atomically swaps it into place.
+    Only the most recent few snapshots are kept, loading falls back to an older one if the newest is unreadable.
+    """
+
+    ### Static Variables
+
+    DEFAULT_SNAPSHOT_DIR_PATH = '../local_models/tournaments'   # Default dir tournament snapshots are saved in
+    SNAPSHOT_FILE_NAME = 'snapshot_{0:06d}.json'              # Naming scheme of the snapshot files, numbered by the round they were taken after
+    SNAPSHOT_FILE_PATTERN = re.compile(r'^snapshot_(\d{6})\.json$')
+    DEFAULT_SNAPSHOTS_KEPT = 3                                # Number of snapshots left on disk, older ones are deleted
+
+    ### End of Static Variables
+
+    ### Static methods
+
+    @staticmethod
+    def listSnapshots(path):
+        """
+        Lists the snapshot files in a directory from newest to oldest
+
+        Parameters
+        ----------
+        path
+            String of the directory snapshots are saved in
+
+        Returns
+        -------
+        snapshots
+            A list of (round number, file path) tuples
+        """
+        if not os.path.isdir(path): return []
+        snapshots = []
+        for fileName in os.listdir(path):
+            match = TournamentSnapshotter.SNAPSHOT_FILE_PATTERN.match(fileName)
+            if match is not None: snapshots.append((int(match.group(1)), os.path.join(path, fileName)))
+        return sorted(snapshots, reverse= True)
+
+    @staticmethod
+    def loadLatest(path):
+        """
+        Reads the newest readable snapshot in a directory
+
+        Parameters
+        ----------
+        path
+            String of the directory snapshots are saved in
+
+        Returns
+        -------
+        snapshot
+            The snapshot dictionary, or None if there is no readable snapshot
+        """
+        for roundNumber, snapshotPath in TournamentSnapshotter.listSnapshots(path):
+            try:
+                with open(snapshotPath, 'r') as file:
+                    return json.load(file)
+            except Exception as e:
+                print('Trouble reading tournament snapshot {0}, trying an older one:'.format(snapshotPath), e)
+        return None
+
+    ### End of static methods
+
+    def __init__(self, path= DEFAULT_SNAPSHOT_DIR_PATH, snapshotsKept= DEFAULT_SNAPSHOTS_KEPT, verbose= False):
+        """
+        Starts the writer thread
+
+        Parameters
+        ----------
+        path
+            String of the directory snapshots are saved in, created on the first write if it does not exist
+
+        snapshotsKept
+            Integer number of snapshots left on disk
+
+        verbose
+            A boolean variable representing whether or not the print statements in the class are turned on
+            Error messages however are not turned off
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(path, str))
+        assert(isinstance(snapshotsKept, int) and snapshotsKept > 0)
+
+        self.path = path
+        self.snapshotsKept = snapshotsKept
+        self.verbose = verbose
+
+        self.writeQueue = queue.Queue()
+        self.writer = threading.Thread(target= self.writeSnapshots, daemon= True)
+        self.writer.start()
+        self.closed = False
+        atexit.register(self.close)
+
+    def save(self, snapshot):
+        """
+        Queues a snapshot to be written, returns immediately
+
+        Parameters
+        ----------
+        snapshot
+            A JSON serializable dictionary with a roundsRun entry, it must not be modified after being queued
+
+        Returns
+        -------
+        None
+        """
+        assert(isinstance(snapshot, dict) and 'roundsRun' in snapshot)
+        assert(not self.closed)
+        self.writeQueue.put(snapshot)
+
+    def writeSnapshots(self):
+        """
+        Runs on the writer thread, saving snapshots as they are queued
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        while True:
+            snapshot = self.writeQueue.get()
+            try:
+                if snapshot is None: return
+                self.writeSnapshot(snapshot)
+            except Exception as e:
+                print('Trouble writing tournament snapshot to {0}:'.format(self.path), e)
+            finally:
+                self.writeQueue.task_done()
+
+    def writeSnapshot(self, snapshot):
+        """
+        Writes one snapshot to a temporary file, syncs it, swaps it into place and deletes the oldest snapshots
+
+        Parameters
+        ----------
+        snapshot
+            The snapshot dictionary
+
+        Returns
+        -------
+        None
+        """
+        os.makedirs(self.path, exist_ok= True)
+        snapshotPath = os.path.join(self.path, TournamentSnapshotter.SNAPSHOT_FILE_NAME.format(snapshot['roundsRun']))
+        with open(snapshotPath + '.tmp', 'w') as file:
+            json.dump(snapshot, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(snapshotPath + '.tmp', snapshotPath)
+        if self.verbose: print('Tournament snapshot saved to {0}'.format(snapshotPath))
+
+        for roundNumber, oldPath in TournamentSnapshotter.listSnapshots(self.path)[self.snapshotsKept:]:
+            os.remove(oldPath)
+
+    def flush(self):
+        """Blocks until every queued snapshot is on disk"""
+        self.writeQueue.join()
+
+    def close(self):
+        """Writes out any queued snapshots and stops the writer thread"""
+        if self.closed: return
+        self.closed = True
+        self.writeQueue.put(None)
+        self.writer.join()
+
+    def __repr__(self):
+        """What to return if type is called on this class or any child class"""
+        return "TournamentSnapshotter"
+
+"""
+Prints the newest tournament snapshot in a directory
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Shows the latest tournament snapshot.')
+    parser.add_argument('-p', '--path', type= str, default= TournamentSnapshotter.DEFAULT_SNAPSHOT_DIR_PATH, help= 'Directory the snapshots are saved in')
+    args = parser.parse_args()
+
+    snapshot = TournamentSnapshotter.loadLatest(args.path)
+    if snapshot is None: print('No tournament snapshots found in {0}'.format(args.path))
+    else:
+        print('Tournament snapshot after round {0}'.format(snapshot['roundsRun']))
+        for player in snapshot['players']:
+            print('{0} ({1}) playing {2} : {3} wins in {4} matches : checkpoint {5}'.format(player['name'], player['className'], player['character'], player['wins'], player['matchesPlayed'], player['checkpoint']))
@@ -0,0 +1,125 @@
+import argparse
+import multiprocessing
+import random
+import numpy
+
+"""
+Each evaluation process loads the agent once and then plays whichever (state, seed) pairs it is handed
+"""
+MAX_START_DELAY = 60                # Most frames a seed can hold the agent idle before it starts fighting, one second of game time
+evaluationAgent = None
+evaluationLobby = None
+
+def initializeEvaluator(className, modelName, character):
+    """
+    Loads the agent being evaluated into this process and turns off exploration
+
+    Parameters
+    ----------
+    className
+        Name of the class library to import
+
+    modelName
+        Name of the model to load
+
+    character
+        The character the agent plays
+
+    Returns
+    -------
+    None
+    """
+    global evaluationAgent, evaluationLobby
+    from Lobby import Lobby
+    agentClass = getattr(__import__(className), className)
+    evaluationAgent = agentClass(load= True, name= modelName, character= character, actingOnly= True)      # Evaluators never train so they act from the policy checkpoint
+    evaluationAgent.verbose = False
+    if hasattr(evaluationAgent, 'epsilon'): evaluationAgent.epsilon = 0
+
+    evaluationLobby = Lobby(verbose= False)
+    evaluationLobby.addPlayer(evaluationAgent)
+
+def evaluateMatch(task):
+    """
+    Plays one save state greedily without recording anything
+
+    Parameters
+    ----------
+    task
+        A (state, seed) tuple, the seed picks how many frames the agent waits before it starts fighting
+        The agent acts greedily and the emulator is deterministic, so this delay is what makes each seed a different match
+
+    Returns
+    -------
+    result
+        A dictionary with the state, whether the agent won, the rounds it won, the damage dealt and taken and the match length in steps
+    """
+    state, seed = task
+    random.seed(seed)
+    numpy.random.seed(seed)
+
+    winsBefore = evaluationAgent.getNumberOfWins()
+    evaluationLobby.play(state= state, render= False, record= False, startDelay= random.randint(0, MAX_START_DELAY))
+    return {'state' : state,
+            'won' : evaluationAgent.getNumberOfWins() > winsBefore,
+            'roundsWon' : evaluationLobby.lastInfo['player1_matches_won'],
+            'damageDealt' : evaluationLobby.damageTaken[1],
+            'damageTaken' : evaluationLobby.damageTaken[0],
+            'length' : evaluationLobby.numSteps}
+
+def summarize(results):
+    """
+    Aggregates match results per matchup
+
+    Parameters
+    ----------
+    results
+        A list of dictionaries returned by evaluateMatch
+
+    Returns
+    -------
+    summary
+        A dictionary from state name to its number of matches, win rate, mean rounds won, damage ratio and mean match length
+    """
+    summary = {}
+    for state in sorted(set([result['state'] for result in results])):
+        matches = [result for result in results if result['state'] == state]
+        damageTaken = sum([match['damageTaken'] for match in matches])
+        summary[state] = {'matches' : len(matches),
+                          'winRate' : numpy.mean([match['won'] for match in matches]),
+                          'roundsWon' : numpy.mean([match['roundsWon'] for match in matches]),
+                          'damageRatio' : sum([match['damageDealt'] for match in matches]) / max(damageTaken, 1),
+                          'length' : numpy.mean([match['length'] for match in matches])}
+    return summary
+
+"""
+Loads a trained agent and evaluates it greedily across every save state and several seeds in parallel, with no rendering or recording
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description= 'Evaluates a trained agent across every save state in parallel.')
+    parser.add_argument('-cn', '--className', type= str, default= "DeepQAgent", help= 'Name of the class library to import')
+    parser.add_argument('-mn', '--modelName', type= str, default= None, help= 'Name of the specific model to be loaded and evaluated')
+    parser.add_argument('-c', '--character', type= str,  default= "ryu", help= 'The specific character this agent will play')
+    parser.add_argument('-s', '--seeds', type= int, default= 3, help= 'Number of seeds each save state is played with')
+    parser.add_argument('-p', '--processes', type= int, default= None, help= 'Number of matches played at the same time, defaults to the number of cores')
+    args = parser.parse_args()
+    if args.modelName is None:
+        args.modelName = args.className
+
+    from Lobby import Lobby
+    from Agent import Agent
+    stateLobby = Lobby(verbose= False)
+    stateLobby.addPlayer(Agent(character= args.character))
+    states = stateLobby.getSaveStateList()
+    tasks = [(state, seed) for state in states for seed in range(args.seeds)]
+
+    # TensorFlow does not survive being forked so evaluation processes are always spawned fresh
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes= args.processes, initializer= initializeEvaluator, initargs= (args.className, args.modelName, args.character)) as pool:
+        results = pool.map(evaluateMatch, tasks)
+
+    summary = summarize(results)
+    print('{0:<35}{1:<9}{2:<9}{3:<13}{4:<14}{5}'.format('Matchup', 'Matches', 'Win %', 'Rounds Won', 'Damage Ratio', 'Mean Length'))
+    for state, stats in summary.items():
+        print('{0:<35}{1:<9}{2:<9}{3:<13}{4:<14}{5}'.format(state, stats['matches'], round(stats['winRate'] * 100, 2), round(stats['roundsWon'], 2), round(stats['damageRatio'], 2), round(stats['length'], 1)))
+    print('Overall win rate: {0}%'.format(round(numpy.mean([result['won'] for result in results]) * 100, 2)))
@@ -0,0 +1,55 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from ActionTable import buildActionTable
+
+BUTTONS = ['B', 'A', 'MODE', 'START', 'UP', 'DOWN', 'LEFT', 'RIGHT', 'C', 'Y', 'X', 'Z']
+COMBOS = [[], ['UP'], ['DOWN'], ['LEFT'], ['RIGHT'], ['B'], ['A'], ['DOWN', 'B'], ['DOWN', 'RIGHT'], ['RIGHT', 'DOWN'], ['DOWN', 'RIGHT', 'B'], ['C', 'Z']]
+
+def makeMask(held):
+    """Returns the held button mask of a list of button names"""
+    return sum([1 << BUTTONS.index(button) for button in set(held)])
+
+def referenceAction(held, combos):
+    """Picks the action for a set of held buttons by checking every combo directly"""
+    for action, combo in enumerate(combos):
+        if set(combo) == set(held): return action
+    best, bestSize = 0, -1
+    for action, combo in enumerate(combos):
+        if set(combo) <= set(held) and len(set(combo)) > bestSize: best, bestSize = action, len(set(combo))
+    return best
+
+class TestBuildActionTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = buildActionTable(BUTTONS, COMBOS)
+
+    def lookUp(self, held):
+        return self.table[makeMask(held)]
+
+    def test_one_entry_per_held_mask(self):
+        self.assertEqual(len(self.table), 1 << len(BUTTONS))
+
+    def test_exact_combo_is_chosen(self):
+        for action, combo in enumerate(COMBOS):
+            if action == 9: continue                                                    # The same buttons as combo 8, see below
+            self.assertEqual(self.lookUp(combo), action)
+
+    def test_earliest_of_equal_combos_wins(self):
+        self.assertEqual(self.lookUp(['RIGHT', 'DOWN']), 8)
+
+    def test_largest_held_combo_is_chosen(self):
+        self.assertEqual(self.lookUp(['DOWN', 'RIGHT', 'B', 'A']), 10)
+        self.assertEqual(self.lookUp(['DOWN', 'B', 'START']), 7)
+        self.assertEqual(self.lookUp(['UP', 'LEFT']), 1)                                # Ties between single buttons go to the earlier combo
+        self.assertEqual(self.lookUp(['C', 'MODE']), 0)                                 # Nothing held matches, the empty combo is left
+
+    def test_every_mask_matches_reference(self):
+        for heldMask in range(len(self.table)):
+            held = [button for index, button in enumerate(BUTTONS) if heldMask & (1 << index)]
+            self.assertEqual(self.table[heldMask], referenceAction(held, COMBOS))
+
+if __name__ == '__main__':
+    unittest.main()
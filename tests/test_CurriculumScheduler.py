@@ -0,0 +1,65 @@
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from CurriculumScheduler import CurriculumScheduler
+
+STATES = ['easy', 'even', 'hard', 'mirror']
+
+def playEveryState(scheduler, odds, fights):
+    """Records fights in every state with the given chance of winning"""
+    for state, chance in odds.items():
+        for fight in range(fights): scheduler.recordResult(state, random.random() < chance, 100 if random.random() < chance else -100)
+
+class TestPickState(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+
+    def test_unplayed_states_are_tried_first(self):
+        scheduler = CurriculumScheduler(STATES)
+        picked = []
+        for fight in range(len(STATES)):
+            state = scheduler.pickState()
+            self.assertNotIn(state, picked)
+            picked.append(state)
+            scheduler.recordResult(state, True, 100)
+        self.assertEqual(sorted(picked), sorted(STATES))
+
+    def test_even_matchups_are_favored(self):
+        scheduler = CurriculumScheduler(STATES, exploration= 0)
+        playEveryState(scheduler, {'easy' : 1, 'even' : 0.5, 'hard' : 0, 'mirror' : 0.5}, 20)
+        self.assertGreater(scheduler.getScore('even'), scheduler.getScore('easy'))
+        self.assertGreater(scheduler.getScore('even'), scheduler.getScore('hard'))
+
+        picks = {state : 0 for state in STATES}
+        for fight in range(2000): picks[scheduler.pickState()] += 1
+        self.assertGreater(picks['even'], picks['easy'])
+        self.assertGreater(picks['even'], picks['hard'])
+        self.assertGreater(picks['easy'], 0)                                            # The score floor keeps every state in the running
+
+    def test_subset_is_respected(self):
+        scheduler = CurriculumScheduler(STATES)
+        subset = ['easy', 'hard']
+        for fight in range(200):
+            state = scheduler.pickState(subset)
+            self.assertIn(state, subset)
+            scheduler.recordResult(state, random.random() < 0.5, 0)
+        self.assertEqual(scheduler.numPlayed['even'], 0)
+        self.assertEqual(scheduler.numPlayed['mirror'], 0)
+
+    def test_unplayed_states_outside_the_subset_are_not_tried(self):
+        scheduler = CurriculumScheduler(STATES)
+        scheduler.recordResult('easy', True, 100)
+        self.assertEqual(scheduler.pickState(['easy', 'hard']), 'hard')
+        for fight in range(50): self.assertEqual(scheduler.pickState(['easy']), 'easy')
+
+    def test_subset_must_be_tracked_states(self):
+        scheduler = CurriculumScheduler(STATES)
+        with self.assertRaises(AssertionError): scheduler.pickState(['unknown'])
+        with self.assertRaises(AssertionError): scheduler.pickState([])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import os
+import sys
+import types
+import random
+import importlib.util
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+# The round phase rules only read RAM variables, the emulator packages are stood in for when they are not installed
+for moduleName in ('gym', 'retro'):
+    if moduleName not in sys.modules and importlib.util.find_spec(moduleName) is None: sys.modules[moduleName] = types.ModuleType(moduleName)
+if not hasattr(sys.modules['gym'], 'Wrapper'): sys.modules['gym'].Wrapper = object
+
+from Discretizer import StreetFighter2Discretizer, StreetFighter2PhaseTracker, Round_Phases
+from Lobby import Lobby, Lobby_Modes
+
+NOT_STARTED = StreetFighter2Discretizer.ROUND_TIMER_NOT_STARTED
+
+def makeInfo(timer, health1, health2, wins1= 0, wins2= 0):
+    """Returns the part of an info dictionary the phase tracking reads"""
+    return {'round_timer' : timer, 'player1_health' : health1, 'player2_health' : health2, 'player1_matches_won' : wins1, 'player2_matches_won' : wins2}
+
+def makeDiscretizer():
+    """Builds a discretizer with only its phase tracking set up, no emulator is needed to track phases"""
+    discretizer = StreetFighter2Discretizer.__new__(StreetFighter2Discretizer)
+    discretizer.prevHealths = None
+    discretizer.phase = None
+    discretizer.actionable = False
+    discretizer.unsubscribeAll()
+    return discretizer
+
+class ScriptedEnvironment():
+    """Steps through a fixed list of infos, tracking phases the way Discretizer.step does"""
+
+    def __init__(self, infos):
+        self.infos = list(infos)
+        self.discretizer = makeDiscretizer()
+        self.stepsTaken = 0
+
+    def step(self, actions):
+        info = self.infos[self.stepsTaken]
+        self.stepsTaken += 1
+        self.discretizer.isActionableState(info)
+        return None, [0, 0], False, info
+
+    def isActionable(self):
+        return self.discretizer.isActionable()
+
+# A round decided by a knock out: the knock out frame is actionable so the win can be recorded, the rest of the animation is not
+DECIDING_KNOCK_OUT = [makeInfo(90, 100, 20, 1), makeInfo(90, 100, -1, 1), makeInfo(90, 100, -1, 1), makeInfo(90, 100, -1, 1),
+                      makeInfo(90, 100, 0, 1), makeInfo(NOT_STARTED, 176, 176, 1), makeInfo(99, 176, 176, 1)]
+EXPECTED_DECIDING = [(Round_Phases.FIGHTING, True), (Round_Phases.KO, True), (Round_Phases.KO, False), (Round_Phases.KO, False),
+                     (Round_Phases.ROUND_END, False), (Round_Phases.PRE_ROUND, False), (Round_Phases.FIGHTING, True)]
+
+# A first round knock out is never actionable
+FIRST_KNOCK_OUT = [makeInfo(NOT_STARTED, 176, 176), makeInfo(99, 176, 176), makeInfo(80, -1, 50), makeInfo(80, -1, 50, 0, 1),
+                   makeInfo(80, 0, 50, 0, 1), makeInfo(NOT_STARTED, 176, 176, 0, 1), makeInfo(99, 176, 176, 0, 1)]
+EXPECTED_FIRST = [(Round_Phases.PRE_ROUND, False), (Round_Phases.FIGHTING, True), (Round_Phases.KO, False), (Round_Phases.KO, False),
+                  (Round_Phases.ROUND_END, False), (Round_Phases.PRE_ROUND, False), (Round_Phases.FIGHTING, True)]
+
+class TestPhaseTracking(unittest.TestCase):
+
+    def assertTracks(self, infos, expected):
+        discretizer = makeDiscretizer()
+        for info, (phase, isActionable) in zip(infos, expected):
+            self.assertEqual(discretizer.isActionableState(info), isActionable)
+            self.assertEqual(discretizer.isActionable(), isActionable)
+            self.assertIs(discretizer.getPhase(), phase)
+
+    def test_deciding_knock_out(self):
+        self.assertTracks(DECIDING_KNOCK_OUT, EXPECTED_DECIDING)
+
+    def test_first_knock_out(self):
+        self.assertTracks(FIRST_KNOCK_OUT, EXPECTED_FIRST)
+
+    def test_match_end(self):
+        discretizer = makeDiscretizer()
+        discretizer.isActionableState(makeInfo(90, 100, -1, 1))
+        discretizer.isActionableState(makeInfo(90, 100, -1, 2))
+        self.assertIs(discretizer.getPhase(), Round_Phases.MATCH_END)
+        self.assertFalse(discretizer.isActionable())
+
+    def test_subscribers_hear_each_new_phase_once(self):
+        discretizer = makeDiscretizer()
+        heard = []
+        for phase in Round_Phases: discretizer.subscribe(phase, lambda phase, info: heard.append(phase))
+        for info in DECIDING_KNOCK_OUT: discretizer.isActionableState(info)
+        self.assertEqual(heard, [Round_Phases.FIGHTING, Round_Phases.KO, Round_Phases.ROUND_END, Round_Phases.PRE_ROUND, Round_Phases.FIGHTING])
+
+def makeRandomFight(generator, numFrames):
+    """Makes up a sequence of infos that wanders through every phase, including orders a real fight never shows"""
+    infos, wins = [], [0, 0]
+    for frame in range(numFrames):
+        if generator.random() < 0.05: wins[generator.randint(0, 1)] += 1
+        if max(wins) > 2 or generator.random() < 0.02: wins = [0, 0]                  # A new match starts
+        health1, health2 = generator.choice([-1, 0, 50, 176]), generator.choice([-1, 0, 50, 176])
+        infos.append(makeInfo(generator.choice([NOT_STARTED, 99, 60]), health1, health2, *wins))
+    return infos
+
+class TestPhaseTrackerAgreement(unittest.TestCase):
+
+    def assertAgrees(self, fights):
+        """Tracks each fight with its own discretizer and all of them at once with one tracker, comparing every frame"""
+        discretizers = [makeDiscretizer() for fight in fights]
+        heard = [[] for fight in fights]
+        for discretizer, events in zip(discretizers, heard):
+            for phase in Round_Phases: discretizer.subscribe(phase, lambda phase, info, events= events: events.append(phase))
+        tracker = StreetFighter2PhaseTracker(len(fights))
+
+        for frame in range(len(fights[0])):
+            infos = [fight[frame] for fight in fights]
+            numHeard = [len(events) for events in heard]
+            expected = [discretizer.isActionableState(info) for discretizer, info in zip(discretizers, infos)]
+            isActionable = tracker.update({variable : [info[variable] for info in infos] for variable in StreetFighter2PhaseTracker.VARIABLES})
+
+            self.assertEqual(list(isActionable), expected, 'frame {0}'.format(frame))
+            self.assertEqual(list(tracker.getPhases()), [discretizer.getPhase().value for discretizer in discretizers], 'frame {0}'.format(frame))
+            for phase in Round_Phases:
+                entering = [environment for environment, events in enumerate(heard) if events[numHeard[environment]:] == [phase]]
+                self.assertEqual(list(tracker.getEnvironmentsEntering(phase)), entering, 'frame {0}'.format(frame))
+
+    def test_scripted_fights(self):
+        self.assertAgrees([DECIDING_KNOCK_OUT, FIRST_KNOCK_OUT])
+
+    def test_random_fights(self):
+        generator = random.Random(0)
+        self.assertAgrees([makeRandomFight(generator, 500) for environment in range(8)])
+
+    def test_reset_environment_starts_over(self):
+        tracker = StreetFighter2PhaseTracker(2)
+        columns = lambda infos: {variable : [info[variable] for info in infos] for variable in StreetFighter2PhaseTracker.VARIABLES}
+        tracker.update(columns([makeInfo(90, 100, 0), makeInfo(90, 100, 0)]))
+        tracker.reset([1])
+        self.assertEqual(list(tracker.getPhases()), [Round_Phases.FIGHTING.value, -1])
+
+        # The reset environment has no previous health, so like a fresh discretizer it cannot tell this is the first knock out frame
+        infos = [makeInfo(90, 100, -1, 1), makeInfo(90, 100, -1, 1)]
+        discretizer = makeDiscretizer()
+        isActionable = tracker.update(columns(infos))
+        self.assertEqual(list(isActionable), [True, discretizer.isActionableState(infos[1])])
+        self.assertEqual(list(tracker.getEnvironmentsEntering(Round_Phases.KO)), [0, 1])
+
+class TestLobbyWaitsForControl(unittest.TestCase):
+
+    def makeLobby(self, infos):
+        lobby = Lobby.__new__(Lobby)
+        lobby.mode = Lobby_Modes.SINGLE_PLAYER
+        lobby.environment = ScriptedEnvironment(infos)
+        lobby.clock = None
+        lobby.done = False
+        lobby.lastObservation, _, _, lobby.lastInfo = lobby.environment.step([Lobby.NO_ACTION])
+        return lobby
+
+    def test_knock_out_animation_is_skipped_after_the_actionable_frame(self):
+        lobby = self.makeLobby(DECIDING_KNOCK_OUT)
+        lobby.waitForActionableState()
+        self.assertEqual(lobby.environment.stepsTaken, 1)                             # Fighting, nothing to wait for
+
+        lobby.environment.step([0])                                                    # The players' move lands the knock out
+        lobby.waitForActionableState()
+        self.assertEqual(lobby.environment.stepsTaken, 2)                             # The knock out frame is still theirs to act on
+
+        lobby.environment.step([0])                                                    # After it they lose control until the next round starts
+        lobby.waitForActionableState()
+        self.assertEqual(lobby.environment.stepsTaken, len(DECIDING_KNOCK_OUT))
+        self.assertIs(lobby.environment.discretizer.getPhase(), Round_Phases.FIGHTING)
+
+    def test_non_actionable_knock_out_is_skipped(self):
+        lobby = self.makeLobby(FIRST_KNOCK_OUT)
+        lobby.waitForActionableState()
+        self.assertEqual(lobby.environment.stepsTaken, 2)
+
+        lobby.environment.step([0])
+        lobby.waitForActionableState()
+        self.assertEqual(lobby.environment.stepsTaken, len(FIRST_KNOCK_OUT))
+        self.assertEqual(lobby.lastInfo, FIRST_KNOCK_OUT[-1])
+
+if __name__ == '__main__':
+    unittest.main()
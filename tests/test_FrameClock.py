@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+import FrameClock as FrameClockModule
+from FrameClock import FrameClock
+
+class FakeTime():
+    """A clock that only moves when the test spends time or the frame clock sleeps"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def spend(self, seconds):
+        self.now += seconds
+
+class TestFrameClock(unittest.TestCase):
+
+    def setUp(self):
+        self.time = FakeTime()
+        patcher = mock.patch.object(FrameClockModule, 'time', self.time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock = FrameClock(frameRate= 10)                                          # A tenth of a second a frame keeps the numbers readable
+
+    def test_on_time_frames_sleep_out_the_rest_of_the_frame(self):
+        for frame in range(5):
+            self.time.spend(0.04)
+            self.assertEqual(self.clock.tick(), 0.0)
+        self.assertEqual(self.clock.getDeadlinesMissed(), 0)
+        self.assertEqual(self.clock.getFramesTicked(), 5)
+        for slept in self.time.slept: self.assertAlmostEqual(slept, 0.06)
+        self.assertAlmostEqual(self.clock.getFrameRate(), 10)
+
+    def test_deadlines_come_from_the_start_not_the_last_frame(self):
+        self.time.spend(0.15)                                                           # Half a frame late
+        self.assertAlmostEqual(self.clock.tick(), 0.05)
+        self.time.spend(0.01)                                                           # A quick frame catches back up
+        self.assertEqual(self.clock.tick(), 0.0)
+        self.assertAlmostEqual(self.time.now, 100.2)                                     # Second deadline, two frames after the start
+        self.assertEqual(self.clock.getDeadlinesMissed(), 1)
+        self.assertAlmostEqual(self.clock.getAverageLateness(), 0.05)
+
+    def test_falling_far_behind_resets_the_schedule(self):
+        self.time.spend(0.45)                                                           # Three and a half frames late
+        self.assertAlmostEqual(self.clock.tick(), 0.35)
+        self.time.spend(0.04)                                                           # The backlog is dropped, not rushed through
+        self.assertEqual(self.clock.tick(), 0.0)
+        self.assertAlmostEqual(self.time.now, 100.55)
+        self.assertEqual(self.clock.getDeadlinesMissed(), 1)
+
+    def test_start_clears_the_statistics(self):
+        self.time.spend(0.3)
+        self.clock.tick()
+        self.clock.start()
+        self.assertEqual(self.clock.getDeadlinesMissed(), 0)
+        self.assertEqual(self.clock.getFramesTicked(), 0)
+        self.assertEqual(self.clock.getAverageLateness(), 0.0)
+        self.time.spend(0.05)
+        self.assertEqual(self.clock.tick(), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from MatchHistory import MatchHistory
+
+def makePlayer(name, character= 'ryu'):
+    """Returns the player dictionary recordMatch takes for one side"""
+    return {'name' : name, 'className' : 'DeepQAgent', 'character' : character}
+
+class TestMatchHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix= 'history_test_')
+        self.history = MatchHistory(os.path.join(self.directory, 'history.db'))
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.directory, ignore_errors= True)
+
+    def recordMatch(self, player1, player2, player1Won, character1= 'ryu', character2= 'ken'):
+        self.history.recordMatch('state', [makePlayer(player1, character1), makePlayer(player2, character2)], [player1Won, not player1Won],
+                                 [2, 0] if player1Won else [0, 2], [50, 0] if player1Won else [0, 50], [126, 176] if player1Won else [176, 126])
+
+    def test_head_to_head_from_either_side(self):
+        self.recordMatch('a', 'b', True)
+        self.recordMatch('b', 'a', True)
+        self.recordMatch('a', 'b', True)
+        self.history.flush()
+        self.assertEqual(self.history.getHeadToHead('a', 'b'), (2, 1, 3))
+        self.assertEqual(self.history.getHeadToHead('b', 'a'), (1, 2, 3))
+        self.assertEqual(self.history.getHeadToHead('a', 'c'), (0, 0, 0))
+
+    def test_self_play_is_counted_once(self):
+        self.recordMatch('a', 'a', True)
+        self.recordMatch('a', 'a', False)
+        self.recordMatch('a', 'b', True)
+        self.history.flush()
+        self.assertEqual(self.history.getHeadToHead('a', 'a'), (1, 1, 2))
+
+    def test_leaderboard_and_character_records(self):
+        self.recordMatch('a', 'b', True)
+        self.recordMatch('a', 'b', True)
+        self.recordMatch('b', 'a', True, 'ken', 'ryu')
+        self.history.flush()
+        self.assertEqual(self.history.getNumberOfMatches(), 3)
+        leaderboard = self.history.getLeaderboard()
+        self.assertEqual(tuple(leaderboard[0]), ('a', 'ryu', 2, 3))
+        records = {row[0] : tuple(row[1:]) for row in self.history.getCharacterRecords()}
+        self.assertEqual(records, {'ryu' : (2, 3), 'ken' : (1, 3)})
+
+    def test_history_survives_reopening(self):
+        self.recordMatch('a', 'b', True)
+        self.history.close()
+        self.history = MatchHistory(self.history.path)
+        self.assertEqual(self.history.getNumberOfMatches(), 1)
+        self.assertEqual(self.history.getHeadToHead('a', 'b'), (1, 0, 1))
+
+if __name__ == '__main__':
+    unittest.main()
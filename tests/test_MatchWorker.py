@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import types
+import signal
+import socket
+import tempfile
+import importlib.util
+import multiprocessing
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+# Matches are stubbed out below so the emulator packages are stood in for when they are not installed
+for moduleName in ('gym', 'retro'):
+    if moduleName not in sys.modules and importlib.util.find_spec(moduleName) is None: sys.modules[moduleName] = types.ModuleType(moduleName)
+if not hasattr(sys.modules['gym'], 'Wrapper'): sys.modules['gym'].Wrapper = object
+
+from MatchWorker import MatchWorker
+from MatchCoordinator import MatchCoordinator
+
+class StubWorker(MatchWorker):
+    """
+    A worker whose matches are made up, the save state of each match says how it should go
+    'crash' and 'stall' only misbehave on the first worker to play them, claimed through a flag file, so the retry succeeds
+    """
+
+    def __init__(self, flagDir, **kwargs):
+        super().__init__(**kwargs)
+        self.flagDir = flagDir
+
+    def claim(self, name):
+        """Returns True for the first worker process to claim a name"""
+        try:
+            os.close(os.open(os.path.join(self.flagDir, name), os.O_CREAT | os.O_EXCL))
+            return True
+        except FileExistsError:
+            return False
+
+    def playMatch(self, message):
+        state = message['state']
+        if state == 'error': return {'type' : MatchWorker.ERROR_MESSAGE, 'job' : message['job'], 'error' : 'stub failure'}
+        if state == 'crash' and self.claim('crash'): os._exit(1)                                  # Dies mid-job, the connection drops
+        if state == 'stall' and self.claim('stall'): os.kill(os.getpid(), signal.SIGSTOP)        # Freezes mid-job, the heartbeats stop
+        time.sleep(0.05)
+        return {'type' : MatchWorker.RESULT_MESSAGE, 'job' : message['job'], 'state' : state, 'worker' : self.address[1], 'pid' : os.getpid()}
+
+def serveStubWorker(port, authkey, flagDir):
+    StubWorker(flagDir, host= '127.0.0.1', port= port, authkey= authkey).serve()
+
+def getFreePort():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+class StubPlayer():
+    """Enough of an Agent for makePlayerSpec"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def getName(self):
+        return self.name
+
+    def getCharacter(self):
+        return 'ryu'
+
+    def getPolicyWeights(self):
+        return None
+
+    def __repr__(self):
+        return "Agent"
+
+class TestMatchWorkers(unittest.TestCase):
+
+    NUM_WORKERS = 3
+
+    def setUp(self):
+        # Shrink the timing so a dead worker is noticed in about a second, forked workers inherit the heartbeat interval
+        self.timing = (MatchWorker.HEARTBEAT_INTERVAL, MatchCoordinator.HEARTBEAT_TIMEOUT, MatchCoordinator.RECONNECT_DELAY)
+        MatchWorker.HEARTBEAT_INTERVAL = 0.1
+        MatchCoordinator.HEARTBEAT_TIMEOUT = 1.0
+        MatchCoordinator.RECONNECT_DELAY = 0.2
+
+        self.flagDir = tempfile.mkdtemp(prefix= 'worker_test_')
+        self.authkey = os.urandom(16)
+        self.addresses = [('127.0.0.1', getFreePort()) for worker in range(TestMatchWorkers.NUM_WORKERS)]
+        context = multiprocessing.get_context('fork')
+        self.processes = [context.Process(target= serveStubWorker, args= (port, self.authkey, self.flagDir), daemon= True) for host, port in self.addresses]
+        [process.start() for process in self.processes]
+        self.coordinator = MatchCoordinator(self.addresses, authkey= self.authkey)
+        self.players = [StubPlayer('a'), StubPlayer('b')]
+
+    def tearDown(self):
+        for process in self.processes:
+            if process.is_alive() and process.pid is not None:
+                try: os.kill(process.pid, signal.SIGCONT)
+                except OSError: pass
+        self.coordinator.shutdownWorkers()
+        for process in self.processes:
+            process.join(timeout= 5)
+            if process.is_alive(): process.kill()
+        for name in os.listdir(self.flagDir): os.remove(os.path.join(self.flagDir, name))
+        os.rmdir(self.flagDir)
+        MatchWorker.HEARTBEAT_INTERVAL, MatchCoordinator.HEARTBEAT_TIMEOUT, MatchCoordinator.RECONNECT_DELAY = self.timing
+
+    def killWorker(self, pid):
+        """Kills a worker process by pid so the coordinator's reconnect attempts fail quickly"""
+        for process in self.processes:
+            if process.pid == pid: process.kill()
+
+    def test_results_are_collected_across_workers(self):
+        jobs = {self.coordinator.submitMatch(self.players, 'state_{0}'.format(match)) : match for match in range(12)}
+        results = {job : self.coordinator.getResult(job, timeout= 20) for job in jobs}
+        for job, match in jobs.items():
+            self.assertIsNotNone(results[job])
+            self.assertEqual(results[job]['type'], MatchWorker.RESULT_MESSAGE)
+            self.assertEqual(results[job]['state'], 'state_{0}'.format(match))
+        self.assertGreater(len(set([result['worker'] for result in results.values()])), 1)
+
+    def test_match_is_requeued_when_a_worker_dies(self):
+        result = self.coordinator.getResult(self.coordinator.submitMatch(self.players, 'crash'), timeout= 20)
+        self.assertIsNotNone(result)
+        self.assertEqual(result['type'], MatchWorker.RESULT_MESSAGE)
+        self.assertTrue(os.path.exists(os.path.join(self.flagDir, 'crash')))
+        self.assertEqual(sum([process.is_alive() for process in self.processes]), TestMatchWorkers.NUM_WORKERS - 1)
+
+    def test_match_is_requeued_when_heartbeats_stop(self):
+        start = time.time()
+        result = self.coordinator.getResult(self.coordinator.submitMatch(self.players, 'stall'), timeout= 20)
+        self.assertIsNotNone(result)
+        self.assertEqual(result['type'], MatchWorker.RESULT_MESSAGE)
+        self.assertGreaterEqual(time.time() - start, MatchCoordinator.HEARTBEAT_TIMEOUT)
+        stalled = [process.pid for process in self.processes if process.pid != result['pid']]
+        self.assertTrue(os.path.exists(os.path.join(self.flagDir, 'stall')))
+        # The frozen worker never answers, kill it so its reconnecting dispatch thread gives up
+        for pid in stalled:
+            with open('/proc/{0}/stat'.format(pid)) as stat:
+                if stat.read().split(')')[-1].split()[0] == 'T': self.killWorker(pid)
+
+    def test_error_is_reported_after_max_attempts(self):
+        result = self.coordinator.getResult(self.coordinator.submitMatch(self.players, 'error'), timeout= 20)
+        self.assertIsNotNone(result)
+        self.assertEqual(result['type'], MatchWorker.ERROR_MESSAGE)
+        self.assertEqual(result['error'], 'stub failure')
+
+class TestWorkerAuthentication(unittest.TestCase):
+
+    def test_non_loopback_worker_needs_an_authkey(self):
+        with self.assertRaises(ValueError): MatchWorker(host= '0.0.0.0', port= getFreePort())
+
+    def test_loopback_check(self):
+        self.assertTrue(MatchWorker.isLoopback('127.0.0.1'))
+        self.assertTrue(MatchWorker.isLoopback('::1'))
+        self.assertTrue(MatchWorker.isLoopback('localhost'))
+        self.assertFalse(MatchWorker.isLoopback('0.0.0.0'))
+
+if __name__ == '__main__':
+    unittest.main()
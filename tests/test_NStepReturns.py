@@ -0,0 +1,127 @@
+import os
+import sys
+import random
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from NStepReturns import computeNStepReturns, findRoundBoundaries
+
+def referenceNStepReturns(rewards, terminals, gamma, nSteps):
+    """Computes the n-step returns one step at a time, stopping at the end of the fight or after a terminal step"""
+    returns, bootstrapIndices, bootstrapDiscounts = [], [], []
+    for step in range(len(rewards)):
+        total, numIncluded = 0.0, 0
+        while numIncluded < nSteps and step + numIncluded < len(rewards):
+            total += gamma ** numIncluded * rewards[step + numIncluded]
+            numIncluded += 1
+            if terminals[step + numIncluded - 1]: break
+        lastStep = step + numIncluded - 1
+        returns.append(total)
+        bootstrapIndices.append(lastStep)
+        bootstrapDiscounts.append(0.0 if terminals[lastStep] else gamma ** numIncluded)
+    return returns, bootstrapIndices, bootstrapDiscounts
+
+def makeInfo(player1Wins, player2Wins):
+    """Returns the part of an info dictionary findRoundBoundaries reads"""
+    return {'player1_matches_won' : player1Wins, 'player2_matches_won' : player2Wins}
+
+class TestComputeNStepReturns(unittest.TestCase):
+
+    def assertMatchesReference(self, rewards, terminals, gamma, nSteps):
+        returns, bootstrapIndices, bootstrapDiscounts = computeNStepReturns(rewards, terminals, gamma, nSteps)
+        expectedReturns, expectedIndices, expectedDiscounts = referenceNStepReturns(rewards, terminals, gamma, nSteps)
+        numpy.testing.assert_allclose(returns, expectedReturns)
+        numpy.testing.assert_array_equal(bootstrapIndices, expectedIndices)
+        numpy.testing.assert_allclose(bootstrapDiscounts, expectedDiscounts)
+
+    def test_round_boundary_stops_the_sum(self):
+        rewards = [0, 0, 10, 0, -100, 0, 5, 0, 0, 100]
+        terminals = [False, False, False, False, True, False, False, False, False, True]
+        returns, bootstrapIndices, bootstrapDiscounts = computeNStepReturns(rewards, terminals, 0.9, 3)
+
+        # Step 3 only sums its own reward and the round ending one, never the next round's
+        self.assertAlmostEqual(returns[3], 0 + 0.9 * -100)
+        self.assertEqual(bootstrapIndices[3], 4)
+        self.assertEqual(bootstrapDiscounts[3], 0)
+        self.assertMatchesReference(rewards, terminals, 0.9, 3)
+
+    def test_bootstraps_with_discount_of_rewards_summed(self):
+        rewards = [1, 2, 3, 4, 5, 6]
+        terminals = [False] * 6
+        returns, bootstrapIndices, bootstrapDiscounts = computeNStepReturns(rewards, terminals, 0.5, 2)
+
+        self.assertAlmostEqual(returns[0], 1 + 0.5 * 2)
+        self.assertEqual(bootstrapIndices[0], 1)
+        self.assertAlmostEqual(bootstrapDiscounts[0], 0.25)
+
+        # The last step has no reward after it, so it bootstraps from itself with one reward summed
+        self.assertAlmostEqual(returns[5], 6)
+        self.assertEqual(bootstrapIndices[5], 5)
+        self.assertAlmostEqual(bootstrapDiscounts[5], 0.5)
+
+    def test_done_step_never_bootstraps(self):
+        rewards = [0, 1, 100]
+        terminals = [False, False, True]
+        returns, bootstrapIndices, bootstrapDiscounts = computeNStepReturns(rewards, terminals, 0.99, 5)
+        numpy.testing.assert_array_equal(bootstrapIndices, [2, 2, 2])
+        numpy.testing.assert_array_equal(bootstrapDiscounts, [0, 0, 0])
+        self.assertAlmostEqual(returns[0], 0.99 + 0.99 ** 2 * 100)
+
+    def test_one_step_returns_are_the_rewards(self):
+        rewards = [3, -1, 4, 1, -5]
+        terminals = [False, True, False, False, True]
+        returns, bootstrapIndices, bootstrapDiscounts = computeNStepReturns(rewards, terminals, 0.9, 1)
+        numpy.testing.assert_allclose(returns, rewards)
+        numpy.testing.assert_array_equal(bootstrapIndices, range(5))
+        numpy.testing.assert_allclose(bootstrapDiscounts, [0.9, 0, 0.9, 0.9, 0])
+
+    def test_empty_fight(self):
+        returns, bootstrapIndices, bootstrapDiscounts = computeNStepReturns([], [], 0.9, 3)
+        self.assertEqual(len(returns), 0)
+        self.assertEqual(len(bootstrapIndices), 0)
+        self.assertEqual(len(bootstrapDiscounts), 0)
+
+    def test_random_fights_match_reference(self):
+        generator = random.Random(0)
+        for trial in range(50):
+            numSteps = generator.randint(1, 40)
+            rewards = [generator.uniform(-10, 10) for step in range(numSteps)]
+            terminals = [generator.random() < 0.15 for step in range(numSteps)]
+            gamma = generator.choice([0, 0.5, 0.9, 1])
+            nSteps = generator.randint(1, 8)
+            self.assertMatchesReference(rewards, terminals, gamma, nSteps)
+
+class TestFindRoundBoundaries(unittest.TestCase):
+
+    def test_round_counted_within_a_step(self):
+        states = [makeInfo(0, 0), makeInfo(0, 0), makeInfo(1, 0)]
+        nextStates = [makeInfo(0, 0), makeInfo(1, 0), makeInfo(1, 0)]
+        numpy.testing.assert_array_equal(findRoundBoundaries(states, nextStates, [False] * 3), [False, True, False])
+
+    def test_round_counted_between_steps(self):
+        # The win is counted during the frames skipped while waiting for the next round
+        states = [makeInfo(0, 0), makeInfo(0, 0), makeInfo(0, 1), makeInfo(0, 1)]
+        nextStates = [makeInfo(0, 0), makeInfo(0, 0), makeInfo(0, 1), makeInfo(0, 1)]
+        numpy.testing.assert_array_equal(findRoundBoundaries(states, nextStates, [False] * 4), [False, True, False, False])
+
+    def test_done_ends_the_fight(self):
+        states = [makeInfo(1, 1), makeInfo(1, 1)]
+        nextStates = [makeInfo(1, 1), makeInfo(1, 1)]
+        numpy.testing.assert_array_equal(findRoundBoundaries(states, nextStates, [False, True]), [False, True])
+
+    def test_boundaries_split_returns(self):
+        states = [makeInfo(0, 0)] * 3 + [makeInfo(1, 0)] * 3
+        nextStates = [makeInfo(0, 0), makeInfo(0, 0), makeInfo(1, 0)] + [makeInfo(1, 0), makeInfo(1, 0), makeInfo(2, 0)]
+        dones = [False] * 5 + [True]
+        terminals = findRoundBoundaries(states, nextStates, dones)
+        numpy.testing.assert_array_equal(terminals, [False, False, True, False, False, True])
+
+        rewards = [1, 1, 100, 1, 1, 100]
+        returns, bootstrapIndices, bootstrapDiscounts = computeNStepReturns(rewards, terminals, 0.9, 4)
+        self.assertAlmostEqual(returns[1], 1 + 0.9 * 100)
+        self.assertEqual(bootstrapIndices[1], 2)
+        self.assertEqual(bootstrapDiscounts[1], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from ReplayMemory import ReplayMemory
+from PalettedFrame import PalettedFrame
+
+FRAME_SHAPE = (8, 8, 3)
+
+def makeStep(stepNumber, paletted= False):
+    """Makes a step whose every field can be traced back to its step number"""
+    frame = numpy.full(FRAME_SHAPE, stepNumber % 256, dtype= numpy.uint8)
+    nextFrame = numpy.full(FRAME_SHAPE, (stepNumber + 1) % 256, dtype= numpy.uint8)
+    if paletted:
+        frame = PalettedFrame(numpy.zeros(FRAME_SHAPE[:2], dtype= numpy.uint8), frame[:1, 0])
+        nextFrame = PalettedFrame(numpy.zeros(FRAME_SHAPE[:2], dtype= numpy.uint8), nextFrame[:1, 0])
+    info = {'player1_health' : stepNumber, 'player2_health' : -stepNumber}
+    nextInfo = {'player1_health' : stepNumber + 1, 'player2_health' : -stepNumber - 1}
+    return (frame, info, stepNumber % 51, float(stepNumber), nextFrame, nextInfo, stepNumber % 7 == 6)
+
+class TestReplayMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.spillDir = tempfile.mkdtemp(prefix= 'replay_test_')
+        # Each step costs more than a fifth of the budget, so every chunk closes after a step or two and older ones spill
+        self.byteBudget = ReplayMemory.estimateBytes(makeStep(0)) * 5
+
+    def tearDown(self):
+        shutil.rmtree(self.spillDir, ignore_errors= True)
+
+    def makeMemory(self, **kwargs):
+        return ReplayMemory(byteBudget= self.byteBudget, chunkSize= 4, spillDir= self.spillDir, **kwargs)
+
+    def assertStepEqual(self, step, stepNumber, reward= None, paletted= False):
+        expected = makeStep(stepNumber, paletted)
+        for index in (0, 4):
+            numpy.testing.assert_array_equal(numpy.asarray(step[index]), numpy.asarray(expected[index]))
+        self.assertEqual(step[1], expected[1])
+        self.assertEqual(step[2], expected[2])
+        self.assertEqual(step[3], expected[3] if reward is None else reward)
+        self.assertEqual(step[5], expected[5])
+        self.assertEqual(step[6], expected[6])
+
+    def listSpilledFiles(self):
+        return [file for directory, _, files in os.walk(self.spillDir) for file in files]
+
+    def test_spills_past_the_budget(self):
+        memory = self.makeMemory(steps= [makeStep(stepNumber) for stepNumber in range(40)])
+        self.assertEqual(len(memory), 40)
+        self.assertGreater(memory.getNumberOfSpilledSteps(), 0)
+        self.assertLessEqual(memory.getInMemoryBytes(), self.byteBudget)
+        self.assertGreater(len(self.listSpilledFiles()), 0)
+        memory.close()
+
+    def test_iteration_keeps_order(self):
+        memory = self.makeMemory(steps= [makeStep(stepNumber) for stepNumber in range(40)])
+        steps = list(memory)
+        self.assertEqual(len(steps), 40)
+        for stepNumber, step in enumerate(steps): self.assertStepEqual(step, stepNumber)
+        memory.close()
+
+    def test_indexing_across_ram_and_disk(self):
+        memory = self.makeMemory(steps= [makeStep(stepNumber) for stepNumber in range(40)])
+        for stepNumber in range(40): self.assertStepEqual(memory[stepNumber], stepNumber)
+        self.assertStepEqual(memory[-1], 39)
+        self.assertStepEqual(memory[-40], 0)
+        with self.assertRaises(IndexError): memory[40]
+        with self.assertRaises(IndexError): memory[-41]
+        memory.close()
+
+    def test_paletted_frames_survive_spilling(self):
+        memory = self.makeMemory(steps= [makeStep(stepNumber, paletted= True) for stepNumber in range(40)])
+        self.assertGreater(memory.getNumberOfSpilledSteps(), 0)
+        for stepNumber, step in enumerate(memory):
+            self.assertIsInstance(step[0], PalettedFrame)
+            self.assertStepEqual(step, stepNumber, paletted= True)
+        memory.close()
+
+    def test_sampling_draws_stored_steps(self):
+        memory = self.makeMemory(steps= [makeStep(stepNumber) for stepNumber in range(40)])
+        samples = memory.sample(40, generator= numpy.random.default_rng(0))
+        stepNumbers = sorted([step[1]['player1_health'] for step in samples])
+        self.assertEqual(stepNumbers, list(range(40)))                                  # Without replacement every step is drawn once
+        for step in samples: self.assertStepEqual(step, step[1]['player1_health'])
+
+        self.assertEqual(len(memory.sample(100, generator= numpy.random.default_rng(0))), 100)
+        self.assertEqual(memory.sample(0), [])
+        memory.close()
+
+    def test_set_rewards_in_ram_and_on_disk(self):
+        memory = self.makeMemory(steps= [makeStep(stepNumber) for stepNumber in range(40)])
+        rewards = numpy.arange(40) * -2.5
+        memory.setRewards(rewards)
+        for stepNumber, step in enumerate(memory): self.assertStepEqual(step, stepNumber, reward= rewards[stepNumber])
+        memory.close()
+
+    def test_maxlen_pops_the_oldest_steps(self):
+        memory = self.makeMemory(steps= [makeStep(stepNumber) for stepNumber in range(40)], maxlen= 25)
+        self.assertEqual(len(memory), 25)
+        for position, step in enumerate(memory): self.assertStepEqual(step, position + 15)
+        self.assertStepEqual(memory.popleft(), 15)
+        self.assertEqual(len(memory), 24)
+        self.assertStepEqual(memory[0], 16)
+        memory.close()
+
+    def test_popleft_deletes_drained_chunks(self):
+        memory = self.makeMemory(steps= [makeStep(stepNumber) for stepNumber in range(40)])
+        spilledFiles = len(self.listSpilledFiles())
+        for stepNumber in range(40): self.assertStepEqual(memory.popleft(), stepNumber)
+        self.assertEqual(len(memory), 0)
+        self.assertGreater(spilledFiles, 0)
+        self.assertEqual(self.listSpilledFiles(), [])
+        with self.assertRaises(IndexError): memory.popleft()
+        memory.close()
+
+    def test_close_removes_spilled_files(self):
+        memory = self.makeMemory(steps= [makeStep(stepNumber) for stepNumber in range(40)])
+        spillPath = memory.spillPath
+        self.assertTrue(os.path.isdir(spillPath))
+        memory.close()
+        self.assertEqual(len(memory), 0)
+        self.assertFalse(os.path.exists(spillPath))
+        self.assertEqual(self.listSpilledFiles(), [])
+
+if __name__ == '__main__':
+    unittest.main()
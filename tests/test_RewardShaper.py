@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+import numpy
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+from RewardShaper import RewardShaper
+
+class TestRewardShaper(unittest.TestCase):
+
+    def setUp(self):
+        # The shaper finds data.json relative to src, the directory every script runs from
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(SRC_DIR)
+
+    def test_unknown_names_are_rejected(self):
+        with self.assertRaises(ValueError): RewardShaper(terms= {'typo' : 'delta_player2_healh'})
+        with self.assertRaises(ValueError): RewardShaper(terms= {'builtin' : 'len(player1_health)'})
+        with self.assertRaises(ValueError): RewardShaper(terms= {'prefix' : 'next_player1_health'})
+
+    def test_known_names_are_accepted(self):
+        shaper = RewardShaper(terms= {'term' : 'maximum(prev_player1_health, 0) + delta_player2_health + round_timer'})
+        self.assertEqual(shaper.getUsedVariables(), {'player1_health', 'player2_health', 'round_timer'})
+
+    def test_prev_and_delta_values(self):
+        shaper = RewardShaper(terms= {'prev' : 'prev_player1_health', 'current' : 'player1_health', 'delta' : 'delta_player1_health'})
+        previous = {'player1_health' : numpy.array([176, 150, 120]), 'player2_health' : numpy.zeros(3)}
+        current = {'player1_health' : numpy.array([150, 150, 100]), 'player2_health' : numpy.zeros(3)}
+        terms = shaper.evaluateTerms(previous, current)
+        numpy.testing.assert_array_equal(terms['prev'], [176, 150, 120])
+        numpy.testing.assert_array_equal(terms['current'], [150, 150, 100])
+        numpy.testing.assert_array_equal(terms['delta'], [-26, 0, -20])
+
+    def test_default_terms(self):
+        shaper = RewardShaper()
+        previous = {'player1_health' : numpy.array([176, 176, 100]), 'player2_health' : numpy.array([176, 150, 10]),
+                    'player1_matches_won' : numpy.array([0, 0, 0]), 'player2_matches_won' : numpy.array([0, 0, 0])}
+        current = {'player1_health' : numpy.array([176, 160, 100]), 'player2_health' : numpy.array([150, 150, -1]),
+                   'player1_matches_won' : numpy.array([0, 0, 1]), 'player2_matches_won' : numpy.array([0, 0, 0])}
+        numpy.testing.assert_array_equal(shaper.evaluate(previous, current), [26, -16, 111])
+
+    def test_player_two_is_mirrored(self):
+        self.assertEqual(RewardShaper.mirrorExpression('player1_health - prev_player2_health + delta_player1_matches_won'),
+                         'player2_health - prev_player1_health + delta_player2_matches_won')
+        shaper = RewardShaper(weights= {'round_won' : 2.0})
+        previous = {'player1_health' : numpy.array([176, 50]), 'player2_health' : numpy.array([100, 176]),
+                    'player1_matches_won' : numpy.array([0, 0]), 'player2_matches_won' : numpy.array([0, 1])}
+        current = {'player1_health' : numpy.array([150, -1]), 'player2_health' : numpy.array([90, 176]),
+                   'player1_matches_won' : numpy.array([0, 0]), 'player2_matches_won' : numpy.array([0, 2])}
+        swapped = lambda columns: {name.replace('player1', 'playerX').replace('player2', 'player1').replace('playerX', 'player2') : values for name, values in columns.items()}
+
+        # Player 2 of a fight is rewarded like player 1 of the same fight with the sides swapped
+        numpy.testing.assert_array_equal(shaper.evaluate(previous, current, playerNumber= 1), shaper.evaluate(swapped(previous), swapped(current), playerNumber= 0))
+        numpy.testing.assert_array_equal(shaper.evaluate(previous, current, playerNumber= 1), [-10 + 26, 51 + 200])
+
+    def test_constant_terms_broadcast_to_the_batch(self):
+        shaper = RewardShaper(terms= {'damage' : 'delta_player1_health', 'living' : '-1'})
+        previous = {'player1_health' : numpy.full((2, 3), 176), 'player2_health' : numpy.full((2, 3), 176)}         # Player 2's mirrored term is gathered too
+        current = {'player1_health' : numpy.full((2, 3), 170), 'player2_health' : numpy.full((2, 3), 176)}
+        terms = shaper.evaluateTerms(previous, current)
+        self.assertEqual(terms['living'].shape, (2, 3))
+        numpy.testing.assert_array_equal(shaper.evaluate(previous, current), numpy.full((2, 3), -7))
+
+    def test_reward_memory_reads_the_recorded_infos(self):
+        shaper = RewardShaper(terms= {'damage_dealt' : 'maximum(-delta_player2_health, 0)'})
+        memory = [(None, {'player1_health' : 176, 'player2_health' : 176}, 0, 0, None, {'player1_health' : 170, 'player2_health' : 150}, False),
+                  (None, {'player1_health' : 170, 'player2_health' : 150}, 0, 0, None, {'player1_health' : 170, 'player2_health' : 150}, False)]
+        numpy.testing.assert_array_equal(shaper.rewardMemory(memory, 0, 1, 5), [26, 0])
+        numpy.testing.assert_array_equal(shaper.rewardMemory(memory, 1, 1, 5), [6, 0])
+        self.assertEqual(len(shaper.rewardMemory([], 0, 1, 5)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import sys
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from SharedWeights import SharedWeights
+from PolicyCheckpoint import PolicyCheckpoint
+
+def makeWeights(value):
+    """A two layer network whose every weight is the given value"""
+    return [numpy.full((4, 3), value, dtype= numpy.float32), numpy.full(3, value, dtype= numpy.float32),
+            numpy.full((3, 2), value, dtype= numpy.float32), numpy.full(2, value, dtype= numpy.float32)]
+
+class TestSharedWeights(unittest.TestCase):
+
+    def setUp(self):
+        self.learner = SharedWeights.create(makeWeights(1))
+        self.actor = SharedWeights.attach(self.learner.getSpec())
+        self.checkpoint = PolicyCheckpoint(makeWeights(0), ['relu', 'linear'])
+        self.inputs = numpy.ones((1, 4), dtype= numpy.float32)
+
+    def tearDown(self):
+        self.checkpoint.set_weights(makeWeights(0))                                     # Drops the views so the blocks can be unmapped
+        self.actor.close()
+        self.learner.close()
+
+    def test_read_weights_copies_a_version(self):
+        version, weights = self.actor.readWeights()
+        self.learner.publish(makeWeights(2))
+        self.assertEqual(version + 2, self.actor.getVersion())
+        numpy.testing.assert_array_equal(weights[0], makeWeights(1)[0])
+
+    def test_checkpoint_predicts_from_the_shared_block(self):
+        self.checkpoint.followSharedWeights(self.actor)
+        expected = PolicyCheckpoint(makeWeights(1), ['relu', 'linear']).predict(self.inputs)
+        numpy.testing.assert_allclose(self.checkpoint.predict(self.inputs), expected)
+
+        self.learner.publish(makeWeights(2))                                            # Picked up by the next prediction without a copy
+        expected = PolicyCheckpoint(makeWeights(2), ['relu', 'linear']).predict(self.inputs)
+        numpy.testing.assert_allclose(self.checkpoint.predict(self.inputs), expected)
+        numpy.testing.assert_array_equal(self.checkpoint.get_weights()[2], makeWeights(2)[2])
+
+    def test_prediction_overlapping_a_publish_is_run_again(self):
+        self.checkpoint.followSharedWeights(self.actor)
+        forward = self.checkpoint.forward
+        calls = []
+        def publishDuringFirstCall(values, weights):
+            calls.append(weights[0][0, 0])
+            if len(calls) == 1: self.learner.publish(makeWeights(2))
+            return forward(values, weights)
+        self.checkpoint.forward = publishDuringFirstCall
+        outputs = self.checkpoint.predict(self.inputs)
+        self.assertEqual(calls, [1, 2])
+        numpy.testing.assert_allclose(outputs, PolicyCheckpoint(makeWeights(2), ['relu', 'linear']).predict(self.inputs))
+
+    def test_set_weights_stops_following(self):
+        self.checkpoint.followSharedWeights(self.actor)
+        self.checkpoint.set_weights(makeWeights(3))
+        self.learner.publish(makeWeights(2))
+        numpy.testing.assert_allclose(self.checkpoint.predict(self.inputs), PolicyCheckpoint(makeWeights(3), ['relu', 'linear']).predict(self.inputs))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from TelemetryStore import TelemetryStore
+
+CHUNK_SIZE = 4
+
+def appendBatches(store, first, stop):
+    """Appends batches whose every column can be traced back to the batch number"""
+    for batch in range(first, stop): store.append('batches', fight= batch // 2, batch= batch, loss= batch * 0.5)
+
+class TestTelemetryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix= 'telemetry_test_')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors= True)
+
+    def makeStore(self):
+        store = TelemetryStore(self.directory, chunkSize= CHUNK_SIZE)
+        self.addCleanup(store.close)
+        return store
+
+    def listChunks(self, table):
+        tableDir = os.path.join(self.directory, table)
+        return sorted(os.listdir(tableDir)) if os.path.isdir(tableDir) else []
+
+    def test_full_chunks_roll_over_to_disk(self):
+        store = self.makeStore()
+        appendBatches(store, 0, 9)
+        store.writeQueue.join()
+        self.assertEqual(self.listChunks('batches'), [TelemetryStore.CHUNK_FILE_NAME.format(0), TelemetryStore.CHUNK_FILE_NAME.format(1)])
+        with numpy.load(os.path.join(self.directory, 'batches', TelemetryStore.CHUNK_FILE_NAME.format(1))) as chunk:
+            numpy.testing.assert_array_equal(chunk['batch'], [4, 5, 6, 7])
+        self.assertEqual(store.getNumberOfRows('batches'), 9)
+        self.assertEqual(self.listChunks('fights'), [])
+
+    def test_flush_writes_the_partial_chunk(self):
+        store = self.makeStore()
+        appendBatches(store, 0, 6)
+        store.flush()
+        with numpy.load(os.path.join(self.directory, 'batches', TelemetryStore.CHUNK_FILE_NAME.format(1))) as chunk:
+            numpy.testing.assert_array_equal(chunk['batch'], [4, 5])
+        numpy.testing.assert_array_equal(store.query('batches', 'batch'), range(6))
+
+    def test_reopened_store_appends_to_its_partial_chunk(self):
+        store = self.makeStore()
+        appendBatches(store, 0, 6)
+        store.close()
+
+        store = self.makeStore()
+        self.assertEqual(store.getNumberOfRows('batches'), 6)
+        appendBatches(store, 6, 11)
+        numpy.testing.assert_array_equal(store.query('batches', 'batch'), range(11))
+        store.close()
+
+        store = self.makeStore()
+        numpy.testing.assert_array_equal(store.query('batches', 'batch'), range(11))
+        numpy.testing.assert_allclose(store.query('batches', 'loss'), numpy.arange(11) * 0.5)
+        self.assertEqual(store.getAggregate('batches', 'batch')['count'], 11)
+        self.assertEqual(store.getAggregate('batches', 'batch')['max'], 10)
+
+    def test_query_ranges_across_chunk_boundaries(self):
+        store = self.makeStore()
+        appendBatches(store, 0, 14)                                                    # Three chunks on disk and two rows still buffered
+        for start, stop in [(0, 14), (3, 5), (2, 13), (4, 8), (7, 7), (12, 14), (10, 100), (-3, 2)]:
+            numpy.testing.assert_array_equal(store.query('batches', 'batch', start, stop), range(max(start, 0), min(stop, 14)))
+        self.assertEqual(store.query('batches', 'batch', 9, 3).dtype, numpy.int64)
+        self.assertEqual(len(store.query('fights', 'reward')), 0)
+
+    def test_aggregates_skip_nan(self):
+        store = self.makeStore()
+        for reward in [1.0, float('nan'), -3.0, 5.0, float('nan')]:
+            store.append('fights', fight= 0, epsilon= 0.5, reward= reward, length= 10, won= reward > 0, loss= float('nan'))
+        aggregate = store.getAggregate('fights', 'reward')
+        self.assertEqual(aggregate['count'], 3)
+        self.assertEqual(aggregate['sum'], 3.0)
+        self.assertEqual(aggregate['mean'], 1.0)
+        self.assertEqual((aggregate['min'], aggregate['max']), (-3.0, 5.0))
+
+        loss = store.getAggregate('fights', 'loss')
+        self.assertEqual(loss['count'], 0)
+        self.assertIsNone(loss['mean'])
+        self.assertIsNone(loss['min'])
+        self.assertEqual(len(store.query('fights', 'reward')), 5)                    # NaN rows are still stored
+
+if __name__ == '__main__':
+    unittest.main()